@@ -0,0 +1,629 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+import random
+
+import frappe
+
+
+# [Internal]
+_BENCH_PREFIX = "_Bench"
+# The leading underscore is a LIKE wildcard, so it is matched literally
+_BENCH_LIKE = _BENCH_PREFIX.replace("_", "\\_") + "%"
+_BENCH_CHUNK = 5000
+_BENCH_SEED = 2024
+_BENCH_SCALES = {
+    "small": {
+        "depth": 3,
+        "branches": 3,
+        "items": 500,
+        "expenses": 10000,
+        "requests": 500,
+        "entries": 500
+    },
+    "medium": {
+        "depth": 4,
+        "branches": 4,
+        "items": 2000,
+        "expenses": 100000,
+        "requests": 5000,
+        "entries": 5000
+    },
+    "large": {
+        "depth": 4,
+        "branches": 6,
+        "items": 5000,
+        "expenses": 300000,
+        "requests": 20000,
+        "entries": 20000
+    }
+}
+_BENCH_DOCTYPES = [
+    ["Expenses Journal Link", "entry", None],
+    ["Expenses Status Job", "request", None],
+    ["Expenses Summary", "expense_item", None],
+    ["Expenses Entry Details", "parent", "Expenses Entry"],
+    ["Expenses Entry", "name", None],
+    ["Expenses Request Details", "parent", "Expenses Request"],
+    ["Expenses Request", "name", None],
+    ["Expense", "name", None],
+    ["Expense Item Account", "parent", "Expense Item"],
+    ["Expense Item", "name", None],
+    ["Expense Type Account", "parent", "Expense Type"],
+    ["Expense Type", "name", None]
+]
+_BENCH_EXPENSE_STATES = [
+    # status, docstatus, weight
+    ["Draft", 0, 10],
+    ["Pending", 1, 30],
+    ["Cancelled", 2, 5],
+    ["Rejected", 2, 5]
+]
+
+
+# [Bench]
+# bench --site {site} execute expenses.benchmarks.data.generate --kwargs "{'scale': 'small'}"
+def generate(scale: str="small", seed: int=None):
+    if scale not in _BENCH_SCALES:
+        from expenses.libs.common import error
+        
+        error("Benchmark scale \"{0}\" is invalid, use one of: {1}.".format(scale, ", ".join(_BENCH_SCALES)))
+    
+    import time
+    
+    cleanup()
+    conf = _BENCH_SCALES[scale]
+    ctx = _get_context(random.Random(_BENCH_SEED if seed is None else seed))
+    start = time.perf_counter()
+    result = {"scale": scale}
+    leaves = _make_types(ctx, conf["depth"], conf["branches"])
+    result["types"] = ctx.counts.pop("types")
+    items = _make_items(ctx, leaves, conf["items"])
+    result["items"] = len(items)
+    expenses = _make_expenses(ctx, items, conf["expenses"])
+    result["expenses"] = len(expenses)
+    result["requests"] = _make_requests(ctx, expenses, conf["requests"])
+    result["entries"] = _make_entries(ctx, expenses, conf["entries"])
+    
+    from expenses.libs.search import add_search_index
+    
+    add_search_index("Expense Type", [{"name": v} for v in ctx.types])
+    add_search_index("Expense Item", [{"name": v} for v in items])
+    add_search_index("Expense", [
+        {"name": v["name"], "description": v["description"]}
+        for v in expenses
+    ])
+    
+    frappe.db.commit()
+    
+    from expenses.libs.summary import rebuild_expenses_summary
+    
+    rebuild_expenses_summary()
+    frappe.db.commit()
+    result["time"] = round(time.perf_counter() - start, 2)
+    print(frappe.as_json(result))
+    return result
+
+
+# [Bench]
+# bench --site {site} execute expenses.benchmarks.data.cleanup
+def cleanup():
+    from expenses.libs.cache import clear_docs_cache
+    
+    # Only the tree and item lookups are cached by name
+    for dt in ["Expense Type", "Expense Item"]:
+        clear_docs_cache(dt, get_bench_names(dt))
+    
+    _delete_bench_journals()
+    for dt, field, parenttype in _BENCH_DOCTYPES:
+        doc = frappe.qb.DocType(dt)
+        qry = (
+            frappe.qb.from_(doc)
+            .delete()
+            .where(doc.field(field).like(_BENCH_LIKE))
+        )
+        if parenttype:
+            qry = qry.where(doc.parenttype == parenttype)
+        
+        qry.run()
+    
+    sdoc = frappe.qb.DocType("Expenses Search Index")
+    (
+        frappe.qb.from_(sdoc)
+        .delete()
+        .where(sdoc.ref_name.like(_BENCH_LIKE))
+    ).run()
+    frappe.db.commit()
+
+
+# [Bench, Internal]
+def get_bench_names(dt: str, filters: dict=None, limit: int=None):
+    doc = frappe.qb.DocType(dt)
+    qry = (
+        frappe.qb.from_(doc)
+        .select(doc.name)
+        .where(doc.name.like(_BENCH_LIKE))
+        .orderby(doc.name)
+    )
+    for k, v in (filters or {}).items():
+        qry = qry.where(doc.field(k) == v)
+    if limit:
+        qry = qry.limit(limit)
+    
+    return qry.run(pluck=True)
+
+
+# [Bench, Internal]
+def copy_bench_entry(name: str):
+    from frappe.utils import now
+    
+    dt = "Expenses Entry"
+    ts = now()
+    user = frappe.session.user
+    new = f"{_BENCH_PREFIX}-ENT-RUN-{frappe.generate_hash(length=10)}"
+    entry = frappe.db.get_value(dt, name, "*", as_dict=True)
+    details = frappe.get_all(
+        f"{dt} Details",
+        fields=["*"],
+        filters={"parent": name, "parenttype": dt},
+        order_by="idx asc",
+        ignore_permissions=True
+    )
+    # The copy isn't linked to the request, so submitting it changes nothing else
+    entry.update({
+        "name": new,
+        "creation": ts,
+        "modified": ts,
+        "modified_by": user,
+        "owner": user,
+        "docstatus": 0,
+        "expenses_request_ref": None
+    })
+    _bulk_insert(dt, list(entry), [list(entry.values())])
+    for v in details:
+        v.update({
+            "name": f"{_BENCH_PREFIX}-{frappe.generate_hash(length=12)}",
+            "parent": new,
+            "creation": ts,
+            "modified": ts,
+            "docstatus": 0
+        })
+    
+    if details:
+        _bulk_insert(f"{dt} Details", list(details[0]), [list(v.values()) for v in details])
+    
+    return new
+
+
+# [Internal]
+def _delete_bench_journals():
+    ldoc = frappe.qb.DocType("Expenses Journal Link")
+    names = (
+        frappe.qb.from_(ldoc)
+        .select(ldoc.journal_entry)
+        .where(ldoc.entry.like(_BENCH_LIKE))
+        .where(ldoc.journal_entry.isnotnull())
+    ).run(pluck=True)
+    if not names:
+        return 0
+    
+    # Journals of submitted bench entries, ledger rows go with them
+    for dt, field in [
+        ["GL Entry", "voucher_no"],
+        ["Payment Ledger Entry", "voucher_no"],
+        ["Journal Entry Account", "parent"],
+        ["Journal Entry", "name"]
+    ]:
+        if not frappe.db.table_exists(dt):
+            continue
+        
+        doc = frappe.qb.DocType(dt)
+        qry = frappe.qb.from_(doc).delete().where(doc.field(field).isin(names))
+        if field == "voucher_no":
+            qry = qry.where(doc.voucher_type == "Journal Entry")
+        
+        qry.run()
+    
+    return len(names)
+
+
+# [Internal]
+def _get_context(rnd):
+    from frappe.utils import now
+    
+    ctx = frappe._dict({
+        "rnd": rnd,
+        "ts": now(),
+        "user": frappe.session.user,
+        "counts": {},
+        "types": [],
+        "companies": []
+    })
+    companies = frappe.get_all(
+        "Company",
+        fields=["name", "default_currency"],
+        filters={"is_group": 0},
+        limit=3,
+        ignore_permissions=True
+    )
+    if not companies:
+        from expenses.libs.common import error
+        
+        error("At least one non-group company is required to generate benchmark data.")
+    
+    for v in companies:
+        accounts = frappe.get_all(
+            "Account",
+            fields=["name", "account_currency"],
+            filters={"company": v["name"], "is_group": 0, "disabled": 0, "root_type": "Expense"},
+            limit=20,
+            ignore_permissions=True
+        )
+        if not accounts:
+            continue
+        
+        ctx.companies.append(frappe._dict({
+            "name": v["name"],
+            "currency": v["default_currency"],
+            "accounts": accounts,
+            "payment": frappe.db.get_value(
+                "Mode of Payment Account",
+                {"company": v["name"], "default_account": ["is", "set"]},
+                ["parent", "default_account"],
+                as_dict=True
+            ),
+            "center": frappe.db.get_value("Cost Center", {"company": v["name"], "is_group": 0}, "name"),
+            "employees": frappe.get_all(
+                "Employee",
+                filters={"company": v["name"], "status": "Active"},
+                limit=50,
+                pluck="name",
+                ignore_permissions=True
+            )
+        }))
+    
+    if not ctx.companies:
+        from expenses.libs.common import error
+        
+        error("No company has a non-group expense account to generate benchmark data.")
+    
+    ctx.uom = frappe.db.get_value("UOM", {"enabled": 1}, "name") or "Nos"
+    return ctx
+
+
+# [Internal]
+def _make_types(ctx, depth: int, branches: int):
+    rows = []
+    accounts = []
+    leaves = []
+    counter = [0]
+    
+    def add(parent, level, path):
+        counter[0] += 1
+        lft = counter[0]
+        name = f"{_BENCH_PREFIX} Type {path}"
+        is_group = 1 if level < depth else 0
+        if is_group:
+            for i in range(branches):
+                add(name, level + 1, f"{path}.{i + 1}")
+        else:
+            leaves.append(name)
+        
+        counter[0] += 1
+        rows.append([
+            name, ctx.ts, ctx.ts, ctx.user, ctx.user, 0,
+            0, is_group, parent, lft, counter[0]
+        ])
+        if not parent:
+            # Accounts are set on the roots and inherited down the tree
+            for x, c in enumerate(ctx.companies):
+                accounts.append([
+                    f"{_BENCH_PREFIX}-{frappe.generate_hash(length=12)}",
+                    ctx.ts, ctx.ts, ctx.user, ctx.user, 0,
+                    name, "Expense Type", "expense_accounts", x + 1,
+                    c.name, ctx.rnd.choice(c.accounts)["name"]
+                ])
+    
+    # Shift the bench tree past any existing nested set
+    offset = frappe.db.sql("select ifnull(max(`rgt`), 0) from `tabExpense Type`")[0][0]
+    counter[0] = offset
+    for i in range(branches):
+        add(None, 1, str(i + 1))
+    
+    _bulk_insert(
+        "Expense Type",
+        [
+            "name", "creation", "modified", "modified_by", "owner", "docstatus",
+            "disabled", "is_group", "parent_type", "lft", "rgt"
+        ],
+        rows
+    )
+    _bulk_insert(
+        "Expense Type Account",
+        [
+            "name", "creation", "modified", "modified_by", "owner", "docstatus",
+            "parent", "parenttype", "parentfield", "idx", "company", "account"
+        ],
+        accounts
+    )
+    ctx.types = [v[0] for v in rows]
+    ctx.counts["types"] = len(rows)
+    return leaves
+
+
+# [Internal]
+def _make_items(ctx, types: list, size: int):
+    rows = []
+    accounts = []
+    for i in range(size):
+        name = f"{_BENCH_PREFIX} Item {i + 1:05d}"
+        rows.append([
+            name, ctx.ts, ctx.ts, ctx.user, ctx.user, 0,
+            0, types[i % len(types)], ctx.uom
+        ])
+        for x, c in enumerate(ctx.companies):
+            account = ctx.rnd.choice(c.accounts)
+            cost = round(ctx.rnd.uniform(5, 500), 2)
+            accounts.append([
+                f"{_BENCH_PREFIX}-{frappe.generate_hash(length=12)}",
+                ctx.ts, ctx.ts, ctx.user, ctx.user, 0,
+                name, "Expense Item", "expense_accounts", x + 1,
+                c.name, account["name"], account["account_currency"] or c.currency,
+                0, 0, cost * 10, 0, 1, 100, 0
+            ])
+    
+    _bulk_insert(
+        "Expense Item",
+        [
+            "name", "creation", "modified", "modified_by", "owner", "docstatus",
+            "disabled", "expense_type", "uom"
+        ],
+        rows
+    )
+    _bulk_insert(
+        "Expense Item Account",
+        [
+            "name", "creation", "modified", "modified_by", "owner", "docstatus",
+            "parent", "parenttype", "parentfield", "idx", "company", "account",
+            "currency", "cost", "min_cost", "max_cost", "qty", "min_qty", "max_qty",
+            "inherited"
+        ],
+        accounts
+    )
+    ctx.accounts = {
+        (v[6], v[10]): [v[11], v[12]]
+        for v in accounts
+    }
+    return [v[0] for v in rows]
+
+
+# [Internal]
+def _make_expenses(ctx, items: list, size: int):
+    import datetime
+    
+    from frappe.utils import getdate
+    
+    words = [
+        "travel", "hotel", "fuel", "meals", "office", "supplies", "internet",
+        "phone", "parking", "taxi", "training", "software", "repair", "courier"
+    ]
+    states = [v[:2] for v in _BENCH_EXPENSE_STATES]
+    weights = [v[2] for v in _BENCH_EXPENSE_STATES]
+    today = getdate()
+    data = []
+    rows = []
+    for i in range(size):
+        company = ctx.companies[i % len(ctx.companies)]
+        item = ctx.rnd.choice(items)
+        account = ctx.accounts[(item, company.name)]
+        status, docstatus = ctx.rnd.choices(states, weights)[0]
+        cost = round(ctx.rnd.uniform(5, 500), 2)
+        qty = ctx.rnd.randint(1, 10)
+        is_paid = 1 if company.employees and ctx.rnd.random() < 0.2 else 0
+        v = {
+            "name": f"{_BENCH_PREFIX}-EXP-{i + 1:07d}",
+            "company": company.name,
+            "expense_item": item,
+            "expense_account": account[0],
+            "currency": account[1],
+            "required_by": today + datetime.timedelta(days=ctx.rnd.randint(-365, 30)),
+            "description": " ".join(ctx.rnd.sample(words, 3)),
+            "cost": cost,
+            "qty": qty,
+            "total": round(cost * qty, 2),
+            "is_advance": 1 if ctx.rnd.random() < 0.1 else 0,
+            "is_paid": is_paid,
+            "paid_by": ctx.rnd.choice(company.employees) if is_paid else None,
+            "status": status,
+            "docstatus": docstatus
+        }
+        data.append(v)
+        rows.append([
+            v["name"], ctx.ts, ctx.ts, ctx.user, ctx.user, v["docstatus"],
+            v["company"], v["expense_item"], v["expense_account"], v["currency"],
+            v["required_by"], v["description"], v["cost"], ctx.uom, v["qty"],
+            v["total"], v["is_advance"], v["is_paid"], v["paid_by"], v["status"], 0
+        ])
+    
+    _bulk_insert(
+        "Expense",
+        [
+            "name", "creation", "modified", "modified_by", "owner", "docstatus",
+            "company", "expense_item", "expense_account", "currency",
+            "required_by", "description", "cost", "uom", "qty",
+            "total", "is_advance", "is_paid", "paid_by", "status", "is_restored"
+        ],
+        rows
+    )
+    return data
+
+
+# [Internal]
+def _make_requests(ctx, expenses: list, size: int):
+    from expenses.libs.request import RequestStatus
+    
+    pending = {}
+    for v in expenses:
+        if v["status"] == "Pending":
+            pending.setdefault(v["company"], []).append(v)
+    
+    states = [
+        [RequestStatus.p, "Requested", 50],
+        [RequestStatus.a, "Approved", 35],
+        [RequestStatus.r, "Rejected", 15]
+    ]
+    weights = [v[2] for v in states]
+    companies = list(pending)
+    rows = []
+    details = []
+    for i in range(size):
+        if not companies:
+            break
+        
+        company = companies[i % len(companies)]
+        group = pending[company]
+        count = min(len(group), ctx.rnd.randint(5, 40))
+        chunk = [group.pop() for _ in range(count)]
+        if not group:
+            companies.remove(company)
+        if not chunk:
+            continue
+        
+        status, expense_status, w = ctx.rnd.choices(states, weights)[0]
+        name = f"{_BENCH_PREFIX}-REQ-{i + 1:06d}"
+        rows.append([
+            name, ctx.ts, ctx.ts, ctx.user, ctx.user,
+            2 if status == RequestStatus.r else 1,
+            company, max([v["required_by"] for v in chunk]), status, status
+        ])
+        for x, v in enumerate(chunk):
+            v["status"] = expense_status
+            v["request"] = name
+            details.append([
+                f"{_BENCH_PREFIX}-{frappe.generate_hash(length=12)}",
+                ctx.ts, ctx.ts, ctx.user, ctx.user, 1,
+                name, "Expenses Request", "expenses", x + 1,
+                v["name"], v["expense_item"], ctx.uom, v["total"],
+                v["is_advance"], v["required_by"]
+            ])
+    
+    _bulk_insert(
+        "Expenses Request",
+        [
+            "name", "creation", "modified", "modified_by", "owner", "docstatus",
+            "company", "posting_date", "status", "workflow_state"
+        ],
+        rows
+    )
+    _bulk_insert(
+        "Expenses Request Details",
+        [
+            "name", "creation", "modified", "modified_by", "owner", "docstatus",
+            "parent", "parenttype", "parentfield", "idx",
+            "expense", "expense_item", "uom", "total", "is_advance", "required_by"
+        ],
+        details
+    )
+    _update_expenses_status(expenses, "Requested")
+    _update_expenses_status(expenses, "Approved")
+    _update_expenses_status(expenses, "Rejected", True)
+    return len(rows)
+
+
+# [Internal]
+def _make_entries(ctx, expenses: list, size: int):
+    from frappe.utils import getdate
+    
+    approved = {}
+    for v in expenses:
+        if v["status"] == "Approved":
+            approved.setdefault(v["company"], []).append(v)
+    
+    companies = {v.name:v for v in ctx.companies if v.payment}
+    keys = [k for k in approved if k in companies]
+    today = getdate()
+    rows = []
+    details = []
+    for i in range(size):
+        if not keys:
+            break
+        
+        key = keys[i % len(keys)]
+        company = companies[key]
+        group = approved[key]
+        count = min(len(group), ctx.rnd.randint(1, 30))
+        chunk = [group.pop() for _ in range(count)]
+        if not group:
+            keys.remove(key)
+        if not chunk:
+            continue
+        
+        # Drafts are left for the submit scenario
+        docstatus = 0 if ctx.rnd.random() < 0.3 else 1
+        name = f"{_BENCH_PREFIX}-ENT-{i + 1:06d}"
+        total = 0
+        for x, v in enumerate(chunk):
+            total += v["total"]
+            details.append([
+                f"{_BENCH_PREFIX}-{frappe.generate_hash(length=12)}",
+                ctx.ts, ctx.ts, ctx.user, ctx.user, docstatus,
+                name, "Expenses Entry", "expenses", x + 1,
+                v["expense_account"], v["description"], company.center,
+                v["currency"], v["total"], 1.0, v["total"], v["is_advance"],
+                v["is_paid"], v["paid_by"], v["name"]
+            ])
+        
+        rows.append([
+            name, ctx.ts, ctx.ts, ctx.user, ctx.user, docstatus,
+            company.name, company.payment.parent,
+            today if docstatus else None, company.payment.default_account,
+            "Cash", company.currency, total, 1.0, total, chunk[0].get("request")
+        ])
+    
+    _bulk_insert(
+        "Expenses Entry",
+        [
+            "name", "creation", "modified", "modified_by", "owner", "docstatus",
+            "company", "mode_of_payment", "posting_date", "payment_account",
+            "payment_target", "payment_currency", "total_in_payment_currency",
+            "exchange_rate", "total", "expenses_request_ref"
+        ],
+        rows
+    )
+    _bulk_insert(
+        "Expenses Entry Details",
+        [
+            "name", "creation", "modified", "modified_by", "owner", "docstatus",
+            "parent", "parenttype", "parentfield", "idx",
+            "account", "description", "cost_center", "account_currency",
+            "cost_in_account_currency", "exchange_rate", "cost", "is_advance",
+            "is_paid", "paid_by", "expense_ref"
+        ],
+        details
+    )
+    return len(rows)
+
+
+# [Internal]
+def _update_expenses_status(expenses: list, status: str, cancel: bool=False):
+    names = [v["name"] for v in expenses if v["status"] == status and v.get("request")]
+    doc = frappe.qb.DocType("Expense")
+    for i in range(0, len(names), _BENCH_CHUNK):
+        qry = (
+            frappe.qb.update(doc)
+            .set(doc.status, status)
+            .where(doc.name.isin(names[i:i + _BENCH_CHUNK]))
+        )
+        if cancel:
+            qry = qry.set(doc.docstatus, 2)
+        
+        qry.run()
+
+
+# [Internal]
+def _bulk_insert(dt: str, fields: list, rows: list):
+    for i in range(0, len(rows), _BENCH_CHUNK):
+        frappe.db.bulk_insert(dt, fields, rows[i:i + _BENCH_CHUNK])
\ No newline at end of file
@@ -0,0 +1,148 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+import time
+
+import frappe
+
+
+# [Bench]
+# bench --site {site} execute expenses.benchmarks.entry_validation.run
+def run(sizes=None):
+    if not sizes:
+        sizes = [10, 100, 1000]
+    
+    results = []
+    for size in sizes:
+        doc = _make_entry(size)
+        results.append({
+            "size": size,
+            "legacy_prefetch": _measure(doc, _legacy_prefetch),
+            "prefetch": _measure(doc, _prefetch),
+            "validate": _measure(doc, _validate_expenses)
+        })
+    
+    print(frappe.as_json(results))
+    return results
+
+
+# [Internal]
+def _measure(doc, method):
+    doc.flags.pop("entry_data", None)
+    start = time.perf_counter()
+    method(doc)
+    return round(time.perf_counter() - start, 4)
+
+
+# [Internal]
+def _legacy_prefetch(doc):
+    from expenses.libs.filter import (
+        company_accounts_filter,
+        projects_filter,
+        cost_centers_filter,
+        employees_filter,
+        expense_claims_filter,
+        parties_filter
+    )
+    
+    keys = _get_keys(doc)
+    company_accounts_filter(keys["accounts"], None, True)
+    if keys["projects"]:
+        projects_filter(keys["projects"], {
+            "status": "Open",
+            "is_active": "Yes",
+            "company": ["in", [doc.company, ""]]
+        })
+    if keys["centers"]:
+        cost_centers_filter(keys["centers"], {"is_group": 0, "company": doc.company}, True)
+    if keys["employees"]:
+        employees_filter(keys["employees"], {"company": doc.company}, True)
+    if keys["claims"]:
+        expense_claims_filter(keys["claims"], {
+            "company": doc.company,
+            "is_paid": 1,
+            "status": "Paid",
+            "docstatus": 1
+        })
+    for k, v in keys["parties"].items():
+        parties_filter(k, v, enabled=True)
+
+
+# [Internal]
+def _prefetch(doc):
+    from expenses.libs.entry import prefetch_entry_data
+    
+    keys = _get_keys(doc)
+    prefetch_entry_data(doc.company, {
+        "accounts": set(keys["accounts"]),
+        "projects": set(keys["projects"]),
+        "centers": set(keys["centers"]),
+        "employees": set(keys["employees"]),
+        "claims": set(keys["claims"]),
+        "parties": {k:set(v) for k, v in keys["parties"].items()}
+    })
+
+
+# [Internal]
+def _validate_expenses(doc):
+    doc.flags.error_list = []
+    doc._validate_expenses()
+
+
+# [Internal]
+def _get_keys(doc):
+    keys = {
+        "accounts": [],
+        "projects": [],
+        "centers": [],
+        "employees": [],
+        "claims": [],
+        "parties": {}
+    }
+    for v in doc.expenses:
+        keys["accounts"].append(v.account)
+        if v.cost_center:
+            keys["centers"].append(v.cost_center)
+        if v.party_type and v.party:
+            keys["parties"].setdefault(v.party_type, []).append(v.party)
+    
+    return keys
+
+
+# [Internal]
+def _make_entry(size: int):
+    from frappe.utils import nowdate
+    
+    company = frappe.db.get_value("Company", {"is_group": 0}, "name") or "_Bench Company"
+    accounts = frappe.get_all(
+        "Account",
+        fields=["name", "account_currency"],
+        filters={"company": company, "is_group": 0, "disabled": 0},
+        limit=50,
+        ignore_permissions=True
+    ) or [{"name": "_Bench Account", "account_currency": "USD"}]
+    center = frappe.db.get_value("Cost Center", {"company": company, "is_group": 0}, "name")
+    supplier = frappe.db.get_value("Supplier", {"disabled": 0}, "name")
+    doc = frappe.new_doc("Expenses Entry")
+    doc.update({
+        "company": company,
+        "posting_date": nowdate(),
+        "exchange_rate": 1.0
+    })
+    for i in range(size):
+        account = accounts[i % len(accounts)]
+        doc.append("expenses", {
+            "account": account["name"],
+            "account_currency": account["account_currency"],
+            "cost_in_account_currency": 10.0,
+            "exchange_rate": 1.0,
+            "cost": 10.0,
+            "cost_center": center,
+            "party_type": "Supplier" if supplier else None,
+            "party": supplier
+        })
+    
+    return doc
\ No newline at end of file
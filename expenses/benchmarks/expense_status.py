@@ -0,0 +1,87 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+import time
+
+import frappe
+
+
+# [Bench]
+# bench --site {site} execute expenses.benchmarks.expense_status.run
+def run(sizes=None):
+    if not sizes:
+        sizes = [10, 100, 1000]
+    
+    results = []
+    for size in sizes:
+        results.append({
+            "size": size,
+            "loop": _measure(size, _legacy_set_expenses_status),
+            "bulk": _measure(size, _bulk_set_expenses_status)
+        })
+    
+    print(frappe.as_json(results))
+    return results
+
+
+# [Internal]
+def _measure(size: int, method):
+    names = _make_expenses(size)
+    try:
+        start = time.perf_counter()
+        method(names)
+        return round(time.perf_counter() - start, 4)
+    finally:
+        frappe.db.rollback()
+
+
+# [Internal]
+def _legacy_set_expenses_status(names: list):
+    from expenses.libs.check import expense_exists
+    
+    for name in names:
+        if expense_exists(name):
+            frappe.get_doc("Expense", name).approve()
+
+
+# [Internal]
+def _bulk_set_expenses_status(names: list):
+    from expenses.libs.expense import (
+        ExpenseStatus,
+        set_expenses_status
+    )
+    
+    set_expenses_status(names, ExpenseStatus.a)
+
+
+# [Internal]
+def _make_expenses(size: int):
+    from frappe.utils import now, nowdate
+    
+    from expenses.libs.expense import ExpenseStatus
+    
+    dt = "Expense"
+    ts = now()
+    user = frappe.session.user
+    company = frappe.db.get_value("Company", {"is_group": 0}, "name") or "_Bench Company"
+    item = frappe.db.get_value("Expense Item", {"disabled": 0}, "name") or "_Bench Item"
+    prefix = "EXP-BENCH-{0}-".format(frappe.generate_hash(length=6))
+    fields = [
+        "name", "creation", "modified", "modified_by", "owner", "docstatus",
+        "company", "expense_item", "required_by", "cost", "qty", "total", "status"
+    ]
+    names = []
+    values = []
+    for i in range(size):
+        name = f"{prefix}{i}"
+        names.append(name)
+        values.append([
+            name, ts, ts, user, user, 1,
+            company, item, nowdate(), 1.0, 1.0, 1.0, ExpenseStatus.r
+        ])
+    
+    frappe.db.bulk_insert(dt, fields, values)
+    return names
\ No newline at end of file
@@ -0,0 +1,88 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+import frappe
+
+
+# [Internal]
+_IMPORTS_REPEAT = 3
+_IMPORTS_TARGETS = [
+    "expenses.libs",
+    "expenses.expenses.doctype.expense.expense",
+    "expenses.expenses.doctype.expense_item.expense_item",
+    "expenses.expenses.doctype.expense_type.expense_type",
+    "expenses.expenses.doctype.expenses_entry.expenses_entry",
+    "expenses.expenses.doctype.expenses_request.expenses_request"
+]
+_IMPORTS_SCRIPT = """
+import importlib, json, sys, time, tracemalloc
+import frappe
+import frappe.model.document
+before = set(sys.modules)
+tracemalloc.start()
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+wall = time.perf_counter() - start
+size = tracemalloc.get_traced_memory()[1]
+loaded = sorted(v for v in set(sys.modules) - before if v.startswith("expenses.libs."))
+print(json.dumps({"wall": wall, "memory": size, "loaded": loaded}))
+"""
+
+
+# [Bench]
+# bench --site {site} execute expenses.benchmarks.imports.run
+def run(targets=None, repeat: int=None):
+    import os
+    import sys
+    
+    from expenses.libs import _LAZY_MODULES
+    
+    if not targets:
+        targets = _IMPORTS_TARGETS + [f"expenses.libs.{v}" for v in _LAZY_MODULES]
+    
+    repeat = repeat or _IMPORTS_REPEAT
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([v for v in sys.path if v]))
+    results = []
+    for target in targets:
+        runs = [_measure(target, env) for _ in range(repeat)]
+        runs = [v for v in runs if v]
+        if not runs:
+            results.append({"module": target, "error": 1})
+            continue
+        
+        runs.sort(key=lambda v: v["wall"])
+        best = runs[0]
+        results.append({
+            "module": target,
+            "wall_ms": round(best["wall"] * 1000, 2),
+            "memory_kb": round(best["memory"] / 1024, 1),
+            "libs_loaded": best["loaded"]
+        })
+    
+    print(frappe.as_json(results))
+    return results
+
+
+# [Internal]
+def _measure(target: str, env: dict):
+    import json
+    import subprocess
+    import sys
+    
+    # A fresh interpreter per run, so nothing is already in sys.modules
+    proc = subprocess.run(
+        [sys.executable, "-c", _IMPORTS_SCRIPT, target],
+        capture_output=True,
+        text=True,
+        env=env
+    )
+    if proc.returncode:
+        return None
+    
+    try:
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    except Exception:
+        return None
\ No newline at end of file
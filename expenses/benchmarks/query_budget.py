@@ -0,0 +1,333 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+import re
+
+import frappe
+
+
+# [Internal]
+_BUDGET_STACK_DEPTH = 3
+_BUDGET_SHAPES = [
+    [re.compile(r"'(?:[^'\\]|\\.)*'"), "?"],
+    [re.compile(r'"(?:[^"\\]|\\.)*"'), "?"],
+    [re.compile(r"\b\d+(?:\.\d+)?\b"), "?"],
+    [re.compile(r"%\(\w+\)s|%s"), "?"],
+    [re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"],
+    [re.compile(r"\s+"), " "]
+]
+# Budgets are base + per_row * size. Database budgets are flat, so an
+# N+1 fails at any size. The Redis per-row share is the document cache
+# eviction that frappe does one name at a time
+_BUDGET_SCENARIOS = {
+    "approve_request": {
+        "size": 100,
+        "db": [6, 0],
+        "redis": [10, 1]
+    },
+    "reload_items": {
+        "size": 100,
+        "db": [15, 0],
+        "redis": [10, 1]
+    },
+    "files_delete": {
+        "size": 50,
+        "db": [6, 0],
+        "redis": [5, 0]
+    },
+    "send_notification": {
+        "size": 20,
+        "db": [6, 0],
+        "redis": [3, 0]
+    },
+    "disable_type_descendants": {
+        "size": None,
+        "db": [3, 0],
+        "redis": [10, 1]
+    }
+}
+
+
+# [Bench]
+# bench --site {site} execute expenses.benchmarks.query_budget.run
+def run(scenarios=None, budgets: dict=None, strict: bool=True):
+    results = {}
+    failed = []
+    for name, conf in _BUDGET_SCENARIOS.items():
+        if scenarios and name not in scenarios:
+            continue
+        
+        if budgets and name in budgets:
+            conf = dict(conf, **budgets[name])
+        
+        result = _run_scenario(name, conf)
+        results[name] = result
+        if result.get("failed"):
+            failed.append(name)
+    
+    print(frappe.as_json(results))
+    if failed and strict:
+        from expenses.libs.common import error
+        
+        error("Query budget exceeded by: {0}.".format(", ".join(failed)))
+    
+    return results
+
+
+# [Bench]
+class QueryRecorder:
+    def __init__(self):
+        self.calls = {"db": [], "redis": []}
+        self._sql = None
+        self._command = None
+        self._pipeline = None
+    
+    
+    def __enter__(self):
+        db = frappe.db
+        self._sql = db.sql
+        sql = self._sql
+        
+        def recorded_sql(query, *args, **kwargs):
+            self._add("db", str(query))
+            return sql(query, *args, **kwargs)
+        
+        db.sql = recorded_sql
+        
+        cache = frappe.cache()
+        self._command = cache.execute_command
+        self._pipeline = cache.pipeline
+        command = self._command
+        pipeline = self._pipeline
+        
+        def recorded_command(*args, **kwargs):
+            self._add("redis", " ".join([str(v) for v in args[:2]]))
+            return command(*args, **kwargs)
+        
+        def recorded_pipeline(*args, **kwargs):
+            pipe = pipeline(*args, **kwargs)
+            execute = pipe.execute
+            
+            def recorded_execute(*eargs, **ekwargs):
+                # A pipeline is a single round-trip whatever its size
+                self._add("redis", "PIPELINE " + " ".join(sorted({
+                    str(v[0][0]) for v in pipe.command_stack
+                })))
+                return execute(*eargs, **ekwargs)
+            
+            pipe.execute = recorded_execute
+            return pipe
+        
+        cache.execute_command = recorded_command
+        cache.pipeline = recorded_pipeline
+        return self
+    
+    
+    def __exit__(self, *args):
+        frappe.db.sql = self._sql
+        cache = frappe.cache()
+        cache.execute_command = self._command
+        cache.pipeline = self._pipeline
+        return False
+    
+    
+    def count(self, kind: str):
+        return len(self.calls[kind])
+    
+    
+    def repeated(self, kind: str, minimum: int=2):
+        groups = {}
+        for shape, stack in self.calls[kind]:
+            key = (shape, stack)
+            groups[key] = groups.get(key, 0) + 1
+        
+        data = [
+            {"count": v, "shape": k[0], "stack": list(k[1])}
+            for k, v in groups.items()
+            if v >= minimum
+        ]
+        data.sort(key=lambda v: v["count"], reverse=True)
+        return data
+    
+    
+    def _add(self, kind: str, query: str):
+        self.calls[kind].append((_get_shape(query), _get_stack()))
+
+
+# [Internal]
+def _run_scenario(name: str, conf: dict):
+    setup = globals().get(f"_setup_{name}")
+    method = globals().get(f"_call_{name}")
+    size = conf["size"]
+    try:
+        args = setup(size)
+    except Exception as exc:
+        frappe.db.rollback()
+        return {"skipped": str(exc)}
+    
+    if args is None:
+        frappe.db.rollback()
+        return {"skipped": "No data available for the scenario."}
+    
+    size = args.pop("size", size)
+    try:
+        with QueryRecorder() as rec:
+            method(**args)
+    finally:
+        frappe.db.rollback()
+    
+    result = {"size": size, "failed": 0}
+    for kind in ["db", "redis"]:
+        base, per = conf[kind]
+        budget = base + per * size
+        count = rec.count(kind)
+        result[kind] = {"count": count, "budget": budget}
+        if count > budget:
+            result["failed"] = 1
+        
+        repeated = rec.repeated(kind)
+        if repeated:
+            result[kind]["repeated"] = repeated
+    
+    return result
+
+
+# [Internal]
+def _get_shape(query: str):
+    query = query.strip()
+    for regex, repl in _BUDGET_SHAPES:
+        query = regex.sub(repl, query)
+    
+    return query[:500]
+
+
+# [Internal]
+def _get_stack():
+    import traceback
+    
+    frames = []
+    for v in traceback.extract_stack():
+        path = v.filename.replace("\\", "/")
+        if "/expenses/" in path and "/benchmarks/" not in path:
+            frames.append("{0}:{1} {2}".format(
+                path.rsplit("/expenses/", 1)[-1], v.lineno, v.name
+            ))
+    
+    return tuple(frames[-_BUDGET_STACK_DEPTH:])
+
+
+# [Internal]
+def _setup_approve_request(size: int):
+    from .expense_status import _make_expenses
+    
+    return {"names": _make_expenses(size)}
+
+
+# [Internal]
+def _call_approve_request(names: list):
+    from expenses.libs.request import approve_expenses
+    
+    approve_expenses(names)
+
+
+# [Internal]
+def _setup_reload_items(size: int):
+    names = frappe.get_all(
+        "Expense Item",
+        filters={"disabled": 0},
+        limit=size,
+        pluck="name",
+        ignore_permissions=True
+    )
+    if not names:
+        return None
+    
+    return {"names": names, "size": len(names)}
+
+
+# [Internal]
+def _call_reload_items(names: list):
+    from expenses.libs.item import reload_items
+    
+    reload_items(names)
+
+
+# [Internal]
+def _setup_files_delete(size: int):
+    from frappe.utils import now
+    
+    ts = now()
+    user = frappe.session.user
+    prefix = "_bench-budget-{0}".format(frappe.generate_hash(length=8))
+    names = [f"{prefix}-{i}" for i in range(size)]
+    frappe.db.bulk_insert(
+        "File",
+        [
+            "name", "creation", "modified", "modified_by", "owner", "docstatus",
+            "file_name", "file_url", "is_private", "is_folder"
+        ],
+        [
+            [v, ts, ts, user, user, 0, f"{v}.txt", f"/private/files/{v}.txt", 1, 0]
+            for v in names
+        ]
+    )
+    return {"names": names}
+
+
+# [Internal]
+def _call_files_delete(names: list):
+    from expenses.libs.attachment import files_delete
+    
+    files_delete(names)
+
+
+# [Internal]
+def _setup_send_notification(size: int):
+    names = frappe.get_all(
+        "User",
+        filters={"enabled": 1, "user_type": "System User"},
+        limit=size,
+        pluck="name",
+        ignore_permissions=True
+    )
+    if not names:
+        return None
+    
+    return {"receivers": names, "size": len(names)}
+
+
+# [Internal]
+def _call_send_notification(receivers: list):
+    from expenses import __version__
+    from expenses.libs.update import send_notification
+    
+    send_notification(__version__, "Administrator", receivers, None)
+
+
+# [Internal]
+def _setup_disable_type_descendants(size: int):
+    node = frappe.db.get_value(
+        "Expense Type",
+        {"is_group": 1, "disabled": 0},
+        ["lft", "rgt"],
+        as_dict=True,
+        order_by="rgt - lft desc"
+    )
+    if not node:
+        return None
+    
+    return {
+        "lft": node.lft,
+        "rgt": node.rgt,
+        "size": (node.rgt - node.lft - 1) // 2
+    }
+
+
+# [Internal]
+def _call_disable_type_descendants(lft: int, rgt: int):
+    from expenses.libs.type import disable_type_descendants
+    
+    disable_type_descendants(lft, rgt)
\ No newline at end of file
@@ -0,0 +1,211 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+import time
+
+import frappe
+
+
+# [Internal]
+_SUITE_REPEAT = 5
+_SUITE_WORDS = ["travel", "hotel", "fuel", "office", "type 1", "item 00"]
+
+
+# [Bench]
+# bench --site {site} execute expenses.benchmarks.suite.run --kwargs "{'output': '/tmp/expenses-bench.json'}"
+def run(scenarios=None, repeat: int=None, output: str=None):
+    from expenses import __version__
+    
+    from .data import get_bench_names
+    
+    if not get_bench_names("Expense", limit=1):
+        from expenses.libs.common import error
+        
+        error("No benchmark data found, run expenses.benchmarks.data.generate first.")
+    
+    repeat = repeat or _SUITE_REPEAT
+    ctx = _get_context()
+    results = {
+        "version": __version__,
+        "frappe_version": frappe.__version__,
+        "repeat": repeat,
+        "scenarios": {}
+    }
+    prepares = _get_prepares()
+    for name, method in _get_scenarios().items():
+        if scenarios and name not in scenarios:
+            continue
+        
+        results["scenarios"][name] = _measure(method, ctx, repeat, prepares.get(name))
+    
+    data = frappe.as_json(results)
+    if output:
+        with open(output, "w") as f:
+            f.write(data)
+    
+    print(data)
+    return results
+
+
+# [Internal]
+def _get_scenarios():
+    return {
+        "search_types": _search_types,
+        "search_items": _search_items,
+        "search_expenses": _search_expenses,
+        "expense_validate": _expense_validate,
+        "request_approve": _request_approve,
+        "entry_submit": _entry_submit,
+        "entry_report": _entry_report
+    }
+
+
+# [Internal]
+def _get_prepares():
+    return {
+        "entry_submit": _entry_prepare
+    }
+
+
+# [Internal]
+def _measure(method, ctx, repeat: int, prepare=None):
+    from frappe.utils import flt
+    
+    times = []
+    errors = []
+    for i in range(repeat):
+        # Preparation isn't part of the measured time
+        if prepare and prepare(ctx, i) is False:
+            break
+        
+        start = time.perf_counter()
+        try:
+            if method(ctx, i) is False:
+                break
+        except Exception as exc:
+            errors.append(str(exc))
+        finally:
+            times.append(time.perf_counter() - start)
+            frappe.db.rollback()
+    
+    if not times:
+        return {"runs": 0, "errors": len(errors)}
+    
+    times.sort()
+    return {
+        "runs": len(times),
+        "errors": len(errors),
+        "last_error": errors[-1] if errors else None,
+        "min": flt(times[0], 4),
+        "median": flt(times[len(times) // 2], 4),
+        "max": flt(times[-1], 4),
+        "total": flt(sum(times), 4)
+    }
+
+
+# [Internal]
+def _get_context():
+    from .data import _BENCH_LIKE, get_bench_names
+    
+    company = frappe.db.get_value(
+        "Expense",
+        {"name": ["like", _BENCH_LIKE]},
+        "company"
+    )
+    return frappe._dict({
+        "company": company,
+        "expenses": get_bench_names("Expense", {"status": "Draft"}, 100),
+        "requests": get_bench_names("Expenses Request", {"status": "Pending", "docstatus": 1}, 100),
+        "entries": [
+            v for v in get_bench_names("Expenses Entry", {"docstatus": 0}, 100)
+            if "-ENT-RUN-" not in v
+        ]
+    })
+
+
+# [Internal]
+def _search_types(ctx, i: int):
+    from expenses.libs.type import search_types
+    
+    search_types("Expense Type", _get_word(i), "name", 0, 20, None)
+
+
+# [Internal]
+def _search_items(ctx, i: int):
+    from expenses.libs.item import search_items
+    
+    search_items("Expense Item", _get_word(i), "name", 0, 20, {"company": ctx.company})
+
+
+# [Internal]
+def _search_expenses(ctx, i: int):
+    from expenses.libs.request import search_company_expenses
+    
+    search_company_expenses("Expense", _get_word(i), "name", 0, 20, {"company": ctx.company})
+
+
+# [Internal]
+def _expense_validate(ctx, i: int):
+    if not ctx.expenses:
+        return False
+    
+    doc = frappe.get_doc("Expense", ctx.expenses[i % len(ctx.expenses)])
+    doc.validate()
+
+
+# [Internal]
+def _request_approve(ctx, i: int):
+    if not ctx.requests:
+        return False
+    
+    doc = frappe.get_doc("Expenses Request", ctx.requests[i % len(ctx.requests)])
+    doc.approve(ignore_permissions=True)
+
+
+# [Internal]
+def _entry_prepare(ctx, i: int):
+    if not ctx.entries:
+        return False
+    
+    from .data import copy_bench_entry
+    
+    # Journal creation commits, so every run submits a fresh copy and the
+    # drafts stay the same across suite runs, cleanup removes the copies
+    ctx.entry = copy_bench_entry(ctx.entries[i % len(ctx.entries)])
+    frappe.db.commit()
+
+
+# [Internal]
+def _entry_submit(ctx, i: int):
+    from expenses.libs.journal import (
+        _JOURNAL_PENDING_KEY,
+        make_journal_entry
+    )
+    
+    name = ctx.entry
+    doc = frappe.get_doc("Expenses Entry", name)
+    doc.submit()
+    frappe.cache().srem(_JOURNAL_PENDING_KEY, name)
+    make_journal_entry(name)
+
+
+# [Internal]
+def _entry_report(ctx, i: int):
+    from frappe.utils import add_days, nowdate
+    
+    from expenses.expenses.report.expenses_entry_report.expenses_entry_report import execute
+    
+    execute(frappe._dict({
+        "company": ctx.company,
+        "from_date": add_days(nowdate(), -365),
+        "to_date": nowdate(),
+        "page": i + 1
+    }))
+
+
+# [Internal]
+def _get_word(i: int):
+    return _SUITE_WORDS[i % len(_SUITE_WORDS)]
\ No newline at end of file
@@ -0,0 +1,25 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+from frappe.tests.utils import FrappeTestCase
+
+
+class TestQueryBudget(FrappeTestCase):
+    def test_scenarios_within_budget(self):
+        from .query_budget import _BUDGET_SCENARIOS, _run_scenario
+        
+        for name, conf in _BUDGET_SCENARIOS.items():
+            with self.subTest(scenario=name):
+                result = _run_scenario(name, conf)
+                if "skipped" in result:
+                    self.skipTest(result["skipped"])
+                
+                for kind in ["db", "redis"]:
+                    self.assertLessEqual(
+                        result[kind]["count"],
+                        result[kind]["budget"],
+                        result[kind].get("repeated")
+                    )
\ No newline at end of file
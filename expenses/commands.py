@@ -0,0 +1,54 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+import click
+
+from frappe.commands import get_site, pass_context
+
+
+# [CLI]
+# bench --site {site} import-expenses {file_path} [--submit]
+@click.command("import-expenses")
+@click.argument("file_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--submit", is_flag=True, default=False, help="Submit the imported expenses")
+@pass_context
+def import_expenses(context, file_path, submit=False):
+    import frappe
+    
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        from expenses.libs.importer import (
+            parse_import_data,
+            bulk_import_expenses
+        )
+        
+        with open(file_path, encoding="utf-8-sig") as f:
+            data = f.read()
+        
+        data_format = "json" if file_path.lower().endswith(".json") else "csv"
+        rows = parse_import_data(data, data_format)
+        if not rows:
+            click.secho("Expenses import data is invalid or empty.", fg="red")
+            return
+        
+        result = bulk_import_expenses(rows, submit)
+        frappe.db.commit()
+        for v in result["errors"]:
+            click.secho("Row #{0}: {1}".format(v["row"], " ".join(v["errors"])), fg="yellow")
+        
+        click.secho(
+            "Imported {0} of {1} expenses.".format(result["inserted"], len(rows)),
+            fg="green"
+        )
+    finally:
+        frappe.destroy()
+
+
+commands = [
+    import_expenses
+]
\ No newline at end of file
@@ -13,10 +13,12 @@ from frappe.model.document import Document
 
 from expenses.libs import (
     clear_doc_cache,
+    profile_hooks,
     ExpenseStatus
 )
 
 
+@profile_hooks
 class Expense(Document):
     def before_insert(self):
         self._check_app_status()
@@ -63,6 +65,24 @@ class Expense(Document):
     
     
     def on_update(self):
+        if (
+            self.has_value_changed("company") or
+            self.has_value_changed("required_by")
+        ):
+            old = self.get_doc_before_save()
+            if old:
+                from expenses.libs import mark_expense_summary
+                
+                mark_expense_summary(old.company, old.required_by)
+        
+        if self.has_value_changed("description"):
+            from expenses.libs import update_search_index
+            
+            update_search_index(self.doctype, self.name, {
+                "description": self.description
+            })
+        
+        self._dedupe_attachments()
         self._clean_flags()
     
     
@@ -84,6 +104,7 @@ class Expense(Document):
     
     
     def on_update_after_submit(self):
+        self._dedupe_attachments()
         self._clean_flags()
     
     
@@ -120,6 +141,13 @@ class Expense(Document):
     
     
     def after_delete(self):
+        from expenses.libs import (
+            mark_expense_summary,
+            remove_search_index
+        )
+        
+        remove_search_index(self.doctype, self.name)
+        mark_expense_summary(self.company, self.required_by)
         self._clean_flags()
     
     
@@ -129,26 +157,23 @@ class Expense(Document):
     
     
     @property
-    def _has_expense_claim(self):
-        if not isinstance(self.flags.get("has_expense_claim", 0), int):
-            from expenses.libs import has_expense_claim
+    def _context(self):
+        if not self.flags.get("context", None):
+            from expenses.libs import ExpenseContext
             
-            self.flags.has_expense_claim = has_expense_claim()
+            self.flags.context = ExpenseContext([self])
         
-        return self.flags.has_expense_claim > 0
+        return self.flags.context
+    
+    
+    @property
+    def _has_expense_claim(self):
+        return self._context.has_expense_claim
     
     
     @property
     def _expense_claim_reqd(self):
-        if not isinstance(self.flags.get("expense_claim_reqd", 0), int):
-            if not self._has_expense_claim:
-                self.flags.expense_claim_reqd = 0
-            else:
-                from expenses.libs import expense_claim_reqd_if_paid
-                
-                self.flags.expense_claim_reqd = expense_claim_reqd_if_paid()
-        
-        return self.flags.expense_claim_reqd > 0
+        return self._context.expense_claim_reqd
     
     
     @property
@@ -215,10 +240,8 @@ class Expense(Document):
         if not self.company:
             self._add_error(_("A valid company is required."))
         elif self.is_new() or self.has_value_changed("company"):
-            from expenses.libs import company_exists
-            
             self.flags.company_changed = 1
-            if not company_exists(self.company, {"is_group": 0}):
+            if not self._context.company_exists(self.company):
                 self._add_error(_("Company \"{0}\" is a group or doesn't exist.").format(self.company))
                 self.flags.no_company = 1
     
@@ -227,12 +250,10 @@ class Expense(Document):
         if not self.expense_item:
             self._add_error(_("A valid expense item is required."))
         elif self.is_new() or self.has_value_changed("expense_item"):
-            from expenses.libs import item_exists
-            
             self.flags.expense_item_changed = 1
-            if not item_exists(self.expense_item, enabled=True):
+            if not self._context.item_exists(self.expense_item):
                 self._add_error(_("Expense item \"{0}\" is disabled or doesn't exist.").format(self.expense_item))
-                self.no_expense_item = 1
+                self.flags.no_expense_item = 1
     
     
     def _validate_expense_data(self):
@@ -240,9 +261,7 @@ class Expense(Document):
             (self.flags.get("company_changed", 0) or self.flags.get("expense_item_changed", 0)) and
             not self.flags.get("no_company", 0) and not self.flags.get("no_expense_item", 0)
         ):
-            from expenses.libs import item_expense_data
-            
-            tmp = item_expense_data(self.expense_item, self.company)
+            tmp = self._context.item_data(self.expense_item, self.company)
             if not tmp:
                 self.uom = None
                 self.expense_account = None
@@ -252,19 +271,14 @@ class Expense(Document):
                     .format(self.expense_item, self.company)
                 )
             else:
+                from expenses.libs import get_cost_qty_bounds
+                
                 self.uom = tmp["uom"]
                 self.expense_account = tmp["account"]
                 self.currency = tmp["currency"]
-                for k in ["cost", "qty"]:
-                    f = self.flags.get(f"def_{k}")
-                    if flt(tmp[k]) > 0:
-                        f["eq"] = flt(tmp[k])
-                    tk = f"min_{k}"
-                    if flt(tmp[tk]) > 0:
-                        f["min"] = flt(tmp[tk])
-                    tk = f"max_{k}"
-                    if flt(tmp[tk]) > 0:
-                        f["max"] = flt(tmp[tk])
+                bounds = get_cost_qty_bounds(tmp)
+                self.flags.def_cost = bounds["cost"]
+                self.flags.def_qty = bounds["qty"]
     
     
     def _validate_date(self):
@@ -276,9 +290,7 @@ class Expense(Document):
             if not getdate(self.required_by):
                 self._add_error(_("A valid required by date is required."))
             else:
-                from expenses.libs import is_expense_moderator
-                
-                if not is_expense_moderator():
+                if not self._context.is_moderator:
                     from frappe.utils import date_diff
                     
                     creation_dt = self.get("creation")
@@ -296,28 +308,16 @@ class Expense(Document):
     
     
     def _validate_cost_qty(self):
-        fields = []
-        if flt(self.cost) <= 0:
-            self._add_error(_("A valid cost is required."))
-        else:
-            fields.append(["cost", _("Cost")])
-        
-        if flt(self.qty) <= 0:
-            self._add_error(_("A valid quantity is required."))
-        else:
-            fields.append(["qty", _("Quantity")])
+        from expenses.libs import check_cost_qty
         
-        if fields:
-            for i in range(len(fields)):
-                k = fields.pop(0)
-                v = flt(self.get(k[0]))
-                f = self.flags.get(f"def_{k[0]}")
-                if f["eq"] > 0 and f["eq"] != v:
-                    self._add_error(_("{0} must be equals to {1}.").format(k[1], f["eq"]))
-                elif f["min"] > 0 and f["min"] > v:
-                    self._add_error(_("{0} must be greater than or equals to {1}.").format(k[1], f["min"]))
-                elif f["max"] > 0 and f["max"] < v:
-                    self._add_error(_("{0} must be less than or equals to {1}.").format(k[1], f["max"]))
+        bounds = {
+            "cost": self.flags.get("def_cost"),
+            "qty": self.flags.get("def_qty")
+        }
+        for k in ["cost", "qty"]:
+            err = check_cost_qty(k, [self.get(k)], bounds).pop(0)
+            if err:
+                self._add_error(err)
     
     
     def _validate_paid(self):
@@ -325,18 +325,14 @@ class Expense(Document):
             if not self.paid_by:
                 self._add_error(_("A valid paid by employee is required."))
             elif self.is_new() or self.has_value_changed("paid_by"):
-                from expenses.libs import employee_exists
-                
-                if not employee_exists(self.paid_by, {"company": self.company}, True):
+                if not self._context.employee_exists(self.paid_by, self.company):
                     self._add_error(_("Paid by employee isn't active or isn't working for company \"{0}\".").format(self.company))
             
             if not self.expense_claim:
                 if self._expense_claim_reqd:
                     self._add_error(_("A valid expense claim reference is required."))
             elif self.is_new() or self.has_value_changed("expense_claim"):
-                from expenses.libs import is_valid_claim
-                
-                if not is_valid_claim(self.expense_claim, self.paid_by, self.company):
+                if not self._context.is_valid_claim(self.expense_claim, self.paid_by, self.company):
                     self._add_error(
                         _("Expense claim \"{0}\" hasn't been submitted, not paid, not linked to company, not paid by employee or doesn't exist.")
                         .format(self.expense_claim)
@@ -348,9 +344,7 @@ class Expense(Document):
             if not self.party:
                 self._add_error(_("A valid party reference is required."))
             elif self.is_new() or self.has_value_changed("party"):
-                from expenses.libs import party_exists
-                
-                if not party_exists(self.party_type, self.party, enabled=True):
+                if not self._context.party_exists(self.party_type, self.party):
                     self._add_error(
                         _("{0} \"{1}\" is disabled or doesn't exist.")
                         .format(self.party_type, self.party)
@@ -406,17 +400,22 @@ class Expense(Document):
                 self._delete_attachments(dels)
     
     
+    def _dedupe_attachments(self):
+        if self.attachments and self.has_value_changed("attachments"):
+            from expenses.libs import enqueue_attachments_dedupe
+            
+            enqueue_attachments_dedupe([v.file for v in self.attachments])
+    
+    
     def _delete_attachments(self, files):
         from expenses.libs import delete_attach_files
-            
+        
         delete_attach_files(self.doctype, self.name, files)
     
     
     def _check_app_status(self):
         if not self.flags.get("status_checked", 0):
-            from expenses.libs import check_app_status
-            
-            check_app_status()
+            self._context.check_app_status()
             self.flags.status_checked = 1
     
     
@@ -430,8 +429,7 @@ class Expense(Document):
             "no_company",
             "expense_item_changed",
             "no_expense_item",
-            "has_expense_claim",
-            "expense_claim_reqd",
+            "context",
             "status_checked"
         ]
         for i in range(len(keys)):
@@ -0,0 +1,175 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+
+class TestExpense(FrappeTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.company = frappe.db.get_value("Company", {"is_group": 0}, "name")
+        cls.account = frappe.db.get_value(
+            "Account",
+            {"company": cls.company, "is_group": 0, "root_type": "Expense"},
+            "name"
+        ) if cls.company else None
+        cls.items = {}
+        if cls.account:
+            # Unique names keep cached item data of earlier runs out
+            key = frappe.generate_hash(length=8)
+            cls.items = {
+                "ranged": f"_Test Import Ranged {key}",
+                "fixed": f"_Test Import Fixed {key}"
+            }
+            _make_item(cls.items["ranged"], cls.company, cls.account, {
+                "min_cost": 10, "max_cost": 100, "min_qty": 1, "max_qty": 5
+            })
+            _make_item(cls.items["fixed"], cls.company, cls.account, {
+                "cost": 50
+            })
+    
+    
+    def test_import_names_are_distinct(self):
+        from expenses.libs.importer import make_import_name
+        
+        autoname = frappe.get_meta("Expense").autoname
+        rows = [
+            frappe._dict({"company": "_Test Company", "description": "First"}),
+            frappe._dict({"company": "_Test Company", "description": "Second"})
+        ]
+        names = [make_import_name(autoname, v) for v in rows]
+        self.assertTrue(all(v.startswith("EXP-") for v in names))
+        self.assertNotEqual(names[0], names[1])
+    
+    
+    def test_import_valid_rows(self):
+        self._check_items()
+        
+        from expenses.libs.importer import bulk_import_expenses
+        
+        result = bulk_import_expenses([
+            self._row("ranged", 10, 1),
+            self._row("ranged", 100, 5),
+            self._row("fixed", 50, 3)
+        ])
+        self.assertEqual(result["inserted"], 3)
+        self.assertEqual(result["errors"], [])
+        self.assertEqual(len(set(result["names"])), 3)
+        totals = frappe.get_all(
+            "Expense",
+            filters={"name": ["in", result["names"]]},
+            pluck="total",
+            ignore_permissions=True
+        )
+        self.assertEqual(sorted(totals), [10.0, 150.0, 500.0])
+    
+    
+    def test_import_invalid_rows(self):
+        self._check_items()
+        
+        from expenses.libs.importer import bulk_import_expenses
+        
+        result = bulk_import_expenses([
+            self._row("ranged", 20, 2),
+            None,
+            self._row("ranged", 0, 1),
+            self._row("ranged", 20, 2, company=None),
+            self._row("ranged", 20, 2, expense_item="_Test Import Missing Item"),
+            self._row("ranged", 20, 2, project="_Test Import Missing Project"),
+            self._row("ranged", 20, 2, party_type="User", party="Administrator")
+        ])
+        self.assertEqual(result["inserted"], 1)
+        self.assertEqual(
+            [v["row"] for v in result["errors"]],
+            [2, 3, 4, 5, 6, 7]
+        )
+        errors = {v["row"]:v["errors"] for v in result["errors"]}
+        self.assertEqual(errors[3], ["A valid cost is required."])
+        self.assertIn("A valid company is required.", errors[4])
+        self.assertIn(
+            "Expense item \"_Test Import Missing Item\" is disabled or doesn't exist.",
+            errors[5]
+        )
+        self.assertEqual(errors[6], ["Project \"_Test Import Missing Project\" doesn't exist."])
+        self.assertEqual(errors[7], ["Party type \"User\" isn't valid."])
+    
+    
+    def test_import_cost_qty_bounds(self):
+        self._check_items()
+        
+        from expenses.libs.importer import bulk_import_expenses
+        
+        result = bulk_import_expenses([
+            self._row("ranged", 5, 1),
+            self._row("ranged", 200, 1),
+            self._row("ranged", 20, 6),
+            self._row("fixed", 60, 1),
+            self._row("ranged", 60, 1),
+            self._row("fixed", 50, 10)
+        ])
+        self.assertEqual(result["inserted"], 2)
+        errors = {v["row"]:v["errors"] for v in result["errors"]}
+        self.assertEqual(sorted(errors), [1, 2, 3, 4])
+        # Same wording as Expense._validate_cost_qty
+        self.assertEqual(errors[1], ["Cost must be greater than or equals to 10.0."])
+        self.assertEqual(errors[2], ["Cost must be less than or equals to 100.0."])
+        self.assertEqual(errors[3], ["Quantity must be less than or equals to 5.0."])
+        self.assertEqual(errors[4], ["Cost must be equals to 50.0."])
+    
+    
+    def _check_items(self):
+        if not self.items:
+            self.skipTest("A non-group company with an expense account is required.")
+    
+    
+    def _row(self, item, cost, qty, **kwargs):
+        from frappe.utils import nowdate
+        
+        row = {
+            "company": self.company,
+            "expense_item": self.items[item],
+            "required_by": nowdate(),
+            "description": "Imported expense",
+            "cost": cost,
+            "qty": qty
+        }
+        row.update(kwargs)
+        return row
+
+
+def _make_item(name: str, company: str, account: str, bounds: dict):
+    from frappe.utils import now
+    
+    ts = now()
+    user = frappe.session.user
+    uom = frappe.db.get_value("UOM", {"enabled": 1}, "name") or "Nos"
+    currency = frappe.db.get_value("Account", account, "account_currency")
+    frappe.db.bulk_insert(
+        "Expense Item",
+        [
+            "name", "creation", "modified", "modified_by", "owner", "docstatus",
+            "disabled", "uom"
+        ],
+        [[name, ts, ts, user, user, 0, 0, uom]]
+    )
+    frappe.db.bulk_insert(
+        "Expense Item Account",
+        [
+            "name", "creation", "modified", "modified_by", "owner", "docstatus",
+            "parent", "parenttype", "parentfield", "idx", "company", "account",
+            "currency", "cost", "min_cost", "max_cost", "qty", "min_qty", "max_qty",
+            "inherited"
+        ],
+        [[
+            frappe.generate_hash(length=10), ts, ts, user, user, 0,
+            name, "Expense Item", "expense_accounts", 1, company, account,
+            currency, bounds.get("cost", 0), bounds.get("min_cost", 0),
+            bounds.get("max_cost", 0), bounds.get("qty", 0), bounds.get("min_qty", 0),
+            bounds.get("max_qty", 0), 0
+        ]]
+    )
\ No newline at end of file
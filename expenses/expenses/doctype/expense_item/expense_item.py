@@ -8,9 +8,13 @@ from frappe import _
 from frappe.utils import cint, flt
 from frappe.model.document import Document
 
-from expenses.libs import clear_doc_cache
+from expenses.libs import (
+    clear_doc_cache,
+    profile_hooks
+)
 
 
+@profile_hooks
 class ExpenseItem(Document):
     def validate(self):
         self._check_app_status()
@@ -29,10 +33,22 @@ class ExpenseItem(Document):
         self._clean_flags()
     
     
+    def after_rename(self, olddn, newdn, merge=False):
+        from expenses.libs import rename_search_index
+        
+        rename_search_index(self.doctype, olddn, newdn)
+    
+    
     def before_save(self):
         clear_doc_cache(self.doctype, self.name)
     
     
+    def after_insert(self):
+        from expenses.libs import update_search_index
+        
+        update_search_index(self.doctype, self.name)
+    
+    
     def on_update(self):
         self._clean_flags()
     
@@ -48,6 +64,9 @@ class ExpenseItem(Document):
     
     def after_delete(self):
         clear_doc_cache(self.doctype, self.name)
+        from expenses.libs import remove_search_index
+        
+        remove_search_index(self.doctype, self.name)
         self._clean_flags()
     
     
@@ -9,9 +9,13 @@ from frappe import _
 from frappe.utils import cint
 from frappe.utils.nestedset import NestedSet
 
-from expenses.libs import clear_doc_cache
+from expenses.libs import (
+    clear_doc_cache,
+    profile_hooks
+)
 
 
+@profile_hooks
 class ExpenseType(NestedSet):
     nsm_parent_field = "parent_type"
     nsm_oldparent_field = "old_parent_type"
@@ -34,9 +38,18 @@ class ExpenseType(NestedSet):
         super(ExpenseType, self).before_rename(olddn, newdn, merge)
         
         clear_doc_cache(self.doctype, olddn)
+        from expenses.libs import reset_type_accounts
+        
+        reset_type_accounts()
         self._clean_flags()
     
     
+    def after_rename(self, olddn, newdn, merge=False):
+        from expenses.libs import rename_search_index
+        
+        rename_search_index(self.doctype, olddn, newdn)
+    
+    
     def before_save(self):
         clear_doc_cache(self.doctype, self.name)
         if (
@@ -45,29 +58,50 @@ class ExpenseType(NestedSet):
             self._is_disabled and self._is_group
         ):
             self.flags.disable_descendants = 1
+        if (
+            self.is_new() or
+            self.has_value_changed("parent_type") or
+            self.has_value_changed("disabled") or
+            self.has_value_changed("expense_accounts")
+        ):
+            self.flags.rebuild_accounts = 1
+    
+    
+    def after_insert(self):
+        from expenses.libs import update_search_index
+        
+        update_search_index(self.doctype, self.name)
     
     
     def on_update(self):
-        if self.flags.pop("disable_descendants", 0):
+        disable = self.flags.pop("disable_descendants", 0)
+        if disable:
             from expenses.libs import disable_type_descendants
             
             disable_type_descendants(self.lft, self.rgt)
         
-        if self.flags.pop("reload_linked_items", 0):
-            from expenses.libs import reload_type_linked_items
-            
-            reload_type_linked_items(self.lft, self.rgt)
-        
+        reload = self.flags.pop("reload_linked_items", 0)
+        rebuild = self.flags.pop("rebuild_accounts", 0)
         self._clean_flags()
         if not frappe.local.flags.ignore_update_nsm:
             super(ExpenseType, self).on_update()
+        
+        if rebuild:
+            from expenses.libs import rebuild_type_accounts
+            
+            rebuild_type_accounts(self.name)
+        
+        if disable or reload:
+            from expenses.libs import reload_type_linked_items
+            
+            reload_type_linked_items(self.name)
     
     
     def on_trash(self):
         self._check_app_status()
         if self._is_group:
             from expenses.libs import type_children_exists
-        
+            
             if type_children_exists(self.name):
                 self._error(_("Expense type group with existing child items can't be removed."))
         else:
@@ -82,6 +116,13 @@ class ExpenseType(NestedSet):
     def after_delete(self):
         self._clean_flags()
         clear_doc_cache(self.doctype, self.name)
+        from expenses.libs import (
+            remove_search_index,
+            remove_type_accounts
+        )
+        
+        remove_type_accounts(self.name)
+        remove_search_index(self.doctype, self.name)
     
     
     def convert_to_item(self, parent_type=None):
@@ -233,6 +274,7 @@ class ExpenseType(NestedSet):
             "error_list",
             "disable_descendants",
             "reload_linked_items",
+            "rebuild_accounts",
             "status_checked"
         ]
         for i in range(len(keys)):
@@ -239,23 +239,20 @@ frappe.ui.form.on('Expenses Entry', {
                     );
                 
                 frm.set_value({company: cstr(ret.company), remarks: cstr(ret.remarks)});
-                let ks = 'description paid_by expense_claim party_type party project'.split(' '),
+                let ks = 'expense_ref account account_currency description paid_by expense_claim party_type party project'.split(' '),
                 kl = ks.length;
                 for (let i = 0, l = ret.expenses.length, v, r; i < l; i++) {
                     v = ret.expenses[i];
                     r = {};
                     for (let x = 0; x < kl; x++) r[ks[x]] = cstr(v[ks[x]]);
-                    r.expense_ref = cstr(v.name);
-                    r.account = cstr(v.expense_account);
-                    r.account_currency = cstr(v.currency);
-                    r.cost_in_account_currency = flt(v.total);
+                    r.cost_in_account_currency = flt(v.cost_in_account_currency);
                     r.is_paid = cint(v.is_paid);
                     r.is_advance = cint(v.is_advance);
                     r = frm.add_child('expenses', r);
                     if (!this.$isArrVal(v.attachments)) continue;
                     r = cstr(r.name);
                     for (let x = 0, y = v.attachments.length, a; x < y; x++) {
-                        a = v.attachments[i];
+                        a = Object.assign({}, v.attachments[x]);
                         a.expenses_entry_row_ref = r;
                         a = frm.add_child('attachments', a);
                         frm._ent.files.add(cstr(a.file));
@@ -11,9 +11,13 @@ from frappe.utils import (
     cint
 )
 
-from expenses.libs import clear_doc_cache
+from expenses.libs import (
+    clear_doc_cache,
+    profile_hooks
+)
 
 
+@profile_hooks
 class ExpensesEntry(Document):
     def before_insert(self):
         self._check_app_status()
@@ -56,6 +60,7 @@ class ExpensesEntry(Document):
     
     def on_update(self):
         self._handle_request()
+        self._dedupe_attachments()
         self._clean_flags()
     
     
@@ -77,6 +82,7 @@ class ExpensesEntry(Document):
     
     
     def on_update_after_submit(self):
+        self._dedupe_attachments()
         self._clean_flags()
     
     
@@ -141,6 +147,11 @@ class ExpensesEntry(Document):
         return self.flags.expense_claim_reqd > 0
     
     
+    @property
+    def _expenses_changed(self):
+        return self.is_new() or self.has_value_changed("expenses")
+    
+    
     def _set_defaults(self):
         self._load_company_currency()
         self._set_mop_data()
@@ -184,7 +195,7 @@ class ExpensesEntry(Document):
     
     
     def _set_expenses_data(self):
-        if not self.expenses or (not self.is_new() and not self.has_value_changed("expenses")):
+        if not self.expenses or not self._expenses_changed:
             return 0
         
         self._load_company_currency()
@@ -199,6 +210,9 @@ class ExpensesEntry(Document):
             
             tmp["currency"] = get_accounts_currencies(tmp["currency"])
         
+        if not tmp["currency"]:
+            tmp["currency"] = {}
+        
         if not self._is_custom_exchange_rate or not self.flags.company_currency:
             tmp["rates"] = {}
         else:
@@ -210,35 +224,38 @@ class ExpensesEntry(Document):
                     tmp["rates"].append(self.flags.expenses_data[v.expense_ref]["currency"])
             
             if tmp["rates"]:
-                tmp["rates"] = self._get_exchange_rate(tmp["rates"])
+                tmp["rates"] = self._get_exchange_rate(list(set(tmp["rates"])))
+            else:
+                tmp["rates"] = {}
         
-        self.flags.expenses_errors = []
-        for v in self.expenses:
+        # Rows may not be named yet, so errors are keyed by row index
+        errors = self.flags.expenses_errors = {}
+        for i, v in enumerate(self.expenses):
             if v.expense_ref:
                 if v.expense_ref not in self.flags.expenses_data:
-                    self.flags.expenses_errors[v.name] = 1
+                    errors[i] = 1
                     continue
                 
                 v.update(self.flags.expenses_data[v.expense_ref])
             
             if not v.account:
-                self.flags.expenses_errors[v.name] = 2
+                errors[i] = 2
                 continue
             
             if flt(v.cost_in_account_currency) < 1:
-                self.flags.expenses_errors[v.name] = 3
+                errors[i] = 3
                 continue
             
             if not v.account_currency:
                 if v.account not in tmp["currency"]:
-                    self.flags.expenses_errors[v.name] = 4
+                    errors[i] = 4
                     continue
                 
                 v.account_currency = tmp["currency"][v.account]
             
             if flt(v.exchange_rate) < 1:
                 if v.account_currency not in tmp["rates"]:
-                    self.flags.expenses_errors[v.name] = 5
+                    errors[i] = 5
                     continue
                 
                 v.exchange_rate = tmp["rates"][v.account_currency]
@@ -336,22 +353,14 @@ class ExpensesEntry(Document):
     
     def _validate_dimensions(self):
         if self.default_project and (self.is_new() or self.has_value_changed("default_project")):
-            from expenses.libs import project_exists
-            
-            if not project_exists(self.default_project, {
-                "status": "Open",
-                "is_active": "Yes",
-                "company": ["in", [self.company, ""]]
-            }):
+            if self.default_project not in self._get_entry_data()["projects"]:
                 self._add_error(
                     _("Default project \"{0}\" isn't open, isn't active, is linked to a company other than \"{1}\" or doesn't exist.")
                     .format(self.default_project, self.company)
                 )
         
         if self.default_cost_center and (self.is_new() or self.has_value_changed("default_cost_center")):
-            from expenses.libs import cost_center_exists
-            
-            if not cost_center_exists(self.default_cost_center, {"is_group": 0, "company": self.company}, True):
+            if self.default_cost_center not in self._get_entry_data()["centers"]:
                 self._add_error(
                     _("Default cost center \"{0}\" is a group, isn't linked to company \"{1}\" or doesn't exist.")
                     .format(self.default_cost_center, self.company)
@@ -363,105 +372,39 @@ class ExpensesEntry(Document):
             self._add_error(_("At least one valid expense is required."))
             return 0
         
-        if not self.is_new() and not self.has_value_changed("expenses"):
+        if not self._expenses_changed:
             return 0
-            
-        tmp = {
-            "accounts": [],
-            "projects": [],
-            "centers": [],
-            "employees": [],
-            "claims": [],
-            "parties": {}
-        }
-        for v in self.expenses:
-            if v.account:
-                tmp["accounts"].append(v.account)
-            if v.project and v.project != self.default_project:
-                tmp["projects"].append(v.project)
-            if v.cost_center and v.cost_center != self.default_cost_center:
-                tmp["centers"].append(v.cost_center)
-            if cint(v.is_paid):
-                if v.paid_by:
-                    tmp["employees"].append(v.paid_by)
-                if v.expense_claim:
-                    tmp["claims"].append(v.expense_claim)
-            if v.party_type and v.party:
-                if v.party_type not in tmp["parties"]:
-                    tmp["parties"][v.party_type] = []
-                tmp["parties"][v.party_type].append(v.party)
-        
-        if tmp["accounts"]:
-            from expenses.libs import company_accounts_filter
-            
-            tmp["accounts"] = company_accounts_filter(tmp["accounts"], None, True)
-        
-        if tmp["projects"]:
-            from expenses.libs import projects_filter
-            
-            tmp["projects"] = projects_filter(tmp["projects"], {
-                "status": "Open",
-                "is_active": "Yes",
-                "company": ["in", [self.company, ""]]
-            })
-        
-        if tmp["centers"]:
-            from expenses.libs import cost_centers_filter
-            
-            tmp["centers"] = cost_centers_filter(tmp["centers"], {"is_group": 0, "company": self.company}, True)
-        
-        if tmp["employees"]:
-            from expenses.libs import employees_filter
-            
-            tmp["employees"] = employees_filter(tmp["employees"], {"company": self.company}, True)
-        
-        if tmp["claims"]:
-            from expenses.libs import expense_claims_filter
-            
-            tmp["claims"] = expense_claims_filter(tmp["claims"], {
-                "company": self.company,
-                "is_paid": 1,
-                "status": "Paid",
-                "docstatus": 1
-            })
-        
-        if tmp["parties"]:
-            from expenses.libs import parties_filter
-            
-            for k in tmp["parties"]:
-                tmp["parties"][k] = parties_filter(k, tmp["parties"][k], enabled=True)
         
+        tmp = self._get_entry_data()
         self._load_company_currency()
         self._load_expenses_data()
-        if not isinstance(self.flags.get("expenses_errors", ""), list):
-            self.flags.expenses_errors = []
+        errors = self.flags.get("expenses_errors", None)
+        if not isinstance(errors, dict):
+            errors = {}
         
         table = _("Expenses")
         for i, v in enumerate(self.expenses):
-            err = 0
-            if v.name in self.flags.expenses_errors:
-                err = self.flags.expenses_errors[v.name]
-            
-            if err == 1 or (v.expense_ref and v.expense_ref not in self.flags.expenses_data):
+            err = errors.get(i, 0)
+            ref = v.expense_ref
+            if err == 1 or (ref and ref not in self.flags.expenses_data):
                 self._add_error(
                     _("{0} - #{1}: Expense reference \"{2}\" isn't approved, not linked to company \"{3}\" or doesn't exist.")
-                    .format(table, i, v.expense_ref, self.company)
+                    .format(table, i, ref, self.company)
                 )
             
             if err == 2 or not v.account:
-                if v.expense_ref:
+                if ref:
                     self._add_error(
                         _("{0} - Row #{1}: Expense reference \"{2}\" has invalid expense account.")
-                        .format(table, i, v.expense_ref)
+                        .format(table, i, ref)
                     )
                 else:
                     self._add_error(_("{0} - Row #{1}: A valid expense account is required.").format(table, i))
-            
-            if v.account not in tmp["accounts"] or tmp["accounts"][v.account] != self.company:
-                if v.expense_ref:
+            elif tmp["accounts"].get(v.account) != self.company:
+                if ref:
                     self._add_error(
                         _("{0} - Row #{1}: Expense account \"{2}\" of expense reference \"{3}\" is disabled, isn't linked to company \"{4}\" or doesn't exist.")
-                        .format(table, i, v.account, v.expense_ref, self.company)
+                        .format(table, i, v.account, ref, self.company)
                     )
                 else:
                     self._add_error(
@@ -470,16 +413,16 @@ class ExpensesEntry(Document):
                     )
             
             if err == 3 or flt(v.cost_in_account_currency) < 1:
-                if v.expense_ref:
-                    self._add_error(_("{0} - Row #{1}: Expense reference \"{2}\" has invalid expense cost.").format(table, i, v.expense_ref))
+                if ref:
+                    self._add_error(_("{0} - Row #{1}: Expense reference \"{2}\" has invalid expense cost.").format(table, i, ref))
                 else:
                     self._add_error(_("{0} - Row #{1}: A valid expense cost is required.").format(table, i))
             
             if err == 4 or not v.account_currency:
-                if v.expense_ref:
+                if ref:
                     self._add_error(
                         _("{0} - Row #{1}: Unable to get currency for expense account \"{2}\" of expense reference \"{3}\".")
-                        .format(table, i, v.account, v.expense_ref)
+                        .format(table, i, v.account, ref)
                     )
                 else:
                     self._add_error(
@@ -488,10 +431,10 @@ class ExpensesEntry(Document):
                     )
             
             if v.project and v.project != self.default_project and v.project not in tmp["projects"]:
-                if v.expense_ref:
+                if ref:
                     self._add_error(
                         _("{0} - Row #{1}: Project \"{2}\" of expense reference \"{3}\" isn't open, isn't active, is linked to a company other than \"{4}\" or doesn't exist.")
-                        .format(table, i, v.project, v.expense_ref, self.company)
+                        .format(table, i, v.project, ref, self.company)
                     )
                 else:
                     self._add_error(
@@ -500,10 +443,10 @@ class ExpensesEntry(Document):
                     )
             
             if v.cost_center and v.cost_center != self.default_cost_center and v.cost_center not in tmp["centers"]:
-                if v.expense_ref:
+                if ref:
                     self._add_error(
                         _("{0} - Row #{1}: Cost center \"{2}\" of expense reference \"{3}\" is a group, isn't linked to company \"{4}\" or doesn't exist.")
-                        .format(table, i, v.cost_center, v.expense_ref, self.company)
+                        .format(table, i, v.cost_center, ref, self.company)
                     )
                 else:
                     self._add_error(
@@ -511,11 +454,11 @@ class ExpensesEntry(Document):
                         .format(table, i, v.cost_center, self.company)
                     )
             
-            if flt(v.exchange_rate) < 1:
-                if v.expense_ref:
+            if err == 5 or flt(v.exchange_rate) < 1:
+                if ref:
                     self._add_error(
                         _("{0} - Row #{1}: Unable to get the exchange rate of {2} to {3} for expense reference \"{4}\".")
-                        .format(table, i, v.account_currency, self.flags.company_currency, v.expense_ref))
+                        .format(table, i, v.account_currency, self.flags.company_currency, ref))
                 elif self._is_custom_exchange_rate:
                     self._add_error(
                         _("{0} - Row #{1}: Exchange rate of {2} to {3} is invalid.")
@@ -530,10 +473,10 @@ class ExpensesEntry(Document):
             if flt(v.cost) <= 0:
                 v.cost = flt(flt(v.cost_in_account_currency) * flt(v.exchange_rate))
                 if flt(v.cost) <= 0:
-                    if v.expense_ref:
+                    if ref:
                         self._add_error(
-                            _("{0} - Row #{1}: Expense cost in company currency for expense reference \"{3}\" is invalid.")
-                            .format(table, i, v.expense_ref)
+                            _("{0} - Row #{1}: Expense cost in company currency for expense reference \"{2}\" is invalid.")
+                            .format(table, i, ref)
                         )
                     else:
                         self._add_error(
@@ -543,22 +486,21 @@ class ExpensesEntry(Document):
             
             if cint(v.is_paid):
                 if not v.paid_by:
-                    if v.expense_ref:
+                    if ref:
                         self._add_error(
                             _("{0} - Row #{1}: Paid by employee of expense reference \"{2}\" is invalid.")
-                            .format(table, i, v.expense_ref)
+                            .format(table, i, ref)
                         )
                     else:
                         self._add_error(
                             _("{0} - Row #{1}: A valid paid by employee is required.")
                             .format(table, i)
                         )
-                
-                if v.paid_by not in tmp["employees"]:
-                    if v.expense_ref:
+                elif v.paid_by not in tmp["employees"]:
+                    if ref:
                         self._add_error(
                             _("{0} - Row #{1}: Paid by employee of expense reference \"{2}\" isn't active or isn't working for company \"{3}\".")
-                            .format(table, i, v.expense_ref, self.company)
+                            .format(table, i, ref, self.company)
                         )
                     else:
                         self._add_error(
@@ -566,23 +508,23 @@ class ExpensesEntry(Document):
                             .format(table, i, self.company)
                         )
                 
-                if not v.expense_claim and self._expense_claim_reqd:
-                    if v.expense_ref:
-                        self._add_error(
-                            _("{0} - Row #{1}: Expense claim of expense reference \"{2}\" is invalid.")
-                            .format(table, i, v.expense_ref)
-                        )
-                    else:
-                        self._add_error(
-                            _("{0} - Row #{1}: A valid expense claim is required.")
-                            .format(table, i)
-                        )
-                
-                if v.expense_claim and (v.expense_claim not in tmp["claims"] or tmp["claims"][v.expense_claim] != v.paid_by):
-                    if v.expense_ref:
+                if not v.expense_claim:
+                    if self._expense_claim_reqd:
+                        if ref:
+                            self._add_error(
+                                _("{0} - Row #{1}: Expense claim of expense reference \"{2}\" is invalid.")
+                                .format(table, i, ref)
+                            )
+                        else:
+                            self._add_error(
+                                _("{0} - Row #{1}: A valid expense claim is required.")
+                                .format(table, i)
+                            )
+                elif tmp["claims"].get(v.expense_claim) != v.paid_by:
+                    if ref:
                         self._add_error(
                             _("{0} - Row #{1}: Expense claim \"{2}\" of expense reference \"{3}\" hasn't been submitted, not paid, not linked to company \"{4}\", not paid by employee \"{5}\" or doesn't exist.")
-                            .format(table, i, v.expense_claim, v.expense_ref, self.company, v.paid_by)
+                            .format(table, i, v.expense_claim, ref, self.company, v.paid_by)
                         )
                     else:
                         self._add_error(
@@ -592,22 +534,21 @@ class ExpensesEntry(Document):
             
             if v.party_type:
                 if not v.party:
-                    if v.expense_ref:
+                    if ref:
                         self._add_error(
                             _("{0} - Row #{1}: Party reference of expense reference \"{2}\" is invalid.")
-                            .format(table, i, v.expense_ref)
+                            .format(table, i, ref)
                         )
                     else:
                         self._add_error(
                             _("{0} - Row #{1}: A valid party reference is required.")
                             .format(table, i)
                         )
-                
-                if v.party_type not in tmp["parties"] or v.party not in tmp["parties"][v.party_type]:
-                    if v.expense_ref:
+                elif v.party not in tmp["parties"].get(v.party_type, ()):
+                    if ref:
                         self._add_error(
                             _("{0} - Row #{1}: {2} \"{3}\" of expense reference \"{4}\" is disabled or doesn't exist.")
-                            .format(table, i, v.party_type, v.party, v.expense_ref)
+                            .format(table, i, v.party_type, v.party, ref)
                         )
                     else:
                         self._add_error(
@@ -615,8 +556,6 @@ class ExpensesEntry(Document):
                             .format(table, i, v.party_type, v.party)
                         )
     
-        tmp.clear()
-    
     
     def _validate_payment(self):
         if self.payment_target == "Bank":
@@ -691,7 +630,7 @@ class ExpensesEntry(Document):
             self.flags.company_currency = ""
         else:
             from expenses.libs import get_company_currency
-        
+            
             self.flags.company_currency = get_company_currency(self.company, True)
     
     
@@ -699,29 +638,89 @@ class ExpensesEntry(Document):
         if not self.flags.company_currency or not _from:
             return 1.0
         
-        from expenses.libs import get_exchange_rate
+        from expenses.libs import get_exchange_rates
+        
+        multi = isinstance(_from, list)
+        if not multi:
+            _from = [_from]
+        
+        date = self.posting_date
+        if not date:
+            from frappe.utils import nowdate
+            
+            date = nowdate()
         
-        return get_exchange_rate(
-            _from, self.flags.company_currency,
-            self.posting_date, local=True
-        )
+        rates = get_exchange_rates([[v, date] for v in _from], self.flags.company_currency)
+        data = {k:rates.get((k, date)) or 1.0 for k in _from}
+        return data if multi else data[_from[0]]
+    
+    
+    def _get_entry_data(self):
+        if isinstance(self.flags.get("entry_data", 0), dict):
+            return self.flags.entry_data
+        
+        keys = {
+            "accounts": set(),
+            "projects": set(),
+            "centers": set(),
+            "employees": set(),
+            "claims": set(),
+            "parties": {}
+        }
+        if self.default_project:
+            keys["projects"].add(self.default_project)
+        if self.default_cost_center:
+            keys["centers"].add(self.default_cost_center)
+        
+        if self.expenses and self._expenses_changed:
+            for v in self.expenses:
+                if v.account:
+                    keys["accounts"].add(v.account)
+                if v.project:
+                    keys["projects"].add(v.project)
+                if v.cost_center:
+                    keys["centers"].add(v.cost_center)
+                if cint(v.is_paid):
+                    if v.paid_by:
+                        keys["employees"].add(v.paid_by)
+                    if v.expense_claim:
+                        keys["claims"].add(v.expense_claim)
+                if v.party_type and v.party:
+                    keys["parties"].setdefault(v.party_type, set()).add(v.party)
+        
+        from expenses.libs import prefetch_entry_data
+        
+        self.flags.entry_data = prefetch_entry_data(self.company, keys)
+        return self.flags.entry_data
     
     
     def _load_expenses_data(self):
         if isinstance(self.flags.get("expenses_data", ""), dict):
             return 0
         
+        self.flags.expenses_data = {}
         if not self.company:
-            self.flags.expenses_data = {}
             return 0
         
         data = [v.expense_ref for v in self.expenses if v.expense_ref]
         if not data:
-            self.flags.expenses_data = {}
-        else:
-            from expenses.libs import get_expenses_data
+            return 0
+        
+        if self.expenses_request_ref:
+            from expenses.libs import get_request_entry_data
+            
+            req = get_request_entry_data(self.expenses_request_ref)
+            if req and req["company"] == self.company:
+                skip = ["expense_ref", "attachments"]
+                for v in req["expenses"]:
+                    self.flags.expenses_data[v["expense_ref"]] = {k:x for k, x in v.items() if k not in skip}
                 
-            self.flags.expenses_data = get_expenses_data(data, self.company)
+                data = [v for v in data if v not in self.flags.expenses_data]
+        
+        if data:
+            from expenses.libs.expense import get_expenses_data
+            
+            self.flags.expenses_data.update(get_expenses_data(data, self.company))
             data.clear()
     
     
@@ -741,9 +740,16 @@ class ExpensesEntry(Document):
             files.clear()
     
     
+    def _dedupe_attachments(self):
+        if self.attachments and self.has_value_changed("attachments"):
+            from expenses.libs import enqueue_attachments_dedupe
+            
+            enqueue_attachments_dedupe([v.file for v in self.attachments])
+    
+    
     def _trash_files(self, files):
         from expenses.libs import delete_attach_files
-            
+        
         delete_attach_files(self.doctype, self.name, files)
     
     
@@ -761,6 +767,7 @@ class ExpensesEntry(Document):
             "def_posting_date",
             "expenses_data",
             "expenses_errors",
+            "entry_data",
             "has_expense_claim",
             "expense_claim_reqd",
             "request_status",
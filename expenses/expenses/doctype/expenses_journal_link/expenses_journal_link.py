@@ -0,0 +1,11 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+from frappe.model.document import Document
+
+
+class ExpensesJournalLink(Document):
+    pass
\ No newline at end of file
@@ -269,6 +269,7 @@ frappe.ui.form.on('Expenses Request', {
     },
     before_workflow_action: function(frm) {
         frm._req.workflow = cstr(frm.selected_workflow_action);
+        frm.events.set_expenses_versions(frm);
         if (frm._req.workflow !== 'Reject' || frappe.exp().$isStrVal(frm.doc.reviewer)) {
             frm._req.toolbar = 0;
             return Promise.resolve();
@@ -287,6 +288,14 @@ frappe.ui.form.on('Expenses Request', {
         delete frm._req.workflow;
         frappe.exp().success_(__('Expenses request has been {0} successfully.', [action]));
     },
+    set_expenses_versions: function(frm) {
+        let versions = {};
+        for (let k in frm._req.cache) {
+            if (frm._req.cache[k].modified)
+                versions[k] = cstr(frm._req.cache[k].modified);
+        }
+        frm.doc.expenses_versions = versions;
+    },
     process_rejection: function(frm) {
         frappe.prompt(
             [{
@@ -11,10 +11,12 @@ from frappe.model.document import Document
 
 from expenses.libs import (
     clear_doc_cache,
+    profile_hooks,
     RequestStatus
 )
 
 
+@profile_hooks
 class ExpensesRequest(Document):
     def before_insert(self):
         self._check_app_status()
@@ -260,7 +262,7 @@ class ExpensesRequest(Document):
         if is_request_amended(self.name):
             from expenses.libs import restore_expenses
             
-            restore_expenses([v.expense for v in self.expenses])
+            restore_expenses([v.expense for v in self.expenses], self.name)
     
     
     def _update_expenses(self):
@@ -269,15 +271,26 @@ class ExpensesRequest(Document):
             if self.flags.expenses_status == 1:
                 from expenses.libs import request_expenses
                 
-                request_expenses(expenses)
+                request_expenses(expenses, self.name)
             elif self.flags.expenses_status == 2:
                 from expenses.libs import approve_expenses
                 
-                approve_expenses(expenses)
+                approve_expenses(expenses, self.name, self._get_expenses_versions())
             elif self.flags.expenses_status == 3:
                 from expenses.libs import reject_expenses
                 
-                reject_expenses(expenses)
+                reject_expenses(expenses, self.name, self._get_expenses_versions())
+    
+    
+    def _get_expenses_versions(self):
+        # Sent by the form, the expenses versions the reviewer has seen
+        versions = self.get("expenses_versions")
+        if versions and isinstance(versions, str):
+            from expenses.libs import parse_json
+            
+            versions = parse_json(versions)
+        
+        return versions if versions and isinstance(versions, dict) else None
     
     
     def _change_status(self, status, action, ignore_permissions=False, reason=None):
@@ -41,6 +41,11 @@ class ExpensesSettings(Document):
         return cint(self.reqd_expense_claim_if_paid) > 0
     
     
+    @property
+    def _enable_profiler(self):
+        return cint(self.enable_profiler) > 0
+    
+    
     @property
     def _auto_check_for_update(self):
         return cint(self.auto_check_for_update) > 0
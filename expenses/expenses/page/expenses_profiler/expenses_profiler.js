@@ -0,0 +1,62 @@
+/*
+*  Expenses © 2024
+*  Author:  Ameen Ahmed
+*  Company: Level Up Marketing & Software Development Services
+*  Licence: Please refer to LICENSE file
+*/
+
+
+frappe.pages['expenses-profiler'].on_page_load = function(wrapper) {
+    let page = frappe.ui.make_app_page({
+        parent: wrapper,
+        title: __('Expenses Profiler'),
+        single_column: true
+    });
+    let $body = $('<div class="frappe-card p-3"></div>').appendTo(page.main);
+    let fmt = function(v) { return cstr(flt(v, 2)); };
+    let render = function(data) {
+        if (!data || !data.length) {
+            $body.html('<p class="text-muted">' + __('No profiler samples recorded. Enable the profiler in Expenses Settings.') + '</p>');
+            return;
+        }
+        let head = [__('DocType'), __('Phase'), __('Count')],
+        rows = [];
+        ['wall', 'db', 'redis'].forEach(function(k) {
+            ['p50', 'p95', 'p99'].forEach(function(p) {
+                head.push((k === 'wall' ? __('Wall (ms)') : (k === 'db' ? __('DB') : __('Redis'))) + ' ' + p);
+            });
+        });
+        data.forEach(function(v) {
+            let row = [frappe.utils.escape_html(v.doctype), frappe.utils.escape_html(v.phase), cint(v.count)];
+            ['wall', 'db', 'redis'].forEach(function(k) {
+                ['p50', 'p95', 'p99'].forEach(function(p) {
+                    row.push(fmt(v[k][p]));
+                });
+            });
+            rows.push('<tr><td>' + row.join('</td><td>') + '</td></tr>');
+        });
+        $body.html(
+            '<table class="table table-bordered table-sm">'
+            + '<thead><tr><th>' + head.join('</th><th>') + '</th></tr></thead>'
+            + '<tbody>' + rows.join('') + '</tbody>'
+            + '</table>'
+        );
+    };
+    let refresh = function() {
+        frappe.call({
+            method: 'expenses.libs.profiler.get_profiler_stats',
+            callback: function(r) { render(r && r.message); }
+        });
+    };
+    page.set_primary_action(__('Refresh'), refresh, 'refresh');
+    page.set_secondary_action(__('Reset'), function() {
+        frappe.confirm(__('Clear all recorded profiler samples?'), function() {
+            frappe.call({
+                method: 'expenses.libs.profiler.reset_profiler_stats',
+                type: 'POST',
+                callback: refresh
+            });
+        });
+    });
+    refresh();
+};
\ No newline at end of file
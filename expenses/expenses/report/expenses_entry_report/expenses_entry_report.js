@@ -46,5 +46,20 @@ frappe.query_reports['Expenses Entry Report'] = {
             'label': __('Show Cancelled Entries'),
             'fieldtype': 'Check'
         },
+        {
+            'fieldname': 'page',
+            'label': __('Page'),
+            'fieldtype': 'Int',
+            'default': 1,
+            'width': '60px'
+        },
+        {
+            'fieldname': 'page_length',
+            'label': __('Page Length'),
+            'fieldtype': 'Select',
+            'options': ['100', '500', '1000', '5000'],
+            'default': '500',
+            'width': '60px'
+        },
     ]
 };
\ No newline at end of file
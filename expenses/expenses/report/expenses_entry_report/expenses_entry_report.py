@@ -9,6 +9,10 @@ from frappe import _, throw
 from frappe.utils import cint, flt
 
 
+_PAGE_LENGTH = 500
+_MAX_PAGE_LENGTH = 5000
+
+
 def execute(filters=None):
     if not filters:
         return [], []
@@ -22,11 +26,13 @@ def execute(filters=None):
         "default_currency"
     )
     columns = get_columns(currency)
-    data = get_result(filters, currency)
-    totals = get_totals(data)
+    totals, count = get_totals(filters)
+    start, page_length = get_page(filters)
+    data = get_result(filters, currency, start, page_length) if count > start else []
     chart = get_chart_data(totals, currency)
     summary = get_report_summary(totals, currency)
-    return columns, data, None, chart, summary
+    message = get_page_message(start, len(data), count)
+    return columns, data, message, chart, summary
 
 
 def validate_filters(filters):
@@ -87,9 +93,47 @@ def get_columns(currency):
     ]
 
 
-def get_result(filters, currency):
+def get_page(filters):
+    page_length = cint(filters.get("page_length")) or _PAGE_LENGTH
+    page_length = min(max(page_length, 1), _MAX_PAGE_LENGTH)
+    page = max(cint(filters.get("page")), 1)
+    return (page - 1) * page_length, page_length
+
+
+def get_page_message(start, length, count):
+    if not count or (not start and length >= count):
+        return None
+    
+    if not length:
+        return _("No entries on this page, only {0} entries match the filters.").format(count)
+    
+    return _("Showing entries {0} to {1} of {2}.").format(start + 1, start + length, count)
+
+
+def get_conditions(doc, filters):
+    conds = [
+        doc.company == filters.get("company"),
+        doc.posting_date.between(
+            filters.get("from_date"),
+            filters.get("to_date")
+        )
+    ]
+    if (mode_of_payment := filters.get("mode_of_payment")):
+        conds.append(doc.mode_of_payment == mode_of_payment)
+    
+    if cint(filters.get("show_cancelled_entries")):
+        conds.append(doc.docstatus > 0)
+    else:
+        conds.append(doc.docstatus == 1)
+    
+    return conds
+
+
+def get_result(filters, currency, start=0, page_length=_PAGE_LENGTH):
+    from pypika.terms import Criterion, ValueWrapper
+    
     doc = frappe.qb.DocType("Expenses Entry")
-    qry = (
+    return (
         frappe.qb.from_(doc)
         .select(
             doc.name.as_("expenses_entry"),
@@ -98,41 +142,47 @@ def get_result(filters, currency):
             doc.total,
             doc.payment_reference,
             doc.clearance_date,
-            doc.remarks
+            doc.remarks,
+            ValueWrapper(currency).as_("currency")
         )
-        .where(doc.company == filters.get("company"))
-        .where(doc.posting_date.between([
-            filters.get("from_date"),
-            filters.get("to_date")
-        ]))
+        .where(Criterion.all(get_conditions(doc, filters)))
         .orderby(doc.posting_date, doc.creation)
-    )
-    
-    if (mode_of_payment := filters.get("mode_of_payment")):
-        qry = qry.where(doc.mode_of_payment == mode_of_payment)
-    
-    if cint(filters.get("show_cancelled_entries")):
-        qry = qry.where(doc.docstatus > 0)
-    else:
-        qry = qry.where(doc.docstatus == 1)
-    
-    data = qry.run(as_dict=True)
-    for i in range(len(data)):
-        data[i]["currency"] = currency
-    
-    return data
+        .limit(page_length)
+        .offset(start)
+    ).run(as_dict=True)
 
 
-def get_totals(data):
+def get_totals(filters):
+    from pypika.functions import Count, Sum
+    from pypika.terms import Criterion
+    
+    doc = frappe.qb.DocType("Expenses Entry")
+    mdoc = frappe.qb.DocType("Mode of Payment")
+    data = (
+        frappe.qb.from_(mdoc)
+        .select(
+            mdoc.name,
+            mdoc.type,
+            Count(doc.name).as_("count"),
+            Sum(doc.total).as_("total")
+        )
+        .left_join(doc)
+        .on(Criterion.all(
+            [doc.mode_of_payment == mdoc.name] +
+            get_conditions(doc, filters)
+        ))
+        .groupby(mdoc.name, mdoc.type)
+        .orderby(mdoc.name)
+    ).run(as_dict=True)
     totals = {"*": 0}
-    for v in get_mode_of_payments():
-        totals[v] = 0
+    count = 0
     for v in data:
         totals["*"] += flt(v["total"])
-        if v["mode_of_payment"] in totals:
-            totals[v["mode_of_payment"]] += flt(v["total"])
+        count += cint(v["count"])
+        if v["type"] in ("Bank", "Cash"):
+            totals[v["name"]] = flt(v["total"])
     
-    return totals
+    return totals, count
 
 
 def get_chart_data(totals, currency):
@@ -170,15 +220,4 @@ def get_report_summary(totals, currency):
             "currency": currency,
         })
     
-    return summary
-
-
-def get_mode_of_payments():
-    return frappe.list_all(
-        "Mode of Payment",
-        fields=["name"],
-        filters={
-            "type": ["in", ["Bank", "Cash"]]
-        },
-        pluck="name"
-    )
\ No newline at end of file
+    return summary
\ No newline at end of file
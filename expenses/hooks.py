@@ -47,9 +47,25 @@ fixtures = [
 ]
 
 
+doc_events = {
+    "Currency Exchange": {
+        "on_update": "expenses.libs.exchange.clear_exchange_rates",
+        "on_trash": "expenses.libs.exchange.clear_exchange_rates"
+    }
+}
+
+
 scheduler_events = {
+    "all": [
+        "expenses.libs.status_job.resume_status_jobs",
+        "expenses.libs.summary.update_expenses_summary",
+        "expenses.libs.journal.resume_journal_entries",
+        "expenses.libs.attachment.resume_files_delete"
+    ],
     "daily": [
-        "expenses.libs.update.auto_check_for_update"
+        "expenses.libs.update.auto_check_for_update",
+        "expenses.libs.summary.rebuild_expenses_summary",
+        "expenses.libs.attachment.sweep_orphan_attachments"
     ]
 }
 
@@ -4,79 +4,187 @@
 # Licence: Please refer to LICENSE file
 
 
-from .account import (
-    get_account_currency,
-    get_accounts_currencies
-)
-from .attachment import delete_attach_files
-from .cache import *
-from .check import *
-from .common import *
-from .company import get_company_currency
-from .entry import (
-    get_mode_of_payment_data,
-    is_entry_moderator,
-    entry_form_setup,
-    get_request_data
-)
-from .exchange import get_exchange_rate
-from .expense import (
-    ExpenseStatus,
-    item_expense_data,
-    expense_form_setup,
-    is_expense_moderator,
-    has_expense_claim,
-    expense_claim_reqd_if_paid,
-    is_valid_claim,
-    expense_requests_exists,
-    expense_entries_exists,
-    get_expenses_data
-)
-from .filter import *
-from .item import (
-    search_item_types,
-    get_type_accounts_list,
-    search_items
-)
-from .journal import (
-    enqueue_journal_entry,
-    cancel_journal_entry
-)
-from .logger import (
-    get_log_files,
-    load_log_file
-)
-from .realtime import *
-from .request import (
-    RequestStatus,
-    get_filtered_company_expenses,
-    is_request_amended,
-    restore_expenses,
-    request_expenses,
-    approve_expenses,
-    reject_expenses,
-    request_form_setup,
-    is_request_moderator,
-    is_request_reviewer,
-    get_expenses_data,
-    search_company_expenses,
-    filter_company_expenses,
-    reject_request,
-    process_request,
-    reject_request
-)
-from .system import (
-    settings,
-    is_enabled,
-    check_app_status
-)
-from .type import (
-    disable_type_descendants,
-    reload_type_linked_items,
-    search_types,
-    get_companies_accounts,
-    convert_group_to_item,
-    convert_item_to_group,
-    get_type_children
-)
-from .update import check_for_update
\ No newline at end of file
+# [Internal]
+_LAZY_MODULES = {
+    "account": [
+        "get_account_currency",
+        "get_accounts_currencies",
+        "rebuild_type_accounts",
+        "remove_type_accounts",
+        "reset_type_accounts"
+    ],
+    "attachment": [
+        "delete_attach_files",
+        "enqueue_attachments_dedupe"
+    ],
+    "cache": [
+        "get_cache",
+        "set_cache",
+        "get_cache_stats",
+        "get_cached_doc",
+        "clear_doc_cache",
+        "clear_docs_cache",
+        "get_cached_value"
+    ],
+    "check": [
+        "user_exists",
+        "type_children_exists",
+        "type_items_exists",
+        "type_exists",
+        "item_exists",
+        "uom_exists",
+        "has_item_expenses",
+        "company_exists",
+        "employee_exists",
+        "party_exists",
+        "can_use_expense_claim",
+        "expense_claim_exists",
+        "expense_exists",
+        "mode_of_payment_exists",
+        "project_exists",
+        "cost_center_exists",
+        "get_count"
+    ],
+    "common": [
+        "store_error",
+        "store_info",
+        "log_error",
+        "error",
+        "parse_json",
+        "to_json",
+        "to_str",
+        "get_str",
+        "json_to_list"
+    ],
+    "company": [
+        "get_company_currency"
+    ],
+    "context": [
+        "ExpenseContext"
+    ],
+    "entry": [
+        "get_mode_of_payment_data",
+        "is_entry_moderator",
+        "entry_form_setup",
+        "get_request_data",
+        "prefetch_entry_data"
+    ],
+    "exchange": [
+        "get_exchange_rate",
+        "get_exchange_rates"
+    ],
+    "expense": [
+        "ExpenseStatus",
+        "item_expense_data",
+        "expense_form_setup",
+        "is_expense_moderator",
+        "has_expense_claim",
+        "expense_claim_reqd_if_paid",
+        "is_valid_claim",
+        "get_cost_qty_bounds",
+        "check_cost_qty",
+        "expense_requests_exists",
+        "expense_entries_exists"
+    ],
+    "filter": [
+        "users_filter",
+        "companies_filter",
+        "company_accounts_filter",
+        "projects_filter",
+        "cost_centers_filter",
+        "employees_filter",
+        "expense_claims_filter",
+        "parties_filter",
+        "all_filter"
+    ],
+    "importer": [
+        "import_expenses"
+    ],
+    "item": [
+        "search_item_types",
+        "get_type_accounts_list",
+        "search_items"
+    ],
+    "journal": [
+        "enqueue_journal_entry",
+        "cancel_journal_entry"
+    ],
+    "profiler": [
+        "profile_hooks",
+        "get_profiler_stats",
+        "reset_profiler_stats"
+    ],
+    "realtime": [
+        "emit_settings_changed",
+        "emit_event"
+    ],
+    "request": [
+        "RequestStatus",
+        "get_filtered_company_expenses",
+        "is_request_amended",
+        "restore_expenses",
+        "request_expenses",
+        "approve_expenses",
+        "reject_expenses",
+        "request_form_setup",
+        "is_request_moderator",
+        "is_request_reviewer",
+        "get_expenses_data",
+        "search_company_expenses",
+        "filter_company_expenses",
+        "get_request_expenses_progress",
+        "get_request_entry_data",
+        "reject_request",
+        "process_request"
+    ],
+    "search": [
+        "update_search_index",
+        "remove_search_index",
+        "rename_search_index"
+    ],
+    "summary": [
+        "mark_expense_summary",
+        "get_expenses_summary"
+    ],
+    "system": [
+        "settings",
+        "check_app_status"
+    ],
+    "type": [
+        "disable_type_descendants",
+        "reload_type_linked_items",
+        "search_types",
+        "get_companies_accounts",
+        "convert_group_to_item",
+        "convert_item_to_group",
+        "get_type_children"
+    ],
+    "update": [
+        "check_for_update"
+    ]
+}
+_LAZY_ATTRS = {
+    name:mod
+    for mod, names in _LAZY_MODULES.items()
+    for name in names
+}
+__all__ = list(_LAZY_ATTRS)
+
+
+# [Internal]
+def __getattr__(name: str):
+    mod = _LAZY_ATTRS.get(name)
+    if mod is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    
+    import importlib
+    
+    value = getattr(importlib.import_module(f".{mod}", __name__), name)
+    # Later lookups hit the module dict and skip this hook
+    globals()[name] = value
+    return value
+
+
+# [Internal]
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
\ No newline at end of file
@@ -7,81 +7,151 @@
 import frappe
 
 
+# [Internal]
+_TYPE_ACCOUNTS_KEY = "Expense Type-accounts-map"
+_TYPE_ACCOUNTS_BUILT = "__built__"
+
+
 # [Item]
 def get_type_accounts(type_name: str, defs: dict=None):
-    from .cache import get_cache
+    cache = frappe.cache()
+    data = cache.hget(_TYPE_ACCOUNTS_KEY, type_name)
+    if data is None:
+        if cache.hget(_TYPE_ACCOUNTS_KEY, _TYPE_ACCOUNTS_BUILT):
+            return None
+        
+        rebuild_type_accounts()
+        data = cache.hget(_TYPE_ACCOUNTS_KEY, type_name)
+        if data is None:
+            return None
     
+    data = [v.copy() for v in data]
+    if defs:
+        for v in data:
+            v.update(defs)
+    
+    return data
+
+
+# [E Type, Type, Internal]
+def rebuild_type_accounts(type_name: str=None):
     dt = "Expense Type"
-    key = f"{type_name}-expense-accounts"
-    data = get_cache(dt, key)
-    if data:
-        return data
+    doc = frappe.qb.DocType(dt)
+    qry = (
+        frappe.qb.from_(doc)
+        .select(
+            doc.name,
+            doc.parent_type,
+            doc.disabled
+        )
+        .orderby(doc.lft)
+    )
+    base = {}
+    if type_name:
+        node = frappe.db.get_value(dt, type_name, ["lft", "rgt", "parent_type"], as_dict=True)
+        if not node:
+            return remove_type_accounts(type_name)
+        
+        if node.parent_type:
+            parent = frappe.cache().hget(_TYPE_ACCOUNTS_KEY, node.parent_type)
+            if parent is None:
+                return rebuild_type_accounts()
+            
+            base[node.parent_type] = parent
+        
+        qry = qry.where(doc.lft.gte(node.lft)).where(doc.rgt.lte(node.rgt))
     
-    raw = get_type_accounts_data(type_name)
-    if not raw:
-        return raw
+    types = qry.run(as_dict=True)
+    if not types:
+        return 0
     
-    from .cache import set_cache
+    own = get_types_own_accounts([v["name"] for v in types])
+    from frappe.utils import cint
     
-    data = []
-    exists = []
-    for i in range(len(raw)):
-        v = raw.pop(0)
-        if v["company"] in exists:
-            continue
+    data = {}
+    for v in types:
+        rows = []
+        exist = set()
+        if not cint(v["disabled"]):
+            for x in own.get(v["name"], []):
+                if x["company"] not in exist:
+                    exist.add(x["company"])
+                    rows.append(x)
         
-        exists.append(v["company"])
-        if defs:
-            v.update(defs)
+        parent = data.get(v["parent_type"], base.get(v["parent_type"], []))
+        for x in parent:
+            if x["company"] not in exist:
+                exist.add(x["company"])
+                rows.append(x)
         
-        data.append(v)
+        data[v["name"]] = rows
     
-    exists.clear()
-    set_cache(dt, key, data)
-    return data
+    _store_type_accounts(data, not type_name)
+    return len(data)
+
+
+# [E Type, Internal]
+def remove_type_accounts(type_name: str):
+    cache = frappe.cache()
+    cache.hdel(_TYPE_ACCOUNTS_KEY, type_name)
+    return 0
+
+
+# [E Type, Setup]
+def reset_type_accounts():
+    frappe.cache().delete_value(_TYPE_ACCOUNTS_KEY)
 
 
 # [Internal]
-def get_type_accounts_data(type_name: str, company: str=None):
-    from .cache import get_cached_value
-    
+def get_types_own_accounts(types: list):
     dt = "Expense Type"
-    parent = get_cached_value(dt, type_name, ["lft", "rgt"])
-    if not parent:
-        return None
-    
-    from pypika.enums import Order
-    
     doc = frappe.qb.DocType(f"{dt} Account")
-    pdoc = frappe.qb.DocType(dt)
     adoc = frappe.qb.DocType("Account")
-    qry = (
+    raw = (
         frappe.qb.from_(doc)
         .select(
+            doc.parent,
             doc.company,
             doc.account,
             adoc.account_currency.as_("currency")
         )
-        .inner_join(pdoc)
-        .on(pdoc.name == doc.parent)
         .left_join(adoc)
         .on(adoc.name == doc.account)
         .where(doc.parenttype == dt)
         .where(doc.parentfield == "expense_accounts")
-        .where(pdoc.disabled == 0)
-        .where(pdoc.lft.lte(parent.lft))
-        .where(pdoc.rgt.gte(parent.rgt))
-        .orderby(pdoc.rgt - pdoc.lft, order=Order.asc)
-    )
-    if company:
-        qry = qry.where(doc.company == company)
-        qry = qry.limit(1)
+        .where(doc.parent.isin(types))
+        .orderby(doc.parent, doc.idx)
+    ).run(as_dict=True)
+    data = {}
+    if raw and isinstance(raw, list):
+        for v in raw:
+            k = v.pop("parent")
+            if k not in data:
+                data[k] = []
+            
+            data[k].append(v)
     
-    data = qry.run(as_dict=True)
-    if not data or not isinstance(data, list):
-        return None if company else []
+    return data
+
+
+# [Internal]
+def _store_type_accounts(data: dict, full: bool):
+    import pickle
     
-    return data.pop(0) if company else data
+    cache = frappe.cache()
+    key = cache.make_key(_TYPE_ACCOUNTS_KEY)
+    pipe = cache.pipeline()
+    if full:
+        pipe.delete(key)
+    for k, v in data.items():
+        pipe.hset(key, k, pickle.dumps(v))
+    if full:
+        pipe.hset(key, _TYPE_ACCOUNTS_BUILT, pickle.dumps(1))
+    pipe.execute()
+    # Drop the request-local copy kept by RedisWrapper.hget
+    local = getattr(frappe.local, "cache", None)
+    if isinstance(local, dict):
+        local.pop(key, None)
 
 
 # [Item]
@@ -104,6 +174,12 @@ def query_items_with_company_account(company: str):
 
 # [Item]
 def get_item_company_account_data(parent: str, company: str):
+    data = get_items_company_accounts_data([[parent, company]])
+    return data.get((parent, company)) if data else None
+
+
+# [Item]
+def get_items_company_accounts_data(pairs: list):
     dt = "Expense Item"
     doc = frappe.qb.DocType(f"{dt} Account")
     pdoc = frappe.qb.DocType(dt)
@@ -111,6 +187,8 @@ def get_item_company_account_data(parent: str, company: str):
     data = (
         frappe.qb.from_(doc)
         .select(
+            doc.parent,
+            doc.company,
             pdoc.uom,
             doc.account,
             adoc.account_currency.as_("currency"),
@@ -127,23 +205,31 @@ def get_item_company_account_data(parent: str, company: str):
         .on(adoc.name == doc.account)
         .where(doc.parenttype == dt)
         .where(doc.parentfield == "expense_accounts")
-        .where(doc.parent == parent)
-        .where(doc.company == company)
-        .limit(1)
+        .where(doc.parent.isin(list({v[0] for v in pairs})))
+        .where(doc.company.isin(list({v[1] for v in pairs})))
+        .orderby(doc.idx)
     ).run(as_dict=True)
     if not data or not isinstance(data, list):
-        return None
+        return {}
     
     from frappe.utils import flt
     
-    data = data.pop(0)
-    for k in ["cost", "qty"]:
-        for x in [k, f"min_{k}", f"max_{k}"]:
-            data[x] = flt(data[x])
-            if data[x] < 0.0:
-                data[x] = 0.0
+    keys = {(v[0], v[1]) for v in pairs}
+    result = {}
+    for v in data:
+        key = (v.pop("parent"), v.pop("company"))
+        if key not in keys or key in result:
+            continue
+        
+        for k in ["cost", "qty"]:
+            for x in [k, f"min_{k}", f"max_{k}"]:
+                v[x] = flt(v[x])
+                if v[x] < 0.0:
+                    v[x] = 0.0
+        
+        result[key] = v
     
-    return data
+    return result
 
 
 # [E Entry, Entry]
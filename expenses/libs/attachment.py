@@ -6,6 +6,22 @@
 
 import frappe
 
+from .profiler import profile
+
+
+# [Internal]
+_ATTACH_DOCTYPES = ["Expense", "Expenses Entry"]
+_ATTACH_PENDING_KEY = "Expense Attachment-pending"
+_ATTACH_JOB = "exp-attachments-gc"
+_ATTACH_WINDOW = 5
+_ATTACH_BATCH = 500
+_ATTACH_ORPHAN_HOURS = 24
+_ATTACH_SWEEP_LIMIT = 5000
+_ATTACH_HASH_DT = "Expenses File Hash"
+_ATTACH_HASH_KEY = "Expense Attachment-dedupe"
+_ATTACH_HASH_JOB = "exp-attachments-dedupe"
+_ATTACH_HASH_CHUNK = 65536
+
 
 # [E Entry, E Entry Form, E Expense, E Expense Form]
 @frappe.whitelist(methods=["POST"])
@@ -24,16 +40,6 @@ def delete_attach_files(doctype, name, files):
     if not files or not isinstance(files, list):
         return 0
     
-    from .background import (
-        uuid_key,
-        is_job_running
-    )
-    
-    job_id = uuid_key([doctype, files])
-    job_id = f"exp-files-delete-{job_id}"
-    if is_job_running(job_id):
-        return 1
-    
     files = frappe.get_all(
         "File",
         fields=["name"],
@@ -49,23 +55,175 @@ def delete_attach_files(doctype, name, files):
     if not files or not isinstance(files, list):
         return 0
     
-    from .background import enqueue_job
+    enqueue_files_delete(files)
+    return 1
+
+
+# [Internal]
+def enqueue_files_delete(files: list):
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.sadd(cache.make_key(_ATTACH_PENDING_KEY), *files)
+    pipe.execute()
+    _enqueue_files_gc()
+
+
+# [Hooks]
+def resume_files_delete():
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.scard(cache.make_key(_ATTACH_PENDING_KEY))
+    if pipe.execute()[0]:
+        _enqueue_files_gc()
+
+
+# [Internal]
+@profile("delete_pending_files")
+def delete_pending_files():
+    import time
+    
+    from .common import store_info
+    
+    # Give removals from other documents a moment to join the batch
+    time.sleep(_ATTACH_WINDOW)
+    total = 0
+    while True:
+        names = _pop_pending_files(_ATTACH_BATCH)
+        if not names:
+            break
         
-    enqueue_job(
-        "expenses.libs.attachment.files_delete",
-        job_id,
-        timeout=len(files) * 3,
-        files=files
-    )
+        total += _delete_files(names)
+        frappe.db.commit()
     
-    return 1
+    store_info({
+        "action": "delete_pending_files",
+        "deleted": total
+    })
+    return total
 
 
 # [Internal]
 def files_delete(files: list):
-    files = list(set(files))
-    for i in range(len(files)):
-        frappe.get_doc("File", files.pop(0)).delete(ignore_permissions=True)
+    return _delete_files(list(set(files)))
+
+
+# [E Entry, E Expense]
+def enqueue_attachments_dedupe(files: list):
+    files = list({v for v in files if v})
+    if not files:
+        return 0
+    
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.sadd(cache.make_key(_ATTACH_HASH_KEY), *files)
+    pipe.execute()
+    
+    from .background import enqueue_unique_job
+    
+    enqueue_unique_job(
+        "expenses.libs.attachment.dedupe_pending_files",
+        _ATTACH_HASH_JOB,
+        _ATTACH_HASH_KEY,
+        timeout=1500
+    )
+
+
+# [Internal]
+@profile("dedupe_pending_files")
+def dedupe_pending_files():
+    import time
+    
+    from .common import store_error, store_info
+    
+    time.sleep(_ATTACH_WINDOW)
+    total = 0
+    while True:
+        urls = _pop_pending_files(_ATTACH_BATCH, _ATTACH_HASH_KEY)
+        if not urls:
+            break
+        
+        removed = []
+        for i, url in enumerate(urls):
+            savepoint = f"exp_dedupe_{i}"
+            frappe.db.savepoint(savepoint)
+            try:
+                total += dedupe_file(url, removed)
+            except Exception as exc:
+                frappe.db.rollback(save_point=savepoint)
+                store_error(exc)
+        
+        frappe.db.commit()
+        # Copies are only removed once the repointed rows are saved
+        for url in removed:
+            _remove_file(url)
+    
+    store_info({
+        "action": "dedupe_pending_files",
+        "deduplicated": total
+    })
+    return total
+
+
+# [Internal]
+def dedupe_file(url: str, removed: list):
+    import os
+    
+    # Only uploads known to the File doctype are shared
+    if not frappe.db.exists("File", {"file_url": url}):
+        return 0
+    
+    path = _get_file_path(url)
+    if not path or not os.path.isfile(path):
+        return 0
+    
+    content_hash, size = _hash_file(path)
+    private = 1 if url.startswith("/private/") else 0
+    key = f"{content_hash}-{private}"
+    blob = frappe.db.get_value(_ATTACH_HASH_DT, key, "file_url")
+    if not blob:
+        _add_file_hash(key, content_hash, url, private, size)
+        return 0
+    if blob == url:
+        return 0
+    
+    blob_path = _get_file_path(blob)
+    if not blob_path or not os.path.isfile(blob_path):
+        # The stored blob is gone, so this copy becomes the shared one
+        frappe.db.set_value(_ATTACH_HASH_DT, key, "file_url", url, update_modified=False)
+        return 0
+    
+    _repoint_file(url, blob)
+    if url not in _get_referenced_urls([url]):
+        removed.append(url)
+    
+    return 1
+
+
+# [Hooks]
+def sweep_orphan_attachments():
+    from frappe.utils import add_to_date, now_datetime
+    
+    doc = frappe.qb.DocType("File")
+    adoc = frappe.qb.DocType("Expense Attachment")
+    names = (
+        frappe.qb.from_(doc)
+        .select(doc.name)
+        .left_join(adoc)
+        # Uploads made before the parent was saved carry no parent name,
+        # so any attachment row using the url keeps the file
+        .on(adoc.file == doc.file_url)
+        .where(doc.attached_to_doctype.isin(_ATTACH_DOCTYPES))
+        # Only uploads of the attachments table, sidebar files are kept
+        .where(doc.attached_to_field == "file")
+        .where(doc.is_folder == 0)
+        .where(doc.creation < add_to_date(now_datetime(), hours=-_ATTACH_ORPHAN_HOURS))
+        .where(adoc.name.isnull())
+        .limit(_ATTACH_SWEEP_LIMIT)
+    ).run(pluck=True)
+    if names:
+        enqueue_files_delete(names)
+    
+    return len(names) if names else 0
 
 
 # [Expense]
@@ -94,4 +252,231 @@ def get_files_by_parents(parents: list, parent_type: str, parent_field: str):
         
         data[k].append(v)
     
-    return data
\ No newline at end of file
+    return data
+
+
+# [Internal]
+def _enqueue_files_gc():
+    from .background import enqueue_unique_job
+    
+    enqueue_unique_job(
+        "expenses.libs.attachment.delete_pending_files",
+        _ATTACH_JOB,
+        _ATTACH_PENDING_KEY,
+        timeout=1500
+    )
+
+
+# [Internal]
+def _pop_pending_files(count: int, key: str=None):
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.spop(cache.make_key(key or _ATTACH_PENDING_KEY), count)
+    data = pipe.execute()[0]
+    if not data:
+        return None
+    
+    return [frappe.safe_decode(v) for v in data]
+
+
+# [Internal]
+def _delete_files(names: list):
+    dt = "File"
+    doc = frappe.qb.DocType(dt)
+    rows = (
+        frappe.qb.from_(doc)
+        .select(
+            doc.name,
+            doc.file_url,
+            doc.thumbnail_url
+        )
+        .where(doc.name.isin(names))
+        .where(doc.is_folder == 0)
+    ).run(as_dict=True)
+    if not rows:
+        return 0
+    
+    # Files still used by an attachment row keep their record
+    attached = _get_attached_urls([v["file_url"] for v in rows if v["file_url"]])
+    if attached:
+        rows = [v for v in rows if v["file_url"] not in attached]
+        if not rows:
+            return 0
+    
+    names = [v["name"] for v in rows]
+    (
+        frappe.qb.from_(doc)
+        .delete()
+        .where(doc.name.isin(names))
+    ).run()
+    
+    urls = set()
+    for v in rows:
+        if v["file_url"]:
+            urls.add(v["file_url"])
+        if v["thumbnail_url"]:
+            urls.add(v["thumbnail_url"])
+    
+    if urls:
+        # Content still referenced elsewhere must stay on disk
+        urls.difference_update(_get_referenced_urls(list(urls)))
+        for url in urls:
+            _remove_file(url)
+        
+        if urls:
+            hdoc = frappe.qb.DocType(_ATTACH_HASH_DT)
+            (
+                frappe.qb.from_(hdoc)
+                .delete()
+                .where(hdoc.file_url.isin(list(urls)))
+            ).run()
+    
+    return len(names)
+
+
+# [Internal]
+def _get_referenced_urls(urls: list):
+    doc = frappe.qb.DocType("File")
+    data = (
+        frappe.qb.from_(doc)
+        .select(doc.file_url)
+        .where(doc.file_url.isin(urls))
+    ).run(pluck=True) or []
+    data += (
+        frappe.qb.from_(doc)
+        .select(doc.thumbnail_url)
+        .where(doc.thumbnail_url.isin(urls))
+    ).run(pluck=True) or []
+    return _get_attached_urls(urls).union(data)
+
+
+# [Internal]
+def _get_attached_urls(urls: list):
+    if not urls:
+        return set()
+    
+    adoc = frappe.qb.DocType("Expense Attachment")
+    return set((
+        frappe.qb.from_(adoc)
+        .select(adoc.file)
+        .where(adoc.file.isin(urls))
+    ).run(pluck=True) or [])
+
+
+# [Internal]
+def _remove_file(url: str):
+    import os
+    
+    path = _get_file_path(url)
+    if not path:
+        return 0
+    
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except Exception as exc:
+        from .common import store_error
+        
+        store_error(exc)
+        return 0
+    
+    return 1
+
+
+# [Internal]
+def _get_file_path(url: str):
+    import os
+    from urllib.parse import unquote
+    
+    url = unquote(url)
+    if url.startswith("/private/files/"):
+        base = frappe.get_site_path("private", "files")
+        url = url[len("/private/files/"):]
+    elif url.startswith("/files/"):
+        base = frappe.get_site_path("public", "files")
+        url = url[len("/files/"):]
+    else:
+        return None
+    
+    # Urls are user input, so the resolved path must stay in the files folder
+    base = os.path.realpath(base)
+    path = os.path.realpath(os.path.join(base, url))
+    if not path.startswith(base + os.sep):
+        return None
+    
+    return path
+
+
+# [Internal]
+def _hash_file(path: str):
+    import hashlib
+    
+    sha = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_ATTACH_HASH_CHUNK), b""):
+            sha.update(chunk)
+            size += len(chunk)
+    
+    return sha.hexdigest(), size
+
+
+# [Internal]
+def _add_file_hash(key: str, content_hash: str, url: str, private: int, size: int):
+    from frappe.utils import now
+    
+    ts = now()
+    doc = frappe.get_doc({
+        "doctype": _ATTACH_HASH_DT,
+        "name": key,
+        "creation": ts,
+        "modified": ts,
+        "owner": frappe.session.user,
+        "modified_by": frappe.session.user,
+        "content_key": key,
+        "content_hash": content_hash,
+        "is_private": private,
+        "file_url": url,
+        "file_size": size
+    })
+    try:
+        doc.db_insert()
+    except frappe.DuplicateEntryError:
+        return 0
+    
+    return 1
+
+
+# [Internal]
+def _repoint_file(url: str, blob: str):
+    doc = frappe.qb.DocType("File")
+    adoc = frappe.qb.DocType("Expense Attachment")
+    parents = (
+        frappe.qb.from_(adoc)
+        .select(
+            adoc.parenttype,
+            adoc.parent
+        )
+        .where(adoc.file == url)
+        .distinct()
+    ).run(as_dict=True)
+    (
+        frappe.qb.update(doc)
+        .set(doc.file_url, blob)
+        .where(doc.file_url == url)
+    ).run()
+    (
+        frappe.qb.update(adoc)
+        .set(adoc.file, blob)
+        .where(adoc.file == url)
+    ).run()
+    if parents:
+        from .cache import clear_docs_cache
+        
+        data = {}
+        for v in parents:
+            data.setdefault(v["parenttype"], []).append(v["parent"])
+        
+        for k, v in data.items():
+            clear_docs_cache(k, v)
\ No newline at end of file
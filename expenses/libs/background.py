@@ -9,35 +9,110 @@ import frappe
 from expenses.version import is_version_gt
 
 
-# [Attachment, Expense, Item]
+# [Internal]
+_JOB_KEY = "expenses-job"
+_JOB_RERUN_KEY = "expenses-job-rerun"
+_JOB_TIMEOUT = 300
+_JOB_QUEUE_WAIT = 900
+_JOB_RELEASE = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+# [Attachment, Expense, Item, Status Job]
 def uuid_key(args):
     import hashlib
+    import json
     import uuid
     
     from frappe.utils import cstr
     
-    from .common import to_json
-    
+    # The same payload in a different order must give the same key
+    data = json.dumps(_normalize(args), sort_keys=True, default=str)
     return cstr(uuid.UUID(hashlib.sha256(
-        to_json(args, "").encode("utf-8")
+        data.encode("utf-8")
     ).hexdigest()[::2]))
 
 
-# [Attachment, Expense, Item, Journal, Update]
+# [Internal]
 def is_job_running(name: str):
-    if is_version_gt(14):
-        from frappe.utils.background_jobs import is_job_enqueued
-        
-        return is_job_enqueued(name)
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.exists(cache.make_key(_get_key(name)))
+    return True if pipe.execute()[0] else False
+
+
+# [Attachment, Journal, Search, Status Job, Type, Update]
+def enqueue_unique_job(method: str, job_name: str, pending: str=None, **kwargs):
+    from frappe.utils import cint
     
-    else:
-        from frappe.core.page.background_jobs.background_jobs import get_info
-        
-        jobs = [d.get("job_name") for d in get_info("Jobs", job_status="active")]
-        return True if name in jobs else False
+    ttl = cint(kwargs.get("timeout")) or _JOB_TIMEOUT
+    token = reserve_job(job_name, ttl + _JOB_QUEUE_WAIT)
+    if not token:
+        # The running job picks the request up once it is done
+        _mark_rerun(job_name, ttl + _JOB_QUEUE_WAIT)
+        return 0
+    
+    try:
+        # The token keeps queue ids apart when a job requeues itself
+        enqueue_job(
+            "expenses.libs.background.run_reserved_job",
+            f"{job_name}-{token}",
+            _method=method,
+            _job=job_name,
+            _token=token,
+            _pending=pending,
+            _timeout=kwargs.get("timeout"),
+            **kwargs
+        )
+    except Exception:
+        release_job(job_name, token)
+        raise
+    
+    return 1
+
+
+# [Internal]
+def reserve_job(name: str, ttl: int):
+    token = frappe.generate_hash(length=16)
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.set(cache.make_key(_get_key(name)), token, nx=True, ex=ttl)
+    return token if pipe.execute()[0] else None
+
 
+# [Internal]
+def release_job(name: str, token: str):
+    cache = frappe.cache()
+    # Only the holder may release, an expired reservation can be taken by another job
+    return cache.eval(_JOB_RELEASE, 1, cache.make_key(_get_key(name)), token)
 
-# [Attachment, Expense, Item, Journal, Update]
+
+# [Internal]
+def run_reserved_job(_method: str, _job: str, _token: str, _pending: str=None, _timeout: int=None, **kwargs):
+    done = 0
+    try:
+        ret = frappe.get_attr(_method)(**kwargs)
+        done = 1
+        return ret
+    finally:
+        # Released first, so a request made after the flag is read enqueues on its own
+        release_job(_job, _token)
+        rerun = _pop_rerun(_job)
+        # A failed run isn't retried for leftovers, the resume hooks do that
+        if not rerun and done and _pending:
+            rerun = _has_pending(_pending)
+        if rerun:
+            if _timeout:
+                kwargs["timeout"] = _timeout
+            
+            enqueue_unique_job(_method, _job, _pending, **kwargs)
+
+
+# [Internal]
 def enqueue_job(method: str, job_name: str, **kwargs):
     if "timeout" in kwargs and "queue" not in kwargs:
         from frappe.utils import cint
@@ -61,4 +136,49 @@ def enqueue_job(method: str, job_name: str, **kwargs):
             job_name=job_name,
             is_async=True,
             **kwargs
-        )
\ No newline at end of file
+        )
+
+
+# [Internal]
+def _mark_rerun(name: str, ttl: int):
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.set(cache.make_key(_get_key(name, _JOB_RERUN_KEY)), 1, ex=ttl)
+    pipe.execute()
+
+
+# [Internal]
+def _pop_rerun(name: str):
+    cache = frappe.cache()
+    key = cache.make_key(_get_key(name, _JOB_RERUN_KEY))
+    pipe = cache.pipeline()
+    pipe.exists(key)
+    pipe.delete(key)
+    return True if pipe.execute()[0] else False
+
+
+# [Internal]
+def _has_pending(pending: str):
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.scard(cache.make_key(pending))
+    return True if pipe.execute()[0] else False
+
+
+# [Internal]
+def _normalize(data):
+    if isinstance(data, dict):
+        return {str(k):_normalize(v) for k, v in data.items()}
+    if isinstance(data, (list, tuple, set)):
+        data = [_normalize(v) for v in data]
+        if all(isinstance(v, (str, int, float)) for v in data):
+            return sorted(data, key=lambda v: (type(v).__name__, v))
+        
+        return data
+    
+    return data
+
+
+# [Internal]
+def _get_key(name: str, prefix: str=None):
+    return f"{prefix or _JOB_KEY}:{name}"
\ No newline at end of file
@@ -4,17 +4,103 @@
 # Licence: Please refer to LICENSE file
 
 
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
 import frappe
 
 
+# [Internal]
+_LOCAL_CACHE_SIZE = 1024
+_LOCAL_CACHE_TTL = 300
+_CACHE_CHANNEL = "expenses-cache-invalidate"
+_CACHE_STATS_KEY = "expenses-cache-stats"
+_CACHE_STATS_FLUSH = 60
+# A dependency set lives as long as its longest-lived member
+_CACHE_DEPS_ADD = """
+local ttl = redis.call("ttl", KEYS[1])
+redis.call("sadd", KEYS[1], ARGV[1])
+if ARGV[2] == "0" then
+    redis.call("persist", KEYS[1])
+elseif ttl == -2 or (ttl >= 0 and ttl < tonumber(ARGV[2])) then
+    redis.call("expire", KEYS[1], ARGV[2])
+end
+return 1
+"""
+
+
 # [Account, Expense, Item, Type]
 def get_cache(dt: str, key: str, expires=False):
-    return frappe.cache().get_value(f"{dt}-{key}", expires=expires)
+    key = f"{dt}-{key}"
+    local = _local_cache()
+    gen = None
+    if local:
+        val = local.get(key)
+        if val is not None:
+            _count(dt, "local_hits")
+            return pickle.loads(val)
+        
+        gen = local.generation()
+    
+    data = frappe.cache().get_value(key, expires=expires)
+    if data is None:
+        _count(dt, "misses")
+        return None
+    
+    _count(dt, "remote_hits")
+    if local and not expires:
+        # An eviction seen since the read means the value may be stale
+        local.set(key, pickle.dumps(data), gen=gen)
+    
+    return data
 
 
 # [Account, Expense, Item, Type]
-def set_cache(dt: str, key: str, data, expiry: int=None):
-    frappe.cache().set_value(f"{dt}-{key}", data, expires_in_sec=expiry)
+def set_cache(dt: str, key: str, data, expiry: int=None, deps: list=None):
+    key = f"{dt}-{key}"
+    cache = frappe.cache()
+    cache.set_value(key, data, expires_in_sec=expiry)
+    # Other workers may hold the previous value of the key
+    _invalidate_local([key])
+    if deps:
+        pipe = cache.pipeline()
+        for name in set(deps):
+            pipe.eval(_CACHE_DEPS_ADD, 1, cache.make_key(_deps_key(dt, name)), key, expiry or 0)
+        pipe.execute()
+    
+    local = _local_cache()
+    if local:
+        local.set(key, pickle.dumps(data), expiry)
+
+
+# [API]
+@frappe.whitelist()
+def get_cache_stats():
+    frappe.only_for("System Manager")
+    
+    _flush_stats(True)
+    from frappe.utils import cint
+    
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.hgetall(cache.make_key(_CACHE_STATS_KEY))
+    raw = pipe.execute().pop()
+    data = {}
+    if raw:
+        for k, v in raw.items():
+            dt, field = frappe.safe_decode(k).rsplit(":", 1)
+            if dt not in data:
+                data[dt] = {"local_hits": 0, "remote_hits": 0, "misses": 0}
+            
+            data[dt][field] = cint(v)
+    
+    for v in data.values():
+        total = v["local_hits"] + v["remote_hits"] + v["misses"]
+        v["hit_ratio"] = round((v["local_hits"] + v["remote_hits"]) / total, 4) if total else 0.0
+    
+    return data
 
 
 # [Entry, Request, Settings, Type, Internal]
@@ -30,9 +116,21 @@ def get_cached_doc(dt: str, name: str=None):
 
 # [E Entry, E Expense, E Item, E Request, E Settings, E Type]
 def clear_doc_cache(dt: str, name: str=None):
-    frappe.cache().delete_keys(dt)
-    frappe.clear_cache(doctype=dt)
-    frappe.clear_document_cache(dt, name or dt)
+    if name is None:
+        name = dt
+    
+    _evict_dependents(dt, [name])
+    frappe.clear_document_cache(dt, name)
+
+
+# [Expense]
+def clear_docs_cache(dt: str, names: list):
+    if not names:
+        return 0
+    
+    _evict_dependents(dt, names)
+    for name in names:
+        frappe.clear_document_cache(dt, name)
 
 
 # []
@@ -55,4 +153,224 @@ def get_cached_value(dt: str, name: str, field, raw: bool=False):
     if not values:
         return None
     
-    return values if raw else frappe._dict(values)
\ No newline at end of file
+    return values if raw else frappe._dict(values)
+
+
+# [Internal]
+class _LocalCache:
+    def __init__(self, size: int, ttl: int):
+        self._size = size
+        self._ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._gen = 0
+    
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            
+            if entry[0] < time.monotonic():
+                self._data.pop(key, None)
+                return None
+            
+            self._data.move_to_end(key)
+            return entry[1]
+    
+    
+    def generation(self):
+        with self._lock:
+            return self._gen
+    
+    
+    def set(self, key, value, expiry: int=None, gen: int=None):
+        ttl = min(expiry, self._ttl) if expiry else self._ttl
+        with self._lock:
+            if gen is not None and gen != self._gen:
+                return None
+            
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self._size:
+                self._data.popitem(last=False)
+    
+    
+    def evict_keys(self, site: str, keys: list):
+        with self._lock:
+            self._gen += 1
+            for k in keys:
+                self._data.pop((site, k), None)
+    
+    
+    def evict(self, site: str=None, prefix: str=None):
+        with self._lock:
+            self._gen += 1
+            keys = [
+                k for k in self._data
+                if (not site or k[0] == site) and (not prefix or k[1].startswith(prefix))
+            ]
+            for k in keys:
+                self._data.pop(k, None)
+
+
+# [Internal]
+class _SiteCache:
+    def __init__(self, cache, site: str):
+        self._cache = cache
+        self._site = site
+    
+    
+    def get(self, key):
+        return self._cache.get((self._site, key))
+    
+    
+    def generation(self):
+        return self._cache.generation()
+    
+    
+    def set(self, key, value, expiry: int=None, gen: int=None):
+        self._cache.set((self._site, key), value, expiry, gen)
+
+
+# [Internal]
+_LOCAL_CACHE = _LocalCache(_LOCAL_CACHE_SIZE, _LOCAL_CACHE_TTL)
+_LISTENER = {"thread": None, "failed": 0}
+_STATS = {"data": {}, "flushed": 0.0, "lock": threading.Lock()}
+
+
+# [Internal]
+def _local_cache():
+    site = getattr(frappe.local, "site", None)
+    if not site or not _start_listener():
+        return None
+    
+    return _SiteCache(_LOCAL_CACHE, site)
+
+
+# [Internal]
+def _start_listener():
+    thread = _LISTENER["thread"]
+    if thread is not None and thread.is_alive():
+        return True
+    
+    if _LISTENER["failed"]:
+        return False
+    
+    try:
+        pubsub = frappe.cache().pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(_CACHE_CHANNEL)
+    except Exception:
+        _LISTENER["failed"] = 1
+        return False
+    
+    thread = threading.Thread(
+        target=_listen,
+        args=(pubsub,),
+        name=_CACHE_CHANNEL,
+        daemon=True
+    )
+    thread.start()
+    _LISTENER["thread"] = thread
+    return True
+
+
+# [Internal]
+def _listen(pubsub):
+    from .common import parse_json
+    
+    try:
+        for msg in pubsub.listen():
+            if not msg or msg.get("type") != "message":
+                continue
+            
+            data = msg.get("data")
+            if isinstance(data, bytes):
+                data = data.decode("utf-8")
+            
+            data = parse_json(data)
+            if data and isinstance(data, dict) and data.get("site") and data.get("keys"):
+                _LOCAL_CACHE.evict_keys(data["site"], data["keys"])
+    except Exception:
+        pass
+    finally:
+        # Entries can't be trusted once invalidations stop arriving
+        _LOCAL_CACHE.evict()
+
+
+# [Internal]
+def _deps_key(dt: str, name: str):
+    return f"{dt}-deps-{name}"
+
+
+# [Internal]
+def _evict_dependents(dt: str, names: list):
+    cache = frappe.cache()
+    sets = [cache.make_key(_deps_key(dt, name)) for name in set(names)]
+    pipe = cache.pipeline()
+    for k in sets:
+        pipe.smembers(k)
+    
+    keys = set()
+    for v in pipe.execute():
+        if v:
+            keys.update([frappe.safe_decode(x) for x in v])
+    
+    pipe = cache.pipeline()
+    pipe.delete(*sets)
+    pipe.execute()
+    if keys:
+        keys = list(keys)
+        cache.delete_value(keys)
+        _invalidate_local(keys)
+
+
+# [Internal]
+def _invalidate_local(keys: list):
+    site = getattr(frappe.local, "site", None)
+    if not site:
+        return 0
+    
+    _LOCAL_CACHE.evict_keys(site, keys)
+    
+    from .common import to_json
+    
+    try:
+        frappe.cache().publish(_CACHE_CHANNEL, to_json({"site": site, "keys": keys}))
+    except Exception:
+        pass
+
+
+# [Internal]
+def _count(dt: str, field: str):
+    with _STATS["lock"]:
+        key = f"{dt}:{field}"
+        _STATS["data"][key] = _STATS["data"].get(key, 0) + 1
+    
+    _flush_stats()
+
+
+# [Internal]
+def _flush_stats(force: bool=False):
+    now = time.monotonic()
+    with _STATS["lock"]:
+        if not force and now - _STATS["flushed"] < _CACHE_STATS_FLUSH:
+            return 0
+        
+        data = _STATS["data"]
+        _STATS["data"] = {}
+        _STATS["flushed"] = now
+    
+    if not data:
+        return 0
+    
+    try:
+        cache = frappe.cache()
+        key = cache.make_key(_CACHE_STATS_KEY)
+        pipe = cache.pipeline()
+        for k, v in data.items():
+            pipe.hincrby(key, k, v)
+        pipe.execute()
+    except Exception:
+        pass
\ No newline at end of file
@@ -47,6 +47,11 @@ def company_exists(name: str, attrs: dict=None):
     return _exists("Company", name, attrs)
 
 
+# [E Expense]
+def employee_exists(name: str, attrs: dict=None, enabled: bool=None):
+    return _exists("Employee", name, attrs, enabled, "status", "Active")
+
+
 # [E Entry, E Expense]
 def party_exists(dt: str, name: str, attrs: dict=None, enabled: bool=None):
     return _exists(dt, name, attrs, enabled)
@@ -11,27 +11,18 @@ import frappe
 from expenses import __production__
 
 
-# [Internal]
-if not __production__:
-    from .logger import get_logger
-    
-    _LOGGER_ERROR = get_logger("error")
-    _LOGGER_INFO = get_logger("info")
-else:
-    _LOGGER_ERROR = None
-    _LOGGER_INFO = None
-
-
 # [Entry, Journal, Update]
 def store_error(data):
-    if _LOGGER_ERROR:
-        _LOGGER_ERROR.error(data)
+    logger = _get_logger("error")
+    if logger:
+        logger.error(data)
 
 
 # [Update]
 def store_info(data):
-    if _LOGGER_INFO:
-        _LOGGER_INFO.info(data)
+    logger = _get_logger("info")
+    if logger:
+        logger.info(data)
 
 
 # [Entry, Journal]
@@ -114,4 +105,16 @@ def json_to_list(data):
             return tmp
         if isinstance(data, str):
             return [data]
-    return None
\ No newline at end of file
+    return None
+
+
+# [Internal]
+def _get_logger(name: str):
+    if __production__:
+        return None
+    
+    # Log files are opened on first use rather than at import,
+    # get_logger caches the handlers per site
+    from .logger import get_logger
+    
+    return get_logger(name)
\ No newline at end of file
@@ -0,0 +1,172 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+# [E Expense, Importer]
+class ExpenseContext:
+    def __init__(self, docs: list=None):
+        self._keys = {}
+        self._data = {}
+        self._values = {}
+        if docs:
+            for doc in docs:
+                self.add(doc)
+    
+    
+    def add(self, doc):
+        company = doc.get("company")
+        item = doc.get("expense_item")
+        if company:
+            self._add_key("company", company)
+        if item:
+            self._add_key("item", item)
+        if company and item:
+            self._add_key("account", (item, company))
+        if doc.get("paid_by"):
+            self._add_key("employee", doc.get("paid_by"))
+        if doc.get("expense_claim"):
+            self._add_key("claim", doc.get("expense_claim"))
+        if doc.get("project"):
+            self._add_key("project", doc.get("project"))
+        if doc.get("party_type"):
+            self._add_key("party_type", doc.get("party_type"))
+        if doc.get("party_type") and doc.get("party"):
+            self._add_key(("party", doc.get("party_type")), doc.get("party"))
+    
+    
+    def check_app_status(self):
+        if not self._values.get("status_checked", 0):
+            from .system import check_app_status
+            
+            check_app_status()
+            self._values["status_checked"] = 1
+    
+    
+    @property
+    def is_moderator(self):
+        if "is_moderator" not in self._values:
+            from .expense import is_expense_moderator
+            
+            self._values["is_moderator"] = is_expense_moderator()
+        
+        return self._values["is_moderator"] > 0
+    
+    
+    @property
+    def has_expense_claim(self):
+        if "has_expense_claim" not in self._values:
+            from .expense import has_expense_claim
+            
+            self._values["has_expense_claim"] = has_expense_claim()
+        
+        return self._values["has_expense_claim"] > 0
+    
+    
+    @property
+    def expense_claim_reqd(self):
+        if "expense_claim_reqd" not in self._values:
+            if not self.has_expense_claim:
+                self._values["expense_claim_reqd"] = 0
+            else:
+                from .expense import expense_claim_reqd_if_paid
+                
+                self._values["expense_claim_reqd"] = expense_claim_reqd_if_paid()
+        
+        return self._values["expense_claim_reqd"] > 0
+    
+    
+    def company_exists(self, name: str):
+        return self._get("company", name) is not None
+    
+    
+    def item_exists(self, name: str):
+        return self._get("item", name) is not None
+    
+    
+    def item_data(self, item: str, company: str):
+        return self._get("account", (item, company)) or {}
+    
+    
+    def employee_exists(self, name: str, company: str):
+        return self._get("employee", name) == company
+    
+    
+    def is_valid_claim(self, name: str, employee: str, company: str):
+        data = self._get("claim", name)
+        return data is not None and data["employee"] == employee and data["company"] == company
+    
+    
+    def project_exists(self, name: str):
+        return self._get("project", name) is not None
+    
+    
+    def party_type_exists(self, name: str):
+        return self._get("party_type", name) is not None
+    
+    
+    def party_exists(self, dt: str, name: str):
+        # Party doctypes are checked first, the name becomes a table name
+        if not self.party_type_exists(dt):
+            return False
+        
+        return self._get(("party", dt), name) is not None
+    
+    
+    def _add_key(self, section, key):
+        self._keys.setdefault(section, set()).add(key)
+    
+    
+    def _get(self, section, key):
+        data = self._data.setdefault(section, {})
+        if key not in data:
+            # Keys added after the last load are resolved together
+            self._add_key(section, key)
+            keys = [k for k in self._keys[section] if k not in data]
+            found = _load_section(section, keys) or {}
+            for k in keys:
+                data[k] = found.get(k)
+        
+        return data[key]
+
+
+# [Internal]
+def _load_section(section, keys: list):
+    from .filter import all_filter
+    
+    if section == "company":
+        data = all_filter("Company", "name", keys, {"is_group": 0})
+        return {k:1 for k in data} if data else None
+    
+    if section == "item":
+        data = all_filter("Expense Item", "name", keys, enabled=True)
+        return {k:1 for k in data} if data else None
+    
+    if section == "account":
+        from .item import get_items_company_accounts
+        
+        return get_items_company_accounts(keys)
+    
+    if section == "employee":
+        return all_filter(
+            "Employee", ["name", "company"], keys,
+            enabled=True, status_col="status", status_val="Active"
+        )
+    
+    if section == "claim":
+        return all_filter(
+            "Expense Claim", ["name", "employee", "company"], keys,
+            {"is_paid": 1, "status": "Paid", "docstatus": 1}
+        )
+    
+    if section == "project":
+        data = all_filter("Project", "name", keys)
+        return {k:1 for k in data} if data else None
+    
+    if section == "party_type":
+        data = all_filter("Party Type", "name", keys)
+        return {k:1 for k in data} if data else None
+    
+    data = all_filter(section[1], "name", keys, enabled=True)
+    return {k:1 for k in data} if data else None
\ No newline at end of file
@@ -7,6 +7,8 @@
 import frappe
 from frappe import _
 
+from .profiler import profile
+
 
 # [E Entry, E Entry Form]
 @frappe.whitelist(methods=["POST"])
@@ -103,9 +105,9 @@ def get_request_data(name):
     if not name or not isinstance(name, str):
         return 0
     
-    from .request import get_request
+    from .request import get_request_entry_data
     
-    data = get_request(name)
+    data = get_request_entry_data(name)
     if not data:
         data = 0
     return data
@@ -115,4 +117,121 @@ def get_request_data(name):
 def get_entry_data(name: str):
     from .cache import get_cached_doc
     
-    return get_cached_doc("Expenses Entry", name)
\ No newline at end of file
+    return get_cached_doc("Expenses Entry", name)
+
+# [E Entry]
+@profile("prefetch_entry_data")
+def prefetch_entry_data(company: str, keys: dict):
+    from pypika.terms import ValueWrapper
+    
+    data = {
+        "accounts": {},
+        "projects": set(),
+        "centers": set(),
+        "employees": set(),
+        "claims": {},
+        "parties": {}
+    }
+    qrys = []
+    if keys.get("accounts"):
+        doc = frappe.qb.DocType("Account")
+        qrys.append(
+            frappe.qb.from_(doc)
+            .select(
+                ValueWrapper("accounts").as_("kind"),
+                doc.name.as_("name"),
+                doc.company.as_("value")
+            )
+            .where(doc.name.isin(list(keys["accounts"])))
+            .where(doc.disabled == 0)
+        )
+    if keys.get("projects"):
+        doc = frappe.qb.DocType("Project")
+        qrys.append(
+            frappe.qb.from_(doc)
+            .select(
+                ValueWrapper("projects"),
+                doc.name,
+                doc.company
+            )
+            .where(doc.name.isin(list(keys["projects"])))
+            .where(doc.status == "Open")
+            .where(doc.is_active == "Yes")
+            .where((doc.company == company) | (doc.company == "") | doc.company.isnull())
+        )
+    if keys.get("centers"):
+        doc = frappe.qb.DocType("Cost Center")
+        qrys.append(
+            frappe.qb.from_(doc)
+            .select(
+                ValueWrapper("centers"),
+                doc.name,
+                doc.company
+            )
+            .where(doc.name.isin(list(keys["centers"])))
+            .where(doc.is_group == 0)
+            .where(doc.company == company)
+            .where(doc.disabled == 0)
+        )
+    if keys.get("employees"):
+        doc = frappe.qb.DocType("Employee")
+        qrys.append(
+            frappe.qb.from_(doc)
+            .select(
+                ValueWrapper("employees"),
+                doc.name,
+                doc.company
+            )
+            .where(doc.name.isin(list(keys["employees"])))
+            .where(doc.company == company)
+            .where(doc.status == "Active")
+        )
+    if keys.get("claims"):
+        doc = frappe.qb.DocType("Expense Claim")
+        qrys.append(
+            frappe.qb.from_(doc)
+            .select(
+                ValueWrapper("claims"),
+                doc.name,
+                doc.employee
+            )
+            .where(doc.name.isin(list(keys["claims"])))
+            .where(doc.company == company)
+            .where(doc.is_paid == 1)
+            .where(doc.status == "Paid")
+            .where(doc.docstatus == 1)
+        )
+    for dt, names in (keys.get("parties") or {}).items():
+        doc = frappe.qb.DocType(dt)
+        qry = (
+            frappe.qb.from_(doc)
+            .select(
+                ValueWrapper("parties"),
+                doc.name,
+                ValueWrapper(dt)
+            )
+            .where(doc.name.isin(list(names)))
+        )
+        if frappe.get_meta(dt).has_field("disabled"):
+            qry = qry.where(doc.disabled == 0)
+        
+        qrys.append(qry)
+    
+    if not qrys:
+        return data
+    
+    # All dimensions are resolved together in a single round-trip
+    qry = qrys.pop(0)
+    for v in qrys:
+        qry = qry.union_all(v)
+    
+    for v in qry.run(as_dict=True) or []:
+        kind = v["kind"]
+        if kind in ("accounts", "claims"):
+            data[kind][v["name"]] = v["value"]
+        elif kind == "parties":
+            data[kind].setdefault(v["value"], set()).add(v["name"])
+        else:
+            data[kind].add(v["name"])
+    
+    return data
\ No newline at end of file
@@ -4,10 +4,17 @@
 # Licence: Please refer to LICENSE file
 
 
+from bisect import bisect_right
+
 import frappe
 from frappe import _
 
 
+# [Internal]
+_EXCHANGE_DT = "Currency Exchange"
+_EXCHANGE_PURPOSES = ("", "for_buying", "for_selling")
+
+
 # [E Entry, E Entry Form]
 @frappe.whitelist(methods=["POST"])
 def get_exchange_rate(_from: str|list, _to: str, date: str=None, args: str=None, local: bool=False):
@@ -41,83 +48,183 @@ def get_exchange_rate(_from: str|list, _to: str, date: str=None, args: str=None,
         
         date = nowdate()
     
-    from frappe.utils import flt
-    
     multi = len(_from) > 1
-    dt = "Currency Exchange"
-    fields = ["from_currency", "exchange_rate"]
-    filters = [
-        [dt, "date", "<=", f"{date} 00:00:00.000"],
-        [
-            dt, fields[0],
-            "in" if multi else "=",
-            _from if multi else _from[0]
-        ],
-        [dt, fields[1], "=", _to]
-    ]
-    if args == "for_buying":
-        filters.append([dt, args, "=", 1])
-    elif args == "for_selling":
-        filters.append([dt, args, "=", 1])
-    
-    settings = frappe.get_doc("Accounts Settings")
-    if settings:
-        from frappe.utils import cint
+    rates = get_exchange_rates([[v, date] for v in _from], _to, args)
+    data = {}
+    for k in _from:
+        v = rates.get((k, date))
+        if v is not None:
+            data[k] = v
+    
+    if local:
+        for k in _from:
+            data.setdefault(k, 1.0)
+    
+    if data:
+        return data if multi else data[_from[0]]
+    
+    return {"error": _("Unable to get the exchange rate/rates value.")}
+
+
+# [E Entry, Internal]
+def get_exchange_rates(pairs: list, _to: str, args: str=None):
+    from frappe.utils import getdate
+    
+    purpose = args if args in _EXCHANGE_PURPOSES else ""
+    stale = _get_stale_days()
+    currencies = list({v[0] for v in pairs if v[0] and v[0] != _to})
+    tables = _get_rate_tables(currencies, _to)
+    data = {}
+    missing = []
+    for v in pairs:
+        key = (v[0], v[1])
+        if key in data:
+            continue
+        if v[0] == _to:
+            data[key] = 1.0
+            continue
         
-        if (
-            not cint(settings.get("allow_stale")) and
-            cint(settings.get("stale_days"))
-        ):
-            from frappe.utils import (
-                add_days,
-                get_datetime_str
-            )
-            
-            days = cint(settings.stale_days)
-            check_date = get_datetime_str(add_days(date, -days))
-            filters.append([dt, "date", ">", check_date])
-    
-    data = frappe.get_all(
-        dt,
-        fields=fields,
-        filters=filters,
-        order_by="date desc",
-        ignore_permissions=True,
-        strict=False
-    )
-    if data and isinstance(data, list):
-        if not multi:
-            return flt(data.pop(0)[fields[1]])
+        day = getdate(v[1]).toordinal()
+        rate = _find_rate(tables.get(v[0], {}).get(purpose), day, stale)
+        data[key] = rate
+        if rate is None:
+            missing.append(key)
+    
+    if missing:
+        _resolve_cached_rates(missing, _to, data)
+    
+    return data
+
+
+# [Hooks]
+def clear_exchange_rates(doc, method=None):
+    if doc.from_currency and doc.to_currency:
+        from .cache import clear_doc_cache
         
-        return {v[fields[0]]:flt(v[fields[1]]) for v in data}
+        clear_doc_cache(_EXCHANGE_DT, _get_pair_key(doc.from_currency, doc.to_currency))
+
+
+# [Internal]
+def _find_rate(table, day: int, stale: int):
+    if not table:
+        return None
     
-    data = {k:1.0 for k in _from}
-    found = 0
-    try:
-        for k in _from:
-            key = "currency_exchange_rate_{0}:{1}:{2}".format(date, k, _to)
-            val = frappe.cache().get(key)
-            if flt(val) >= 1:
-                found += 1
-                data[k] = flt(val)
+    idx = bisect_right(table[0], day) - 1
+    if idx < 0:
+        return None
+    if stale and table[0][idx] <= day - stale:
+        return None
+    
+    return table[1][idx]
+
+
+# [Internal]
+def _get_rate_tables(currencies: list, _to: str):
+    from .cache import get_cache
+    
+    data = {}
+    missing = []
+    for k in currencies:
+        table = get_cache(_EXCHANGE_DT, _get_pair_key(k, _to))
+        if table is None:
+            missing.append(k)
+        else:
+            data[k] = table
     
+    if missing:
+        data.update(_load_rate_tables(missing, _to))
+    
+    return data
+
+
+# [Internal]
+def _load_rate_tables(currencies: list, _to: str):
+    from frappe.utils import cint, flt, getdate
+    
+    doc = frappe.qb.DocType(_EXCHANGE_DT)
+    raw = (
+        frappe.qb.from_(doc)
+        .select(
+            doc.from_currency,
+            doc.date,
+            doc.exchange_rate,
+            doc.for_buying,
+            doc.for_selling
+        )
+        .where(doc.from_currency.isin(currencies))
+        .where(doc.to_currency == _to)
+        .orderby(doc.date)
+        .orderby(doc.creation)
+    ).run(as_dict=True)
+    data = {k:{p:[[], []] for p in _EXCHANGE_PURPOSES} for k in currencies}
+    for v in raw or []:
+        day = getdate(v["date"]).toordinal()
+        rate = flt(v["exchange_rate"])
+        for p in _EXCHANGE_PURPOSES:
+            if p and not cint(v[p]):
+                continue
+            
+            table = data[v["from_currency"]][p]
+            # Several rates on the same day, the latest one wins
+            if table[0] and table[0][-1] == day:
+                table[1][-1] = rate
+            else:
+                table[0].append(day)
+                table[1].append(rate)
+    
+    from .cache import set_cache
+    
+    for k, v in data.items():
+        key = _get_pair_key(k, _to)
+        set_cache(_EXCHANGE_DT, key, v, deps=[key])
+    
+    return data
+
+
+# [Internal]
+def _resolve_cached_rates(keys: list, _to: str, data: dict):
+    from frappe.utils import flt
+    
+    names = [
+        "currency_exchange_rate_{0}:{1}:{2}".format(v[1], v[0], _to)
+        for v in keys
+    ]
+    try:
+        values = frappe.cache().mget(names)
     except Exception:
         from .common import (
             store_error,
             log_error
         )
         
-        found = 0
         store_error({
             "error": "Failed to get exchange rate/rates",
-            "_from": _from,
-            "_to": _to,
-            "date": date,
-            "args": args
+            "keys": keys,
+            "_to": _to
         })
         log_error(_("Failed to get exchange rate/rates."))
+        return 0
     
-    if found or local:
-        return data if multi else data[_from[0]]
+    for i, v in enumerate(values or []):
+        if flt(v) >= 1:
+            data[keys[i]] = flt(v)
+
+
+# [Internal]
+def _get_stale_days():
+    from frappe.utils import cint
+    
+    settings = frappe.get_cached_doc("Accounts Settings")
+    if (
+        not settings or
+        cint(settings.get("allow_stale")) or
+        not cint(settings.get("stale_days"))
+    ):
+        return 0
     
-    return {"error": _("Unable to get the exchange rate/rates value.")}
\ No newline at end of file
+    return cint(settings.stale_days)
+
+
+# [Internal]
+def _get_pair_key(_from: str, _to: str):
+    return f"rates-{_from}-{_to}"
\ No newline at end of file
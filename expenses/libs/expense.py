@@ -6,6 +6,8 @@
 
 import frappe
 
+from .profiler import profile
+
 
 # [E Expense, Internal]
 ExpenseStatus = frappe._dict({
@@ -18,6 +20,28 @@ ExpenseStatus = frappe._dict({
 })
 
 
+# [Internal]
+_STATUS_INLINE_LIMIT = 200
+_STATUS_TRANSITIONS = {
+    ExpenseStatus.r: {
+        "from": ExpenseStatus.p, "from_docstatus": 1,
+        "to": ExpenseStatus.r, "to_docstatus": 1
+    },
+    ExpenseStatus.a: {
+        "from": ExpenseStatus.r, "from_docstatus": 1,
+        "to": ExpenseStatus.a, "to_docstatus": 1
+    },
+    ExpenseStatus.j: {
+        "from": ExpenseStatus.r, "from_docstatus": 1,
+        "to": ExpenseStatus.j, "to_docstatus": 2
+    },
+    "restore": {
+        "from": ExpenseStatus.j, "from_docstatus": 2,
+        "to": ExpenseStatus.p, "to_docstatus": 1
+    }
+}
+
+
 # [E Expense, E Expense Form]
 @frappe.whitelist(methods=["POST"])
 def item_expense_data(item, company):
@@ -62,6 +86,54 @@ def expense_form_setup():
     }
 
 
+# [E Expense, Importer]
+def get_cost_qty_bounds(data: dict=None):
+    from frappe.utils import flt
+    
+    bounds = {}
+    for k in ["cost", "qty"]:
+        f = {"eq": 0.0, "min": 0.0, "max": 0.0}
+        if data:
+            if flt(data.get(k)) > 0:
+                f["eq"] = flt(data.get(k))
+            if flt(data.get(f"min_{k}")) > 0:
+                f["min"] = flt(data.get(f"min_{k}"))
+            if flt(data.get(f"max_{k}")) > 0:
+                f["max"] = flt(data.get(f"max_{k}"))
+        
+        bounds[k] = f
+    
+    return bounds
+
+
+# [E Expense, Importer]
+def check_cost_qty(key: str, values: list, bounds: dict):
+    from frappe import _
+    from frappe.utils import flt
+    
+    if key == "cost":
+        label = _("Cost")
+        reqd = _("A valid cost is required.")
+    else:
+        label = _("Quantity")
+        reqd = _("A valid quantity is required.")
+    
+    f = bounds[key]
+    errors = [None] * len(values)
+    for i, v in enumerate(values):
+        v = flt(v)
+        if v <= 0:
+            errors[i] = reqd
+        elif f["eq"] > 0 and f["eq"] != v:
+            errors[i] = _("{0} must be equals to {1}.").format(label, f["eq"])
+        elif f["min"] > 0 and f["min"] > v:
+            errors[i] = _("{0} must be greater than or equals to {1}.").format(label, f["min"])
+        elif f["max"] > 0 and f["max"] < v:
+            errors[i] = _("{0} must be less than or equals to {1}.").format(label, f["max"])
+    
+    return errors
+
+
 # [E Expense]
 def is_valid_claim(expense_claim: str, paid_by: str, company: str):
     from .check import expense_claim_exists
@@ -107,23 +179,23 @@ def get_expenses_for_company(names: list, company: str):
 
 
 # [Request]
-def set_expenses_restored(names: list):
-    enqueue_expenses_status_change(names, "restore")
+def set_expenses_restored(names: list, request: str=None):
+    enqueue_expenses_status_change(names, "restore", request)
 
 
 # [Request]
-def set_expenses_requested(names: list):
-    enqueue_expenses_status_change(names, ExpenseStatus.r)
+def set_expenses_requested(names: list, request: str=None):
+    enqueue_expenses_status_change(names, ExpenseStatus.r, request)
 
 
 # [Request]
-def set_expenses_approved(names: list):
-    enqueue_expenses_status_change(names, ExpenseStatus.a)
+def set_expenses_approved(names: list, request: str=None, versions: dict=None):
+    enqueue_expenses_status_change(names, ExpenseStatus.a, request, versions)
 
 
 # [Request]
-def set_expenses_rejected(names: list):
-    enqueue_expenses_status_change(names, ExpenseStatus.j)
+def set_expenses_rejected(names: list, request: str=None, versions: dict=None):
+    enqueue_expenses_status_change(names, ExpenseStatus.j, request, versions)
 
 
 # [Request]
@@ -153,7 +225,8 @@ def get_expenses(names: list):
             doc.is_advance,
             doc.party_type,
             doc.party,
-            doc.project
+            doc.project,
+            doc.modified
         )
         .where(doc.name.isin(names))
         .where(doc.status.isin([ExpenseStatus.p, ExpenseStatus.r]))
@@ -174,13 +247,13 @@ def get_expenses(names: list):
     
     from .cache import set_cache
     
-    set_cache(dt, key, data)
+    set_cache(dt, key, data, deps=names)
     return data
 
 
 # [Request]
-def search_expenses_by_company(company, filters, search=None, as_dict=False):
-    from .search import filter_search, prepare_data
+def search_expenses_by_company(company, filters, search=None, start=0, page_len=None, as_dict=False):
+    from .search import filter_search
     
     dt = "Expense"
     doc = frappe.qb.DocType(dt)
@@ -198,54 +271,168 @@ def search_expenses_by_company(company, filters, search=None, as_dict=False):
         .where(doc.status == ExpenseStatus.p)
         .where(doc.docstatus == 1)
     )
-    qry = filter_search(doc, qry, dt, search, doc.name, "name")
     if "ignored" in filters:
         qry = qry.where(doc.name.notin(filters["ignored"]))
     if "max_date" in filters:
         qry = qry.where(doc.required_by.lte(filters["max_date"]))
     if "owner" in filters:
         qry = qry.where(doc.owner == filters["owner"])
-    data = qry.run(as_dict=as_dict)
-    data = prepare_data(data, dt, "name", search, as_dict)
-    return data
+    qry = filter_search(doc, qry, dt, search, start, page_len)
+    return qry.run(as_dict=as_dict)
 
 
 # [Internal]
-def enqueue_expenses_status_change(names: list, status: str):
-    from .background import (
-        uuid_key,
-        is_job_running
-    )
+def enqueue_expenses_status_change(names: list, status: str, request: str=None, versions: dict=None):
+    names = list(dict.fromkeys([v for v in names if v]))
+    if len(names) > _STATUS_INLINE_LIMIT:
+        from .status_job import enqueue_status_jobs
+        
+        return enqueue_status_jobs(names, status, request, versions)
     
-    key = uuid_key([names, status])
-    job_name = f"exp-set-expenses-status-{key}"
-    if not is_job_running(job_name):
-        from .background import enqueue_job
+    # Small requests are applied atomically within the caller's transaction
+    result = set_expenses_status(names, status, versions)
+    if result["conflicts"]:
+        from frappe import _
         
-        enqueue_job(
-            "expenses.libs.expense.set_expenses_status",
-            job_name,
-            timeout=len(names) * 5,
-            names=names,
-            status=status
+        from .common import error
+        
+        error(
+            _("Expenses \"{0}\" have been modified by another transaction, please reload and try again.")
+            .format("\", \"".join(result["conflicts"]))
         )
+    
+    return result
+
+
+# [Status Job, Internal]
+@profile("set_expenses_status")
+def set_expenses_status(names: list, status: str, versions: dict=None):
+    if not names or status not in _STATUS_TRANSITIONS:
+        return {"changed": [], "skipped": names or [], "conflicts": []}
+    
+    dt = "Expense"
+    names = list(set(names))
+    transition = _STATUS_TRANSITIONS[status]
+    doc = frappe.qb.DocType(dt)
+    rows = (
+        frappe.qb.from_(doc)
+        .select(
+            doc.name,
+            doc.status,
+            doc.docstatus,
+            doc.modified
+        )
+        .where(doc.name.isin(names))
+        .for_update()
+    ).run(as_dict=True)
+    
+    from frappe.utils import cint, get_datetime
+    
+    # Versions are the ones the caller saw, rows without one use the current
+    seen = {k:get_datetime(v) for k, v in (versions or {}).items() if v}
+    versions = {}
+    skipped = []
+    conflicts = []
+    for v in rows:
+        docstatus = cint(v["docstatus"])
+        if v["status"] == transition["to"] and docstatus == transition["to_docstatus"]:
+            # Already in the target state, nothing is lost by skipping it
+            skipped.append(v["name"])
+        elif v["name"] in seen and seen[v["name"]] != get_datetime(v["modified"]):
+            # Changed since the caller loaded it, so it acted on a stale version
+            conflicts.append(v["name"])
+        elif v["status"] == transition["from"] and docstatus == transition["from_docstatus"]:
+            versions[v["name"]] = v["modified"]
+        else:
+            conflicts.append(v["name"])
+    
+    found = {v["name"] for v in rows}
+    conflicts.extend([v for v in names if v not in found])
+    changed = list(versions)
+    if not changed:
+        return {"changed": changed, "skipped": skipped, "conflicts": conflicts}
+    
+    from frappe.utils import now
+    from pypika.terms import Criterion
+    
+    modified = now()
+    user = frappe.session.user
+    qry = (
+        frappe.qb.update(doc)
+        .set(doc.status, transition["to"])
+        .set(doc.modified, modified)
+        .set(doc.modified_by, user)
+        .where(Criterion.any([
+            (doc.name == k) & (doc.modified == v)
+            for k, v in versions.items()
+        ]))
+        .where(doc.status == transition["from"])
+        .where(doc.docstatus == transition["from_docstatus"])
+    )
+    if transition["to_docstatus"] != transition["from_docstatus"]:
+        qry = qry.set(doc.docstatus, transition["to_docstatus"])
+    if status == "restore":
+        qry = qry.set(doc.is_restored, 1)
+    
+    qry.run()
+    
+    # Rows the guarded update didn't reach are reported instead of assumed
+    done = set((
+        frappe.qb.from_(doc)
+        .select(doc.name)
+        .where(doc.name.isin(changed))
+        .where(doc.modified == modified)
+        .where(doc.status == transition["to"])
+    ).run(pluck=True) or [])
+    if len(done) != len(changed):
+        conflicts.extend([v for v in changed if v not in done])
+        changed = [v for v in changed if v in done]
+        if not changed:
+            return {"changed": changed, "skipped": skipped, "conflicts": conflicts}
+    
+    if transition["to_docstatus"] != transition["from_docstatus"]:
+        cdoc = frappe.qb.DocType(f"{dt} Attachment")
+        (
+            frappe.qb.update(cdoc)
+            .set(cdoc.docstatus, transition["to_docstatus"])
+            .where(cdoc.parent.isin(changed))
+            .where(cdoc.parenttype == dt)
+        ).run()
+    
+    _add_status_versions(changed, transition, modified, user)
+    
+    from .cache import clear_docs_cache
+    
+    clear_docs_cache(dt, changed)
+    return {"changed": changed, "skipped": skipped, "conflicts": conflicts}
 
 
 # [Internal]
-def set_expenses_status(names: list, status: str):
-    from .check import expense_exists
+def _add_status_versions(names: list, transition: dict, modified: str, user: str):
+    from .common import to_json
+    
+    changes = [["status", transition["from"], transition["to"]]]
+    if transition["to_docstatus"] != transition["from_docstatus"]:
+        changes.append(["docstatus", transition["from_docstatus"], transition["to_docstatus"]])
     
+    data = to_json({
+        "changed": changes,
+        "added": [],
+        "removed": [],
+        "row_changed": []
+    })
+    fields = [
+        "name", "creation", "modified", "modified_by", "owner",
+        "docstatus", "ref_doctype", "docname", "data"
+    ]
+    values = []
     for name in names:
-        if expense_exists(name):
-            doc = frappe.get_doc("Expense", name)
-            if status == ExpenseStatus.r:
-                doc.request()
-            elif status == ExpenseStatus.a:
-                doc.approve()
-            elif status == ExpenseStatus.j:
-                doc.reject()
-            elif status == "restore":
-                doc.restore()
+        values.append([
+            frappe.generate_hash(length=10), modified, modified, user, user,
+            0, "Expense", name, data
+        ])
+    
+    frappe.db.bulk_insert("Version", fields, values)
 
 
 # [E Entry]
@@ -310,5 +497,5 @@ def get_expenses_data(names: list, company: str):
     
     from .cache import set_cache
     
-    set_cache(dt, key, ret)
+    set_cache(dt, key, ret, deps=names)
     return ret
\ No newline at end of file
@@ -0,0 +1,297 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+import frappe
+from frappe import _
+from frappe.utils import cint, cstr, flt
+
+from .profiler import profile
+
+
+# [Internal]
+_IMPORT_DT = "Expense"
+_IMPORT_CHUNK = 1000
+_IMPORT_FIELDS = [
+    "company", "expense_item", "required_by", "description", "project",
+    "cost", "qty", "is_advance", "is_paid", "paid_by", "expense_claim",
+    "party_type", "party"
+]
+_IMPORT_COLUMNS = [
+    "name", "creation", "modified", "modified_by", "owner", "docstatus",
+    "company", "expense_item", "expense_account", "currency", "required_by",
+    "description", "project", "cost", "uom", "qty", "total", "is_advance",
+    "is_paid", "paid_by", "expense_claim", "party_type", "party", "status",
+    "is_restored"
+]
+
+
+# [API]
+@frappe.whitelist(methods=["POST"])
+def import_expenses(data, data_format=None, submit=0):
+    submit = cint(submit) > 0
+    if (
+        not frappe.has_permission(_IMPORT_DT, "create") or
+        (submit and not frappe.has_permission(_IMPORT_DT, "submit"))
+    ):
+        return {"error": _("Insufficient permissions to import expenses.")}
+    
+    if (
+        not data or not isinstance(data, (str, list)) or
+        (data_format and data_format not in ("csv", "json"))
+    ):
+        return {"error": _("Arguments required to import expenses are invalid.")}
+    
+    rows = parse_import_data(data, data_format)
+    if not rows:
+        return {"error": _("Expenses import data is invalid or empty.")}
+    
+    return bulk_import_expenses(rows, submit)
+
+
+# [Commands, Internal]
+def parse_import_data(data, data_format=None):
+    if isinstance(data, list):
+        return data
+    
+    data = data.strip()
+    if not data_format:
+        data_format = "json" if data[:1] in ("[", "{") else "csv"
+    
+    if data_format == "json":
+        from .common import parse_json
+        
+        data = parse_json(data)
+        return data if isinstance(data, list) else None
+    
+    import csv
+    import io
+    
+    return [dict(v) for v in csv.DictReader(io.StringIO(data))]
+
+
+# [Commands, Internal]
+@profile("bulk_import_expenses")
+def bulk_import_expenses(rows: list, submit: bool=False):
+    from .system import check_app_status
+    
+    check_app_status()
+    result = {"inserted": 0, "names": [], "errors": []}
+    for i in range(0, len(rows), _IMPORT_CHUNK):
+        _import_chunk(rows[i:i + _IMPORT_CHUNK], i, submit, result)
+    
+    from .common import store_info
+    
+    store_info({
+        "action": "bulk_import_expenses",
+        "rows": len(rows),
+        "inserted": result["inserted"],
+        "failed": len(result["errors"])
+    })
+    return result
+
+
+# [Internal]
+def _import_chunk(rows: list, offset: int, submit: bool, result: dict):
+    from .context import ExpenseContext
+    
+    docs = [_prepare_row(v) for v in rows]
+    ctx = ExpenseContext([v for v in docs if v])
+    errors = [[] if v else [_("Invalid expense data.")] for v in docs]
+    groups = {}
+    for i, doc in enumerate(docs):
+        if doc:
+            _validate_references(doc, ctx, errors[i])
+            groups.setdefault((doc.expense_item, doc.company), []).append(i)
+    
+    from .expense import check_cost_qty, get_cost_qty_bounds
+    
+    # Cost and quantity are checked column-wise per item and company
+    for key, idx in groups.items():
+        data = ctx.item_data(key[0], key[1]) if all(key) else None
+        bounds = get_cost_qty_bounds(data)
+        for k in ["cost", "qty"]:
+            for i, err in zip(idx, check_cost_qty(k, [docs[i].get(k) for i in idx], bounds)):
+                if err:
+                    errors[i].append(err)
+    
+    valid = []
+    for i, doc in enumerate(docs):
+        if doc:
+            _validate_payment(doc, ctx, errors[i])
+        if errors[i]:
+            result["errors"].append({"row": offset + i + 1, "errors": errors[i]})
+        else:
+            valid.append(doc)
+    
+    if valid:
+        _insert_expenses(valid, submit)
+        result["inserted"] += len(valid)
+        result["names"].extend([v.name for v in valid])
+
+
+# [Internal]
+def make_import_name(autoname: str, doc):
+    # The expression rule is resolved like Document.set_new_name,
+    # so the {###} counter advances for every row
+    if autoname.startswith("format:"):
+        from frappe.model.naming import _format_autoname
+        
+        return _format_autoname(autoname, doc)
+    
+    from frappe.model.naming import make_autoname
+    
+    return make_autoname(autoname, _IMPORT_DT, doc)
+
+
+# [Internal]
+def _prepare_row(row):
+    if not row or not isinstance(row, dict):
+        return None
+    
+    doc = frappe._dict()
+    for k in _IMPORT_FIELDS:
+        v = row.get(k)
+        doc[k] = v.strip() if isinstance(v, str) else v
+    
+    for k in ["cost", "qty"]:
+        if doc[k] in (None, ""):
+            doc[k] = 1.0 if k == "qty" else 0.0
+        else:
+            doc[k] = flt(doc[k])
+    
+    for k in ["is_advance", "is_paid"]:
+        doc[k] = 1 if cint(doc[k]) else 0
+    
+    for k in ["company", "expense_item", "paid_by", "expense_claim", "party_type", "party"]:
+        doc[k] = cstr(doc[k]) or None
+    
+    if not doc.is_paid:
+        doc.paid_by = None
+        doc.expense_claim = None
+    if not doc.party and doc.party_type:
+        doc.party_type = None
+    
+    return doc
+
+
+# [Internal]
+def _validate_references(doc, ctx, errors: list):
+    valid = 1
+    if not doc.company:
+        errors.append(_("A valid company is required."))
+        valid = 0
+    elif not ctx.company_exists(doc.company):
+        errors.append(_("Company \"{0}\" is a group or doesn't exist.").format(doc.company))
+        valid = 0
+    
+    if not doc.expense_item:
+        errors.append(_("A valid expense item is required."))
+        valid = 0
+    elif not ctx.item_exists(doc.expense_item):
+        errors.append(_("Expense item \"{0}\" is disabled or doesn't exist.").format(doc.expense_item))
+        valid = 0
+    
+    if valid:
+        data = ctx.item_data(doc.expense_item, doc.company)
+        if not data:
+            errors.append(
+                _("Expense item \"{0}\" doesn't have an expense account linked to company \"{1}\".")
+                .format(doc.expense_item, doc.company)
+            )
+        else:
+            doc.uom = data["uom"]
+            doc.expense_account = data["account"]
+            doc.currency = data["currency"]
+    
+    if doc.project and not ctx.project_exists(doc.project):
+        errors.append(_("Project \"{0}\" doesn't exist.").format(doc.project))
+    
+    from frappe.utils import getdate, nowdate
+    
+    if not doc.required_by:
+        doc.required_by = nowdate()
+    
+    try:
+        date = getdate(doc.required_by)
+    except Exception:
+        date = None
+    
+    if not date:
+        errors.append(_("A valid required by date is required."))
+    else:
+        doc.required_by = date
+        if not ctx.is_moderator and date < getdate(nowdate()):
+            errors.append(_("Required by date must be equals to {0} or later.").format(_("today")))
+
+
+# [Internal]
+def _validate_payment(doc, ctx, errors: list):
+    if doc.is_paid:
+        if doc.expense_claim and not ctx.has_expense_claim:
+            doc.expense_claim = None
+        
+        if not doc.paid_by:
+            errors.append(_("A valid paid by employee is required."))
+        elif not ctx.employee_exists(doc.paid_by, doc.company):
+            errors.append(_("Paid by employee isn't active or isn't working for company \"{0}\".").format(doc.company))
+        
+        if not doc.expense_claim:
+            if ctx.expense_claim_reqd:
+                errors.append(_("A valid expense claim reference is required."))
+        elif not ctx.is_valid_claim(doc.expense_claim, doc.paid_by, doc.company):
+            errors.append(
+                _("Expense claim \"{0}\" hasn't been submitted, not paid, not linked to company, not paid by employee or doesn't exist.")
+                .format(doc.expense_claim)
+            )
+    
+    if doc.party_type:
+        if not doc.party:
+            errors.append(_("A valid party reference is required."))
+        elif not ctx.party_type_exists(doc.party_type):
+            errors.append(_("Party type \"{0}\" isn't valid.").format(doc.party_type))
+        elif not ctx.party_exists(doc.party_type, doc.party):
+            errors.append(
+                _("{0} \"{1}\" is disabled or doesn't exist.")
+                .format(doc.party_type, doc.party)
+            )
+
+
+# [Internal]
+def _insert_expenses(docs: list, submit: bool):
+    from frappe.utils import now
+    
+    from .expense import ExpenseStatus
+    
+    autoname = frappe.get_meta(_IMPORT_DT).autoname
+    ts = now()
+    user = frappe.session.user
+    docstatus = 1 if submit else 0
+    status = ExpenseStatus.p if submit else ExpenseStatus.d
+    values = []
+    for doc in docs:
+        doc.name = make_import_name(autoname, doc)
+        values.append([
+            doc.name, ts, ts, user, user, docstatus,
+            doc.company, doc.expense_item, doc.expense_account, doc.currency,
+            doc.required_by, doc.description, doc.project, doc.cost, doc.uom,
+            doc.qty, flt(doc.cost * doc.qty), doc.is_advance, doc.is_paid,
+            doc.paid_by, doc.expense_claim, doc.party_type, doc.party, status, 0
+        ])
+    
+    frappe.db.bulk_insert(_IMPORT_DT, _IMPORT_COLUMNS, values)
+    
+    from .search import add_search_index
+    
+    add_search_index(_IMPORT_DT, [
+        {"name": v.name, "description": v.description}
+        for v in docs
+    ])
+    
+    from .summary import mark_expense_summary
+    
+    parts = {(v.company, v.required_by.replace(day=1)) for v in docs}
+    for v in parts:
+        mark_expense_summary(v[0], v[1])
\ No newline at end of file
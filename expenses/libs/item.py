@@ -6,56 +6,166 @@
 
 import frappe
 
+from .profiler import profile
+
+
+# [Internal]
+_RELOAD_ITEMS_CHUNK = 500
+
 
 # [Type]
-def reload_items_of_types(types):
-    names = get_items_of_types(types)
-    if not names:
-        return 0
+@profile("reload_items")
+def reload_items(names):
+    from .common import store_info
     
-    from .background import (
-        uuid_key,
-        is_job_running
-    )
+    touched = 0
+    for i in range(0, len(names), _RELOAD_ITEMS_CHUNK):
+        touched += _reload_items_chunk(names[i:i + _RELOAD_ITEMS_CHUNK])
     
-    job = uuid_key(names)
-    job = f"reload-items-{job}"
-    if not is_job_running(job):
-        from .background import enqueue_job
-        
-        enqueue_job(
-            "expenses.libs.item.reload_items",
-            job,
-            names=names
-        )
+    store_info({
+        "action": "reload_items",
+        "items": len(names),
+        "touched": touched
+    })
+    return touched
 
 
 # [Internal]
-def get_items_of_types(types):
+def _reload_items_chunk(names):
     dt = "Expense Item"
-    names = frappe.get_list(
+    items = frappe.get_all(
         dt,
-        fields=["name"],
-        filters=[[dt, "expense_type", "in", types]],
-        pluck="name",
+        fields=["name", "expense_type"],
+        filters=[[dt, "name", "in", names]],
         ignore_permissions=True,
         strict=False
     )
-    if not names or not isinstance(names, list):
+    if not items or not isinstance(items, list):
         return 0
     
-    return names
+    from .account import get_type_accounts
+    
+    types = {}
+    for v in items:
+        if v["expense_type"] not in types:
+            types[v["expense_type"]] = {
+                x["company"]:x
+                for x in (get_type_accounts(v["expense_type"]) or [])
+            }
+    
+    from frappe.utils import cint
+    
+    rows = _get_items_accounts([v["name"] for v in items])
+    updates = {}
+    inserts = []
+    touched = set()
+    for v in items:
+        accounts = types[v["expense_type"]]
+        exist = rows.get(v["name"], [])
+        companies = set()
+        for x in exist:
+            companies.add(x["company"])
+            if x["company"] in accounts:
+                data = accounts[x["company"]]
+                val = (data["account"], data["currency"], 1)
+            else:
+                val = (x["account"], x["currency"], 0)
+            
+            if val != (x["account"], x["currency"], cint(x["inherited"])):
+                updates.setdefault(val, []).append(x["name"])
+                touched.add(v["name"])
+        
+        idx = max([cint(x["idx"]) for x in exist] or [0])
+        for k, data in accounts.items():
+            if k not in companies:
+                idx += 1
+                inserts.append([v["name"], idx, k, data["account"], data["currency"]])
+                touched.add(v["name"])
+    
+    if not touched:
+        return 0
+    
+    from frappe.utils import now
+    
+    ts = now()
+    user = frappe.session.user
+    cdt = f"{dt} Account"
+    if inserts:
+        frappe.db.bulk_insert(
+            cdt,
+            [
+                "name", "creation", "modified", "modified_by", "owner", "docstatus",
+                "parent", "parenttype", "parentfield", "idx",
+                "company", "account", "currency",
+                "cost", "min_cost", "max_cost", "qty", "min_qty", "max_qty",
+                "inherited"
+            ],
+            [
+                [
+                    frappe.generate_hash(length=10), ts, ts, user, user, 0,
+                    v[0], dt, "expense_accounts", v[1],
+                    v[2], v[3], v[4],
+                    0, 0, 0, 0, 0, 0,
+                    1
+                ]
+                for v in inserts
+            ]
+        )
+    
+    if updates:
+        doc = frappe.qb.DocType(cdt)
+        for k, v in updates.items():
+            (
+                frappe.qb.update(doc)
+                .set(doc.account, k[0])
+                .set(doc.currency, k[1])
+                .set(doc.inherited, k[2])
+                .set(doc.modified, ts)
+                .set(doc.modified_by, user)
+                .where(doc.name.isin(v))
+            ).run()
+    
+    touched = list(touched)
+    doc = frappe.qb.DocType(dt)
+    (
+        frappe.qb.update(doc)
+        .set(doc.modified, ts)
+        .set(doc.modified_by, user)
+        .where(doc.name.isin(touched))
+    ).run()
+    
+    from .cache import clear_docs_cache
+    
+    clear_docs_cache(dt, touched)
+    return len(touched)
 
 
 # [Internal]
-def reload_items(names):
-    from .cache import get_cached_doc
-    
+def _get_items_accounts(names):
     dt = "Expense Item"
-    for name in names:
-        doc = get_cached_doc(dt, name)
-        if doc:
-            doc.reload_expense_accounts()
+    doc = frappe.qb.DocType(f"{dt} Account")
+    raw = (
+        frappe.qb.from_(doc)
+        .select(
+            doc.name,
+            doc.parent,
+            doc.idx,
+            doc.company,
+            doc.account,
+            doc.currency,
+            doc.inherited
+        )
+        .where(doc.parenttype == dt)
+        .where(doc.parentfield == "expense_accounts")
+        .where(doc.parent.isin(names))
+        .orderby(doc.parent, doc.idx)
+    ).run(as_dict=True)
+    data = {}
+    if raw and isinstance(raw, list):
+        for v in raw:
+            data.setdefault(v["parent"], []).append(v)
+    
+    return data
 
 
 # [E Item Form]
@@ -100,23 +210,43 @@ def get_type_accounts_list(type_name):
 
 # [Expense]
 def get_item_company_account(item: str, company: str):
+    return get_items_company_accounts([[item, company]]).get((item, company), {})
+
+
+# [Context, Expense]
+def get_items_company_accounts(pairs: list):
     from .cache import get_cache
     
     dt = "Expense Item"
-    key = f"{item}-{company}-account-data"
-    cache = get_cache(dt, key)
-    if cache and isinstance(cache, dict):
-        return cache
+    data = {}
+    missing = []
+    for v in pairs:
+        key = (v[0], v[1])
+        if key in data:
+            continue
+        
+        cache = get_cache(dt, f"{v[0]}-{v[1]}-account-data")
+        if cache and isinstance(cache, dict):
+            data[key] = cache
+        else:
+            data[key] = {}
+            missing.append(key)
+    
+    if not missing:
+        return data
     
-    from .account import get_item_company_account_data
+    from .account import get_items_company_accounts_data
     
-    data = get_item_company_account_data(item, company)
-    if not data:
-        return {}
+    found = get_items_company_accounts_data(missing)
+    if not found:
+        return data
     
     from .cache import set_cache
     
-    set_cache(dt, key, data)
+    for k, v in found.items():
+        data[k] = v
+        set_cache(dt, f"{k[0]}-{k[1]}-account-data", v, deps=[k[0]])
+    
     return data
 
 
@@ -136,10 +266,7 @@ def search_items(doctype, txt, searchfield, start, page_len, filters, as_dict=Fa
         return []
     
     from .account import query_items_with_company_account
-    from .search import (
-        filter_search,
-        prepare_data
-    )
+    from .search import filter_search
     from .type import get_types_filter_query
     
     dt = "Expense Item"
@@ -156,7 +283,5 @@ def search_items(doctype, txt, searchfield, start, page_len, filters, as_dict=Fa
         .where(doc.name.isin(fqry))
         .where(doc.expense_type.isin(tqry))
     )
-    qry = filter_search(doc, qry, dt, txt, doc.name, "name")
-    data = qry.run(as_dict=as_dict)
-    data = prepare_data(data, dt, "name", txt, as_dict)
-    return data
\ No newline at end of file
+    qry = filter_search(doc, qry, dt, txt, start, page_len)
+    return qry.run(as_dict=as_dict)
\ No newline at end of file
@@ -7,35 +7,289 @@
 import frappe
 from frappe import _
 
+from .profiler import profile
+
+
+# [Internal]
+_JOURNAL_LINK_DT = "Expenses Journal Link"
+_JOURNAL_PENDING_KEY = "Expenses Entry-journal-pending"
+_JOURNAL_RETRY_KEY = "Expenses Entry-journal-retries"
+_JOURNAL_RETRIES = 5
+_JOURNAL_RETRY_TTL = 86400
+_JOURNAL_JOB = "exp-make-journal-entries"
+_JOURNAL_WINDOW = 5
+_JOURNAL_BATCH = 100
+_JOURNAL_GROUP = 20
+
 
 # [E Entry]
 def enqueue_journal_entry(entry: str):
-    from .background import is_job_running
+    frappe.cache().sadd(_JOURNAL_PENDING_KEY, entry)
+    _enqueue_journal_entries()
+
+
+# [Hooks]
+def resume_journal_entries():
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.scard(cache.make_key(_JOURNAL_PENDING_KEY))
+    if pipe.execute()[0]:
+        _enqueue_journal_entries()
+
+
+# [Internal]
+@profile("make_journal_entries")
+def make_journal_entries():
+    import time
     
-    job_name = f"exp-make-journal-entry-{entry}"
-    if not is_job_running(job_name):
-        from .background import enqueue_job
+    from .common import store_info
+    
+    # Give entries submitted together a moment to join the batch
+    time.sleep(_JOURNAL_WINDOW)
+    total = 0
+    missing = []
+    while True:
+        names = _pop_pending_entries(_JOURNAL_BATCH)
+        if not names:
+            break
         
-        enqueue_job(
-            "expenses.libs.journal.make_journal_entry",
-            job_name,
-            entry=entry
-        )
+        total += _make_journal_entries(names, missing)
+    
+    # Put back after the loop, so they are retried by the next run
+    if missing:
+        _retry_entries(missing)
+    
+    store_info({
+        "action": "make_journal_entries",
+        "created": total
+    })
+    return total
 
 
 # [Internal]
 def make_journal_entry(entry: str):
-    from .entry import get_entry_data
+    missing = []
+    count = _make_journal_entries([entry], missing)
+    if missing:
+        _retry_entries(missing)
     
-    doc = get_entry_data(entry)
-    if not doc:
+    return count
+
+
+# [E Entry]
+def cancel_journal_entry(entry: str):
+    journal = frappe.db.get_value(
+        _JOURNAL_LINK_DT,
+        {"name": entry, "status": "Created"},
+        "journal_entry"
+    )
+    if not journal:
         return 0
     
-    if not doc.is_submitted:
+    dt = "Journal Entry"
+    try:
+        doc = frappe.get_doc(dt, journal)
+        if doc.docstatus == 1:
+            doc.cancel()
+        
+        frappe.db.set_value(_JOURNAL_LINK_DT, entry, "status", "Cancelled")
+    except Exception as exc:
+        from .common import store_error
+        
+        store_error(exc)
+        _log_error(_("Unable to cancel the journal entry for expenses entry \"{0}\".").format(entry))
+
+
+# [Internal]
+def get_entries_without_journal(company: str=None, limit: int=None):
+    dt = "Expenses Entry"
+    doc = frappe.qb.DocType(dt)
+    ldoc = frappe.qb.DocType(_JOURNAL_LINK_DT)
+    qry = (
+        frappe.qb.from_(doc)
+        .select(doc.name)
+        .left_join(ldoc)
+        .on(ldoc.name == doc.name)
+        .where(doc.docstatus == 1)
+        .where(ldoc.name.isnull())
+        .orderby(doc.posting_date)
+    )
+    if company:
+        qry = qry.where(doc.company == company)
+    if limit:
+        qry = qry.limit(limit)
+    
+    return qry.run(pluck=True)
+
+
+# [Setup]
+def backfill_journal_links():
+    dt = "Expenses Entry"
+    doc = frappe.qb.DocType(dt)
+    jdoc = frappe.qb.DocType("Journal Entry")
+    ldoc = frappe.qb.DocType(_JOURNAL_LINK_DT)
+    data = (
+        frappe.qb.from_(jdoc)
+        .select(
+            jdoc.bill_no,
+            jdoc.name,
+            jdoc.docstatus
+        )
+        .inner_join(doc)
+        .on(doc.name == jdoc.bill_no)
+        .left_join(ldoc)
+        .on(ldoc.name == jdoc.bill_no)
+        .where(ldoc.name.isnull())
+        .where(jdoc.docstatus > 0)
+        .orderby(jdoc.creation)
+    ).run(as_dict=True)
+    if not data:
+        return 0
+    
+    rows = {}
+    for v in data:
+        # Keep the latest journal of each entry
+        rows[v["bill_no"]] = [v["name"], "Created" if v["docstatus"] == 1 else "Cancelled"]
+    
+    from frappe.utils import now
+    
+    ts = now()
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        _JOURNAL_LINK_DT,
+        [
+            "name", "creation", "modified", "modified_by", "owner", "docstatus",
+            "entry", "journal_entry", "status"
+        ],
+        [
+            [k, ts, ts, user, user, 0, k] + v
+            for k, v in rows.items()
+        ]
+    )
+    return len(rows)
+
+
+# [Internal]
+def _enqueue_journal_entries():
+    from .background import enqueue_unique_job
+    
+    enqueue_unique_job(
+        "expenses.libs.journal.make_journal_entries",
+        _JOURNAL_JOB,
+        _JOURNAL_PENDING_KEY,
+        timeout=1500
+    )
+
+
+# [Internal]
+def _pop_pending_entries(count: int):
+    cache = frappe.cache()
+    pipe = cache.pipeline()
+    pipe.spop(cache.make_key(_JOURNAL_PENDING_KEY), count)
+    data = pipe.execute()[0]
+    if not data:
+        return None
+    
+    return sorted([frappe.safe_decode(v) for v in data])
+
+
+# [Internal]
+def _make_journal_entries(names: list, missing: list):
+    ctx = _get_journal_context(names)
+    count = 0
+    for i, name in enumerate(names):
+        savepoint = f"exp_journal_{i}"
+        frappe.db.savepoint(savepoint)
+        try:
+            count += _make_journal_entry(name, ctx)
+        except Exception as exc:
+            frappe.db.rollback(save_point=savepoint)
+            
+            from .common import store_error
+            
+            store_error(exc)
+            _log_error(_("Unable to create a journal entry for expenses entry \"{0}\".").format(name))
+        
+        if (i + 1) % _JOURNAL_GROUP == 0:
+            frappe.db.commit()
+    
+    frappe.db.commit()
+    missing.extend([v for v in names if v not in ctx["entries"]])
+    return count
+
+
+# [Internal]
+def _get_journal_context(names: list):
+    dt = "Expenses Entry"
+    entries = frappe.get_all(
+        dt,
+        fields=[
+            "name", "company", "mode_of_payment", "remarks",
+            "payment_account", "payment_target", "payment_currency",
+            "total_in_payment_currency", "exchange_rate", "total",
+            "payment_reference", "clearance_date"
+        ],
+        filters=[
+            [dt, "name", "in", names],
+            [dt, "docstatus", "=", 1]
+        ],
+        ignore_permissions=True,
+        strict=False
+    )
+    ctx = {
+        "entries": {v["name"]:v for v in entries or []},
+        "expenses": {},
+        "journals": set()
+    }
+    if not ctx["entries"]:
+        return ctx
+    
+    names = list(ctx["entries"])
+    doc = frappe.qb.DocType(f"{dt} Details")
+    details = (
+        frappe.qb.from_(doc)
+        .select(
+            doc.parent,
+            doc.account,
+            doc.party_type,
+            doc.party,
+            doc.cost_center,
+            doc.project,
+            doc.account_currency,
+            doc.exchange_rate,
+            doc.cost_in_account_currency,
+            doc.cost,
+            doc.is_advance,
+            doc.description
+        )
+        .where(doc.parenttype == dt)
+        .where(doc.parentfield == "expenses")
+        .where(doc.parent.isin(names))
+        .orderby(doc.parent, doc.idx)
+    ).run(as_dict=True)
+    for v in details or []:
+        ctx["expenses"].setdefault(v.pop("parent"), []).append(v)
+    
+    ldoc = frappe.qb.DocType(_JOURNAL_LINK_DT)
+    journals = (
+        frappe.qb.from_(ldoc)
+        .select(ldoc.name)
+        .where(ldoc.name.isin(names))
+    ).run(pluck=True)
+    if journals:
+        ctx["journals"].update(journals)
+    
+    return ctx
+
+
+# [Internal]
+def _make_journal_entry(entry: str, ctx: dict):
+    doc = ctx["entries"].get(entry)
+    if not doc:
         return 0
     
     dt = "Journal Entry"
-    if frappe.db.exists(dt, {"bill_no": entry}):
+    if entry in ctx["journals"]:
         _log_error(_("Expenses entry \"{0}\" has already been added to journal.").format(entry))
         return 0
     
@@ -58,7 +312,7 @@ def make_journal_entry(entry: str):
     
     multi_currency = 0
     accounts = []
-    for v in doc.expenses:
+    for v in ctx["expenses"].get(entry, []):
         if v.account_currency != doc.payment_currency:
             multi_currency = 1
         
@@ -71,11 +325,11 @@ def make_journal_entry(entry: str):
             "account_currency": v.account_currency,
             "exchange_rate": flt(v.exchange_rate),
             "debit_in_account_currency": flt(v.cost_in_account_currency),
-            "debt": flt(v.cost),
+            "debit": flt(v.cost),
             "is_advance": cint(v.is_advance),
             "user_remark": cstr(v.description)
         })
-        
+    
     if doc.payment_target == "Cash":
         doc.payment_reference = ""
         doc.clearance_date = ""
@@ -88,45 +342,80 @@ def make_journal_entry(entry: str):
         "credit": flt(doc.total)
     })
     
-    from frappe.utils import today
+    from frappe.utils import now, today
     
+    # Reserve the entry first, the unique name makes duplicates fail fast
+    ts = now()
+    link = frappe.get_doc({
+        "doctype": _JOURNAL_LINK_DT,
+        "name": entry,
+        "creation": ts,
+        "modified": ts,
+        "owner": frappe.session.user,
+        "modified_by": frappe.session.user,
+        "entry": entry,
+        "status": "Created"
+    })
+    # A failed insert aborts the transaction on Postgres until rolled back
+    savepoint = "exp_journal_link"
+    frappe.db.savepoint(savepoint)
     try:
-        (frappe.new_doc(dt)
-            .update({
-                "title": doc.name,
-                "voucher_type": dt,
-                "posting_date": today(),
-                "company": doc.company,
-                "bill_no": doc.name,
-                "accounts": accounts,
-                "user_remark": cstr(doc.remarks),
-                "mode_of_payment": doc.mode_of_payment,
-                "cheque_no": cstr(doc.payment_reference),
-                "cheque_date": cstr(doc.clearance_date),
-                "reference_date": cstr(doc.clearance_date),
-                "multi_currency": multi_currency
-            })
-            .insert(ignore_permissions=True, ignore_mandatory=True)
-            .submit())
-    except Exception as exc:
-        from .common import store_error
-        
-        store_error(exc)
-        _log_error(_("Unable to create a journal entry for expenses entry \"{0}\".").format(entry))
+        link.db_insert()
+    except frappe.DuplicateEntryError:
+        frappe.db.rollback(save_point=savepoint)
+        ctx["journals"].add(entry)
+        _log_error(_("Expenses entry \"{0}\" has already been added to journal.").format(entry))
+        return 0
+    
+    journal = (frappe.new_doc(dt)
+        .update({
+            "title": doc.name,
+            "voucher_type": dt,
+            "posting_date": today(),
+            "company": doc.company,
+            "bill_no": doc.name,
+            "accounts": accounts,
+            "user_remark": cstr(doc.remarks),
+            "mode_of_payment": doc.mode_of_payment,
+            "cheque_no": cstr(doc.payment_reference),
+            "cheque_date": cstr(doc.clearance_date),
+            "reference_date": cstr(doc.clearance_date),
+            "multi_currency": multi_currency
+        })
+        .insert(ignore_permissions=True, ignore_mandatory=True))
+    journal.submit()
+    frappe.db.set_value(_JOURNAL_LINK_DT, entry, "journal_entry", journal.name, update_modified=False)
+    ctx["journals"].add(entry)
+    return 1
 
 
-# [E Entry]
-def cancel_journal_entry(entry: str):
-    dt = "Journal Entry"
-    filters = {"bill_no": entry}
-    if frappe.db.exists(dt, filters):
-        try:
-            frappe.get_doc(dt, filters).cancel()
-        except Exception as exc:
-            from .common import store_error
-            
-            store_error(exc)
-            _log_error(_("Unable to cancel the journal entry for expenses entry \"{0}\".").format(entry))
+# [Internal]
+def _retry_entries(names: list):
+    cache = frappe.cache()
+    key = cache.make_key(_JOURNAL_RETRY_KEY)
+    pipe = cache.pipeline()
+    for name in names:
+        pipe.hincrby(key, name, 1)
+    
+    # Counters of entries that made it in later go away on their own
+    pipe.expire(key, _JOURNAL_RETRY_TTL)
+    attempts = pipe.execute()[:len(names)]
+    retry = []
+    dropped = []
+    for name, count in zip(names, attempts):
+        if count > _JOURNAL_RETRIES:
+            dropped.append(name)
+        else:
+            retry.append(name)
+    
+    pipe = cache.pipeline()
+    if retry:
+        pipe.sadd(cache.make_key(_JOURNAL_PENDING_KEY), *retry)
+    if dropped:
+        pipe.hdel(key, *dropped)
+    pipe.execute()
+    for name in dropped:
+        _log_error(_("Expenses entry \"{0}\" isn't submitted or doesn't exist, its journal entry wasn't created.").format(name))
 
 
 # [Internal]
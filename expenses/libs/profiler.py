@@ -0,0 +1,226 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+import time
+from functools import wraps
+
+import frappe
+
+
+# [Internal]
+_PROFILER_KEY = "expenses-profiler"
+_PROFILER_KEYS = "expenses-profiler-keys"
+_PROFILER_SIZE = 1000
+_PROFILER_PHASES = [
+    "before_insert", "after_insert", "before_validate", "validate",
+    "before_save", "before_submit", "on_submit", "after_submit",
+    "on_update", "before_update_after_submit", "on_update_after_submit",
+    "before_cancel", "on_cancel", "on_trash", "after_delete",
+    "before_rename", "after_rename"
+]
+
+
+# [E Entry, E Expense, E Item, E Request, E Type]
+def profile_hooks(cls):
+    for phase in _PROFILER_PHASES:
+        method = cls.__dict__.get(phase)
+        if method:
+            setattr(cls, phase, _wrap(method, None, phase))
+    
+    return cls
+
+
+# [Internal]
+def profile(phase: str):
+    def decorator(method):
+        return _wrap(method, "expenses.libs", phase)
+    
+    return decorator
+
+
+# [Internal]
+def is_profiler_enabled():
+    if getattr(frappe.local, "exp_profiling", 0):
+        return False
+    
+    # Read once per request or job, hooks run many times
+    enabled = getattr(frappe.local, "exp_profiler_enabled", None)
+    if enabled is None:
+        from .system import settings
+        
+        doc = settings()
+        enabled = 1 if doc and doc._enable_profiler else 0
+        frappe.local.exp_profiler_enabled = enabled
+    
+    return enabled > 0
+
+
+# [API]
+@frappe.whitelist()
+def get_profiler_stats():
+    frappe.only_for("System Manager")
+    
+    cache = frappe.cache()
+    keys = sorted([frappe.safe_decode(v) for v in cache.smembers(_PROFILER_KEYS) or []])
+    if not keys:
+        return []
+    
+    pipe = cache.pipeline()
+    for k in keys:
+        pipe.lrange(cache.make_key(_get_key(k)), 0, -1)
+    
+    from .common import parse_json
+    
+    data = []
+    for k, raw in zip(keys, pipe.execute()):
+        rows = [parse_json(frappe.safe_decode(v)) for v in raw or []]
+        rows = [v for v in rows if isinstance(v, list) and len(v) == 3]
+        if not rows:
+            continue
+        
+        group, phase = k.split("::", 1)
+        data.append({
+            "doctype": group,
+            "phase": phase,
+            "count": len(rows),
+            "wall": _get_percentiles([v[0] for v in rows]),
+            "db": _get_percentiles([v[1] for v in rows]),
+            "redis": _get_percentiles([v[2] for v in rows])
+        })
+    
+    return data
+
+
+# [API]
+@frappe.whitelist(methods=["POST"])
+def reset_profiler_stats():
+    frappe.only_for("System Manager")
+    
+    cache = frappe.cache()
+    keys = [frappe.safe_decode(v) for v in cache.smembers(_PROFILER_KEYS) or []]
+    pipe = cache.pipeline()
+    for k in keys:
+        pipe.delete(cache.make_key(_get_key(k)))
+    
+    pipe.delete(cache.make_key(_PROFILER_KEYS))
+    pipe.execute()
+    return 1
+
+
+# [Internal]
+def _wrap(method, group, phase):
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        if not is_profiler_enabled():
+            return method(*args, **kwargs)
+        
+        installed = _install_counters()
+        label = group or args[0].doctype
+        counts = frappe.local.exp_profiler_counts
+        db = counts["db"]
+        redis = counts["redis"]
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            wall = round((time.perf_counter() - start) * 1000, 3)
+            db = counts["db"] - db
+            redis = counts["redis"] - redis
+            if installed:
+                _remove_counters()
+            
+            _record(f"{label}::{phase}", wall, db, redis)
+    
+    return wrapper
+
+
+# [Internal]
+def _install_counters():
+    if not getattr(frappe.local, "exp_profiler_counts", None):
+        frappe.local.exp_profiler_counts = {"db": 0, "redis": 0}
+    
+    # Nested profiled calls share the counters of the outermost one
+    if getattr(frappe.local, "exp_profiler_patches", None):
+        return 0
+    
+    patches = []
+    db = frappe.db
+    if db:
+        sql = db.sql
+        
+        def counted_sql(*args, **kwargs):
+            _count("db")
+            return sql(*args, **kwargs)
+        
+        patches.append([db, "sql", "sql" in db.__dict__, sql])
+        db.sql = counted_sql
+    
+    cache = frappe.cache()
+    command = cache.execute_command
+    
+    def counted_command(*args, **kwargs):
+        _count("redis")
+        return command(*args, **kwargs)
+    
+    patches.append([cache, "execute_command", "execute_command" in cache.__dict__, command])
+    cache.execute_command = counted_command
+    frappe.local.exp_profiler_patches = patches
+    return 1
+
+
+# [Internal]
+def _remove_counters():
+    patches = getattr(frappe.local, "exp_profiler_patches", None) or []
+    frappe.local.exp_profiler_patches = None
+    for obj, attr, own, original in reversed(patches):
+        # Class methods are restored by dropping the instance attribute
+        if own:
+            setattr(obj, attr, original)
+        else:
+            obj.__dict__.pop(attr, None)
+
+
+# [Internal]
+def _count(key: str):
+    counts = getattr(frappe.local, "exp_profiler_counts", None)
+    if counts is not None:
+        counts[key] += 1
+
+
+# [Internal]
+def _record(name: str, wall: float, db: int, redis: int):
+    from .common import to_json
+    
+    # Recording must not be counted or profiled itself
+    frappe.local.exp_profiling = 1
+    try:
+        cache = frappe.cache()
+        key = cache.make_key(_get_key(name))
+        pipe = cache.pipeline()
+        pipe.lpush(key, to_json([wall, db, redis]))
+        pipe.ltrim(key, 0, _PROFILER_SIZE - 1)
+        pipe.sadd(cache.make_key(_PROFILER_KEYS), name)
+        pipe.execute()
+    except Exception:
+        pass
+    finally:
+        frappe.local.exp_profiling = 0
+
+
+# [Internal]
+def _get_percentiles(values: list):
+    values = sorted(values)
+    size = len(values)
+    ret = {}
+    for p in (50, 95, 99):
+        ret[f"p{p}"] = values[min(size - 1, int(round(p / 100 * (size - 1))))]
+    
+    return ret
+
+
+# [Internal]
+def _get_key(name: str):
+    return f"{_PROFILER_KEY}:{name}"
\ No newline at end of file
@@ -6,6 +6,8 @@
 
 import frappe
 
+from .profiler import profile
+
 
 # [E Request, Internal]
 RequestStatus = frappe._dict({
@@ -18,6 +20,10 @@ RequestStatus = frappe._dict({
 })
 
 
+# [Internal]
+_ENTRY_DATA_TTL = 3600
+
+
 # [Internal]
 def get_request_doc(name: str):
     from .cache import get_cached_doc
@@ -44,31 +50,31 @@ def is_request_amended(name: str):
 
 
 # [E Request]
-def restore_expenses(expenses: list):
+def restore_expenses(expenses: list, request: str=None):
     from .expense import set_expenses_restored
     
-    set_expenses_restored(expenses)
+    set_expenses_restored(expenses, request)
 
 
 # [E Request]
-def request_expenses(expenses: list):
+def request_expenses(expenses: list, request: str=None):
     from .expense import set_expenses_requested
     
-    set_expenses_requested(expenses)
+    set_expenses_requested(expenses, request)
 
 
 # [E Request]
-def approve_expenses(expenses: list):
+def approve_expenses(expenses: list, request: str=None, versions: dict=None):
     from .expense import set_expenses_approved
     
-    set_expenses_approved(expenses)
+    set_expenses_approved(expenses, request, versions)
 
 
 # [E Request]
-def reject_expenses(expenses: list):
+def reject_expenses(expenses: list, request: str=None, versions: dict=None):
     from .expense import set_expenses_rejected
     
-    set_expenses_rejected(expenses)
+    set_expenses_rejected(expenses, request, versions)
 
 
 # [E Request Form]
@@ -157,7 +163,7 @@ def search_company_expenses(doctype, txt, searchfield, start, page_len, filters,
     
     from .expense import search_expenses_by_company
     
-    return search_expenses_by_company(company, filters, txt, as_dict)
+    return search_expenses_by_company(company, filters, txt, start, page_len, as_dict)
 
 
 # [E Request Form]
@@ -188,6 +194,25 @@ def filter_company_expenses(company, expenses):
     return data
 
 
+# [E Request Form]
+@frappe.whitelist()
+def get_request_expenses_progress(name):
+    if not name or not isinstance(name, str):
+        return 0
+    
+    if not frappe.has_permission("Expenses Request", "read", name):
+        from frappe import _
+        
+        return {"error": _("Insufficient permissions to get expenses request progress.")}
+    
+    from .status_job import get_status_jobs_progress
+    
+    data = get_status_jobs_progress(name)
+    if not data:
+        data = 0
+    return data
+
+
 # [E Request Form]
 @frappe.whitelist(methods=["POST"])
 def reject_request_reason(name, reason):
@@ -210,21 +235,117 @@ def reject_request_reason(name, reason):
     return 1
 
 
-# [Entry]
-def get_request(name: str):
-    doc = get_request_doc(name)
-    if not doc or doc.status != RequestStatus.a:
+# [E Entry, Entry]
+@profile("get_request_entry_data")
+def get_request_entry_data(name: str):
+    dt = "Expenses Request"
+    req = frappe.db.get_value(
+        dt, name,
+        ["name", "company", "remarks", "status", "modified"],
+        as_dict=True
+    )
+    if not req or req.status != RequestStatus.a:
         return None
     
-    from .expense import get_expenses
+    from .cache import get_cache
     
-    data = doc.as_dict(
-        no_nulls=False,
-        no_default_fields=False,
-        convert_dates_to_str=True,
-        no_child_table_fields=False
-    )
-    data["expenses"] = get_expenses([v.expense for v in doc.expenses])
+    # The request version is part of the key, expenses evict it as deps
+    # and older versions expire on their own
+    edt = "Expense"
+    key = f"request-{name}-{req.modified}-entry-data"
+    data = get_cache(edt, key)
+    if data and isinstance(data, dict):
+        return data
+    
+    from .expense import ExpenseStatus
+    
+    ddoc = frappe.qb.DocType(f"{dt} Details")
+    doc = frappe.qb.DocType(edt)
+    adoc = frappe.qb.DocType("Expense Attachment")
+    raw = (
+        frappe.qb.from_(ddoc)
+        .select(
+            doc.name,
+            doc.expense_account,
+            doc.currency,
+            doc.total,
+            doc.required_by,
+            doc.description,
+            doc.is_advance,
+            doc.is_paid,
+            doc.paid_by,
+            doc.expense_claim,
+            doc.party_type,
+            doc.party,
+            doc.project,
+            adoc.file,
+            adoc.description.as_("file_description")
+        )
+        .inner_join(doc)
+        .on(doc.name == ddoc.expense)
+        .left_join(adoc)
+        .on(
+            (adoc.parent == doc.name) &
+            (adoc.parenttype == edt) &
+            (adoc.parentfield == "attachments")
+        )
+        .where(ddoc.parent == name)
+        .where(ddoc.parenttype == dt)
+        .where(ddoc.parentfield == "expenses")
+        .where(doc.company == req.company)
+        .where(doc.status == ExpenseStatus.a)
+        .where(doc.docstatus == 1)
+        .orderby(ddoc.idx)
+        .orderby(adoc.idx)
+    ).run(as_dict=True)
+    
+    from frappe.utils import cint, flt
+    
+    rows = {}
+    for v in raw or []:
+        row = rows.get(v["name"])
+        if row is None:
+            row = rows[v["name"]] = {
+                "expense_ref": v["name"],
+                "account": v["expense_account"] or None,
+                "account_currency": v["currency"] or None,
+                "cost_in_account_currency": flt(v["total"]),
+                "required_by": v["required_by"],
+                "description": v["description"] or None,
+                "is_advance": 1 if cint(v["is_advance"]) > 0 else 0,
+                "is_paid": 1 if cint(v["is_paid"]) > 0 else 0,
+                "paid_by": v["paid_by"] or None,
+                "expense_claim": v["expense_claim"] or None,
+                "party_type": v["party_type"] or None,
+                "party": v["party"] or None,
+                "project": v["project"] or None,
+                "attachments": []
+            }
+        if v["file"]:
+            row["attachments"].append({
+                "file": v["file"],
+                "description": v["file_description"]
+            })
+    
+    data = {
+        "name": req.name,
+        "company": req.company,
+        "remarks": req.remarks,
+        "expenses": list(rows.values())
+    }
+    
+    # Expenses still being approved in chunks must evict the payload too
+    deps = (
+        frappe.qb.from_(ddoc)
+        .select(ddoc.expense)
+        .where(ddoc.parent == name)
+        .where(ddoc.parenttype == dt)
+        .where(ddoc.parentfield == "expenses")
+    ).run(pluck=True)
+    
+    from .cache import set_cache
+    
+    set_cache(edt, key, data, _ENTRY_DATA_TTL, list(set(deps or []).union(rows)))
     return data
 
 
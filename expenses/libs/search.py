@@ -4,94 +4,233 @@
 # Licence: Please refer to LICENSE file
 
 
+import re
+
 import frappe
-from frappe import _
-from frappe.utils import cstr
+from frappe.utils import cint, cstr
+
+from .profiler import profile
+
+
+# [Internal]
+_SEARCH_DT = "Expenses Search Index"
+_SEARCH_FIELDS = {
+    "Expense": ["name", "description"],
+    "Expense Item": ["name"],
+    "Expense Type": ["name"]
+}
+_SEARCH_TOKEN_LEN = 140
+_SEARCH_MAX_WORDS = 3
+_SEARCH_MAX_TOKENS = 64
+_SEARCH_PAGE_LEN = 20
+_SEARCH_CHUNK = 1000
+_SEARCH_SPLIT = re.compile(r"[^\W_]+", re.UNICODE)
 
 
 # [Expense, Item, Type]
-def filter_search(doc, qry, doctype, search, relevance, filter_column=None):
+@profile("filter_search")
+def filter_search(doc, qry, doctype, search, start=0, page_len=None):
     meta = frappe.get_meta(doctype)
-    if search:
-        from pypika.enums import Order
-        
-        from frappe.query_builder.functions import Locate
-        
-        qry = qry.select(Locate(search, relevance).as_("_relevance"))
-        qry = qry.orderby("_relevance", doc.modified, doc.idx, order=Order.desc)
+    words = get_search_words(search) if search else None
+    if words:
+        from pypika.functions import Min
         
-        translated_search_doctypes = frappe.get_hooks("translated_search_doctypes")
-        search_filters = []
-        search_fields = [filter_column] if filter_column else []
-        
-        if meta.title_field:
-            search_fields.append(meta.title_field)
-        if meta.search_fields:
-            search_fields.extend(meta.get_search_fields())
-        
-        field_types = [
-            "Data",
-            "Text",
-            "Small Text",
-            "Long Text",
-            "Link",
-            "Select",
-            "Read Only",
-            "Text Editor"
-        ]
-        for f in search_fields:
-            fmeta = meta.get_field(f.strip())
-            if (
-                doctype not in translated_search_doctypes and
-                (
-                    f == "name" or
-                    (fmeta and fmeta.fieldtype in field_types)
-                )
-            ):
-                search_filters.append(doc.field(f.strip()).like("%" + search + "%"))
-        
-        if len(search_filters) > 1:
-            from pypika.terms import Criterion
+        sdoc = frappe.qb.DocType(_SEARCH_DT)
+        conds = [sdoc.token.like(f"{v}%") for v in words]
+        sub = (
+            frappe.qb.from_(sdoc)
+            .select(
+                sdoc.ref_name,
+                Min(sdoc.weight).as_("rank")
+            )
+            .where(sdoc.ref_doctype == doctype)
+        )
+        if len(conds) > 1:
+            from pypika.terms import Criterion, ExistsCriterion
             
-            qry = qry.where(Criterion.any(search_filters))
+            sub = sub.where(Criterion.any(conds))
+            # Each word needs its own token, one token can prefix several words
+            for i, v in enumerate(words):
+                wdoc = frappe.qb.DocType(_SEARCH_DT).as_(f"word_{i}")
+                qry = qry.where(ExistsCriterion(
+                    frappe.qb.from_(wdoc)
+                    .select(wdoc.ref_name)
+                    .where(wdoc.ref_doctype == doctype)
+                    .where(wdoc.ref_name == doc.name)
+                    .where(wdoc.token.like(f"{v}%"))
+                ))
         else:
-            qry = qry.where(search_filters.pop(0))
+            sub = sub.where(conds.pop(0))
+        
+        sub = sub.groupby(sdoc.ref_name).as_("search")
+        qry = (
+            qry.inner_join(sub)
+            .on(sub.field("ref_name") == doc.name)
+            .orderby(sub.field("rank"))
+        )
     
     if meta.get("fields", {"fieldname": "enabled", "fieldtype": "Check"}):
         qry = qry.where(doc.enabled == 1)
     if meta.get("fields", {"fieldname": "disabled", "fieldtype": "Check"}):
         qry = qry.where(doc.disabled != 1)
     
+    from pypika.enums import Order
+    
+    page_len = cint(page_len)
+    qry = (
+        qry.orderby(doc.modified, order=Order.desc)
+        .limit(page_len if page_len > 0 else _SEARCH_PAGE_LEN)
+        .offset(max(cint(start), 0))
+    )
     return qry
 
 
-# [Expense, Item, Type]
-def prepare_data(data, dt, column, search, as_dict):
-    if search and dt in frappe.get_hooks("translated_search_doctypes"):
-        import re
-        
-        data = [
-            v
-            for v in data
-            if re.search(
-                re.escape(search) + ".*",
-                _(v.get(column) if as_dict else v[0]),
-                re.IGNORECASE
+# [Internal]
+def get_search_words(search):
+    words = []
+    for v in _SEARCH_SPLIT.findall(cstr(search).lower()):
+        v = v[:_SEARCH_TOKEN_LEN]
+        if v not in words:
+            words.append(v)
+    
+    # Longest words are the most selective prefixes
+    words.sort(key=len, reverse=True)
+    return words[:_SEARCH_MAX_WORDS]
+
+
+# [E Expense, E Item, E Type]
+def update_search_index(dt: str, name: str, values: dict=None):
+    if dt not in _SEARCH_FIELDS:
+        return 0
+    
+    if values is None:
+        values = {"name": name}
+    else:
+        values = values.copy()
+        values["name"] = name
+    
+    remove_search_index(dt, name)
+    rows = _make_search_rows(dt, values)
+    if rows:
+        _insert_search_rows(rows)
+    
+    return len(rows)
+
+
+# [Importer]
+def add_search_index(dt: str, values: list):
+    if dt not in _SEARCH_FIELDS:
+        return 0
+    
+    rows = []
+    for v in values:
+        rows.extend(_make_search_rows(dt, v))
+    
+    for i in range(0, len(rows), _SEARCH_CHUNK):
+        _insert_search_rows(rows[i:i + _SEARCH_CHUNK])
+    
+    return len(rows)
+
+
+# [E Expense, E Item, E Type]
+def remove_search_index(dt: str, name: str):
+    frappe.db.delete(_SEARCH_DT, {
+        "ref_doctype": dt,
+        "ref_name": name
+    })
+
+
+# [E Item, E Type]
+def rename_search_index(dt: str, olddn: str, newdn: str):
+    remove_search_index(dt, olddn)
+    update_search_index(dt, newdn)
+
+
+# [Setup]
+def enqueue_rebuild_search_index():
+    from .background import enqueue_unique_job
+    
+    enqueue_unique_job(
+        "expenses.libs.search.rebuild_search_index",
+        "exp-rebuild-search-index",
+        timeout=1500
+    )
+
+
+# [Internal]
+def rebuild_search_index():
+    total = 0
+    for dt, fields in _SEARCH_FIELDS.items():
+        frappe.db.delete(_SEARCH_DT, {"ref_doctype": dt})
+        doc = frappe.qb.DocType(dt)
+        last = None
+        while True:
+            qry = (
+                frappe.qb.from_(doc)
+                .select(*[doc.field(f) for f in fields])
+                .orderby(doc.name)
+                .limit(_SEARCH_CHUNK)
             )
-        ]
+            if last is not None:
+                qry = qry.where(doc.name > last)
+            
+            data = qry.run(as_dict=True)
+            if not data:
+                break
+            
+            rows = []
+            for v in data:
+                rows.extend(_make_search_rows(dt, v))
+            
+            if rows:
+                _insert_search_rows(rows)
+            
+            total += len(data)
+            last = data[-1]["name"]
+            if len(data) < _SEARCH_CHUNK:
+                break
     
-    args = [column, search, as_dict]
-    def relevance_sorter(key):
-        nonlocal args
+    return total
+
+
+# [Internal]
+def _make_search_rows(dt: str, values: dict):
+    tokens = {}
+    for i, f in enumerate(_SEARCH_FIELDS[dt]):
+        value = cstr(values.get(f)).strip().lower()
+        if not value:
+            continue
+        
+        # Weight 0 is reserved for a prefix match on the whole name
+        if not i:
+            tokens.setdefault(value[:_SEARCH_TOKEN_LEN], 0)
         
-        value = _(key.get(args[0]) if args[2] else key[0])
-        return (cstr(value).lower().startswith(args[1].lower()) is not True, value)
+        weight = i + 1
+        for v in _SEARCH_SPLIT.findall(value):
+            v = v[:_SEARCH_TOKEN_LEN]
+            if v not in tokens or tokens[v] > weight:
+                tokens[v] = weight
+            if len(tokens) >= _SEARCH_MAX_TOKENS:
+                break
     
-    data = sorted(data, key=relevance_sorter)
-    if as_dict:
-        for r in data:
-            r.pop("_relevance")
-    else:
-        data = [r[:-1] for r in data]
+    name = values["name"]
+    return [[dt, name, k, v] for k, v in tokens.items()]
+
+
+# [Internal]
+def _insert_search_rows(rows: list):
+    from frappe.utils import now
     
-    return data
\ No newline at end of file
+    ts = now()
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        _SEARCH_DT,
+        [
+            "name", "creation", "modified", "modified_by", "owner", "docstatus",
+            "ref_doctype", "ref_name", "token", "weight"
+        ],
+        [
+            [frappe.generate_hash(length=10), ts, ts, user, user, 0] + v
+            for v in rows
+        ]
+    )
\ No newline at end of file
@@ -0,0 +1,275 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+import frappe
+
+
+# [Internal]
+_STATUS_JOB_DT = "Expenses Status Job"
+_STATUS_JOB_CHUNK = 200
+_STATUS_JOB_TIMEOUT = 300
+_STATUS_JOB_ATTEMPTS = 3
+_STATUS_JOB_KEEP_DAYS = 7
+
+
+# [Internal]
+StatusJobState = frappe._dict({
+    "q": "Queued",
+    "r": "Running",
+    "c": "Completed",
+    "f": "Failed"
+})
+
+
+# [Expense]
+def enqueue_status_jobs(names: list, status: str, request: str=None, versions: dict=None):
+    names = list(dict.fromkeys([v for v in names if v]))
+    if not names:
+        return None
+    
+    from .background import uuid_key
+    
+    key = uuid_key([names, status])
+    if _has_pending_jobs(key):
+        return key
+    
+    _delete_jobs({"job_key": key})
+    
+    from frappe.utils import now
+    
+    from .common import to_json
+    
+    dt = _STATUS_JOB_DT
+    ts = now()
+    user = frappe.session.user
+    fields = [
+        "name", "creation", "modified", "modified_by", "owner", "docstatus",
+        "request", "job_key", "status", "state", "chunk",
+        "attempts", "total", "processed", "skipped", "expenses"
+    ]
+    values = []
+    jobs = []
+    for i in range(0, len(names), _STATUS_JOB_CHUNK):
+        chunk = names[i:i + _STATUS_JOB_CHUNK]
+        if versions:
+            # The versions seen by the caller travel with the chunk
+            chunk = {v:versions.get(v) for v in chunk}
+        
+        name = frappe.generate_hash(length=10)
+        jobs.append(name)
+        values.append([
+            name, ts, ts, user, user, 0,
+            request, key, status, StatusJobState.q, len(jobs),
+            0, len(chunk), 0, 0, to_json(chunk)
+        ])
+    
+    frappe.db.bulk_insert(dt, fields, values)
+    # Workers must not start before the ledger rows are committed
+    for name in jobs:
+        _enqueue_job(name, True)
+    
+    return key
+
+
+# [Internal]
+def process_status_job(job: str):
+    dt = _STATUS_JOB_DT
+    row = frappe.db.get_value(
+        dt, job,
+        ["request", "status", "state", "expenses", "attempts"],
+        as_dict=True
+    )
+    if not row or row.state == StatusJobState.c:
+        return 0
+    
+    from frappe.utils import cint
+    
+    from .common import parse_json, to_json
+    
+    names = parse_json(row.expenses, [])
+    versions = None
+    if isinstance(names, dict):
+        versions = names
+        names = list(names)
+    
+    _update_job(job, {
+        "state": StatusJobState.r,
+        "attempts": cint(row.attempts) + 1
+    })
+    frappe.db.commit()
+    try:
+        from .expense import set_expenses_status
+        
+        result = set_expenses_status(names, row.status, versions)
+        _update_job(job, {
+            "state": StatusJobState.c,
+            "processed": len(result["changed"]),
+            "skipped": len(result["skipped"]),
+            "conflicted": len(result["conflicts"]),
+            "conflicts": to_json(result["conflicts"]) if result["conflicts"] else None,
+            "error": None
+        })
+        if result["conflicts"] and row.request:
+            _report_conflicts(row.request, result["conflicts"])
+        
+        frappe.db.commit()
+    except Exception as exc:
+        frappe.db.rollback()
+        
+        from frappe.utils import cstr
+        
+        from .common import store_error
+        
+        store_error(exc)
+        _update_job(job, {
+            "state": StatusJobState.f,
+            "error": cstr(exc)[:1000]
+        })
+        frappe.db.commit()
+        return 0
+    
+    return 1
+
+
+# [Hooks]
+def resume_status_jobs():
+    from frappe.utils import (
+        add_to_date,
+        now_datetime
+    )
+    
+    dt = _STATUS_JOB_DT
+    ts = now_datetime()
+    names = frappe.get_all(
+        dt,
+        fields=["name"],
+        filters=[
+            [dt, "state", "in", [StatusJobState.q, StatusJobState.r, StatusJobState.f]],
+            [dt, "attempts", "<", _STATUS_JOB_ATTEMPTS],
+            [dt, "modified", "<", add_to_date(ts, seconds=-_STATUS_JOB_TIMEOUT)]
+        ],
+        pluck="name",
+        ignore_permissions=True,
+        strict=False
+    )
+    if names and isinstance(names, list):
+        for name in names:
+            _enqueue_job(name)
+    
+    doc = frappe.qb.DocType(dt)
+    (
+        frappe.qb.from_(doc)
+        .delete()
+        .where(doc.state == StatusJobState.c)
+        .where(doc.modified < add_to_date(ts, days=-_STATUS_JOB_KEEP_DAYS))
+    ).run()
+
+
+# [Request]
+def get_status_jobs_progress(request: str):
+    from frappe.query_builder.functions import Count, Sum
+    from pypika.enums import Order
+    
+    dt = _STATUS_JOB_DT
+    doc = frappe.qb.DocType(dt)
+    key = (
+        frappe.qb.from_(doc)
+        .select(doc.job_key)
+        .where(doc.request == request)
+        .orderby(doc.creation, order=Order.desc)
+        .limit(1)
+    ).run()
+    if not key:
+        return None
+    
+    data = (
+        frappe.qb.from_(doc)
+        .select(
+            doc.state,
+            doc.status,
+            Count(doc.name).as_("chunks"),
+            Sum(doc.total).as_("total"),
+            Sum(doc.processed).as_("processed"),
+            Sum(doc.skipped).as_("skipped"),
+            Sum(doc.conflicted).as_("conflicted")
+        )
+        .where(doc.job_key == key[0][0])
+        .where(doc.request == request)
+        .groupby(doc.state, doc.status)
+    ).run(as_dict=True)
+    if not data or not isinstance(data, list):
+        return None
+    
+    from frappe.utils import cint, flt
+    
+    ret = {
+        "status": data[0]["status"],
+        "chunks": 0,
+        "completed": 0,
+        "failed": 0,
+        "total": 0,
+        "processed": 0,
+        "skipped": 0,
+        "conflicted": 0
+    }
+    for v in data:
+        ret["chunks"] += cint(v["chunks"])
+        ret["total"] += cint(v["total"])
+        ret["processed"] += cint(v["processed"])
+        ret["skipped"] += cint(v["skipped"])
+        ret["conflicted"] += cint(v["conflicted"])
+        if v["state"] == StatusJobState.c:
+            ret["completed"] += cint(v["chunks"])
+        elif v["state"] == StatusJobState.f:
+            ret["failed"] += cint(v["chunks"])
+    
+    ret["progress"] = flt(ret["completed"] * 100 / ret["chunks"], 2) if ret["chunks"] else 0.0
+    return ret
+
+
+# [Internal]
+def _enqueue_job(name: str, after_commit: bool=False):
+    from .background import enqueue_unique_job
+    
+    enqueue_unique_job(
+        "expenses.libs.status_job.process_status_job",
+        f"exp-set-expenses-status-{name}",
+        timeout=_STATUS_JOB_TIMEOUT,
+        enqueue_after_commit=after_commit,
+        job=name
+    )
+
+
+# [Internal]
+def _report_conflicts(request: str, names: list):
+    from frappe import _
+    
+    doc = frappe.get_doc("Expenses Request", request)
+    doc.add_comment(
+        "Comment",
+        _("Status of expenses \"{0}\" wasn't changed since they have been modified by another transaction.")
+        .format("\", \"".join(names))
+    )
+
+
+# [Internal]
+def _has_pending_jobs(key: str):
+    from .check import get_count
+    
+    return get_count(_STATUS_JOB_DT, {
+        "job_key": key,
+        "state": ["in", [StatusJobState.q, StatusJobState.r]]
+    }) > 0
+
+
+# [Internal]
+def _delete_jobs(filters: dict):
+    frappe.db.delete(_STATUS_JOB_DT, filters)
+
+
+# [Internal]
+def _update_job(name: str, values: dict):
+    frappe.db.set_value(_STATUS_JOB_DT, name, values)
\ No newline at end of file
@@ -0,0 +1,270 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+import frappe
+from frappe import _
+
+from .profiler import profile
+
+
+# [Internal]
+_SUMMARY_DT = "Expenses Summary"
+_SUMMARY_PENDING_KEY = "Expenses Summary-pending"
+_SUMMARY_WATERMARK_KEY = "Expenses Summary-watermark"
+_SUMMARY_BATCH = 50
+# Minutes scanned back, rows stamped before a commit may become visible later
+_SUMMARY_LAG = 5
+_SUMMARY_FIELDS = [
+    "name", "creation", "modified", "modified_by", "owner", "docstatus",
+    "company", "period", "status", "expense_type", "expense_item",
+    "currency", "count", "qty", "total"
+]
+
+
+# [E Expense]
+def mark_expense_summary(company: str, date):
+    if not company or not date:
+        return 0
+    
+    from frappe.utils import getdate
+    
+    from .common import to_json
+    
+    date = getdate(date)
+    cache = frappe.cache()
+    cache.sadd(_SUMMARY_PENDING_KEY, to_json([company, date.year, date.month]))
+
+
+# [Hooks]
+@profile("update_expenses_summary")
+def update_expenses_summary():
+    cache = frappe.cache()
+    watermark = cache.get_value(_SUMMARY_WATERMARK_KEY)
+    if not watermark:
+        return rebuild_expenses_summary()
+    
+    from .common import parse_json
+    
+    key = cache.make_key(_SUMMARY_PENDING_KEY)
+    pipe = cache.pipeline()
+    pipe.smembers(key)
+    pipe.delete(key)
+    pending = pipe.execute()[0] or []
+    parts = set()
+    for v in pending:
+        v = parse_json(frappe.safe_decode(v))
+        if v and isinstance(v, list) and len(v) == 3:
+            parts.add(tuple(v))
+    
+    from frappe.query_builder.functions import Extract, Max
+    from frappe.utils import add_to_date, get_datetime
+    from pypika.enums import DatePart
+    
+    dt = "Expense"
+    doc = frappe.qb.DocType(dt)
+    year = Extract(DatePart.year, doc.required_by)
+    month = Extract(DatePart.month, doc.required_by)
+    data = (
+        frappe.qb.from_(doc)
+        .select(
+            doc.company,
+            year.as_("year"),
+            month.as_("month"),
+            Max(doc.modified).as_("modified")
+        )
+        .where(doc.modified >= add_to_date(get_datetime(watermark), minutes=-_SUMMARY_LAG))
+        .groupby(doc.company, year, month)
+    ).run(as_dict=True)
+    last = watermark
+    for v in data:
+        if v["company"] and v["year"]:
+            parts.add((v["company"], v["year"], v["month"]))
+        if str(v["modified"]) > str(last):
+            last = v["modified"]
+    
+    parts = list(parts)
+    for i in range(0, len(parts), _SUMMARY_BATCH):
+        _refresh_partitions(parts[i:i + _SUMMARY_BATCH])
+    
+    cache.set_value(_SUMMARY_WATERMARK_KEY, str(last))
+    return len(parts)
+
+
+# [Hooks]
+def rebuild_expenses_summary():
+    from frappe.utils import now
+    
+    ts = now()
+    frappe.db.delete(_SUMMARY_DT)
+    rows = _get_summary_rows()
+    if rows:
+        _insert_summary_rows(rows)
+    
+    frappe.cache().set_value(_SUMMARY_WATERMARK_KEY, ts)
+    return len(rows)
+
+
+# [API]
+@frappe.whitelist(methods=["POST"])
+def get_expenses_summary(company, from_date, to_date, expense_type=None, group_by=None):
+    if (
+        not company or not isinstance(company, str) or
+        not from_date or not isinstance(from_date, str) or
+        not to_date or not isinstance(to_date, str) or
+        (expense_type and not isinstance(expense_type, str)) or
+        (group_by and group_by not in ("expense_type", "expense_item", "status", "period"))
+    ):
+        return {"error": _("Arguments required to get expenses summary are invalid.")}
+    
+    if (
+        not frappe.has_permission("Expense", "report") or
+        not frappe.has_permission("Company", "read", company)
+    ):
+        return {"error": _("Insufficient permissions to get expenses summary.")}
+    
+    from frappe.query_builder.functions import Sum
+    from frappe.utils import getdate
+    
+    from_date = getdate(from_date).replace(day=1)
+    doc = frappe.qb.DocType(_SUMMARY_DT)
+    qry = (
+        frappe.qb.from_(doc)
+        .where(doc.company == company)
+        .where(doc.period.gte(from_date))
+        .where(doc.period.lte(getdate(to_date)))
+    )
+    if expense_type:
+        tdoc = frappe.qb.DocType("Expense Type")
+        node = frappe.db.get_value("Expense Type", expense_type, ["lft", "rgt"], as_dict=True)
+        if not node:
+            return {"error": _("Expense type \"{0}\" doesn't exist.").format(expense_type)}
+        
+        qry = (
+            qry.inner_join(tdoc)
+            .on(tdoc.name == doc.expense_type)
+            .where(tdoc.lft.gte(node.lft))
+            .where(tdoc.rgt.lte(node.rgt))
+        )
+    
+    group = [doc.currency]
+    if group_by:
+        group.insert(0, doc.field(group_by))
+    
+    return (
+        qry.select(
+            *group,
+            Sum(doc.field("count")).as_("count"),
+            Sum(doc.qty).as_("qty"),
+            Sum(doc.total).as_("total")
+        )
+        .groupby(*group)
+        .orderby(*group)
+    ).run(as_dict=True)
+
+
+# [Internal]
+def _refresh_partitions(parts: list):
+    from pypika.terms import Criterion
+    
+    doc = frappe.qb.DocType(_SUMMARY_DT)
+    cond = []
+    for v in parts:
+        cond.append(Criterion.all([
+            doc.company == v[0],
+            doc.period == _get_period(v[1], v[2])
+        ]))
+    
+    (
+        frappe.qb.from_(doc)
+        .delete()
+        .where(Criterion.any(cond))
+    ).run()
+    rows = _get_summary_rows(parts)
+    if rows:
+        _insert_summary_rows(rows)
+
+
+# [Internal]
+def _get_summary_rows(parts: list=None):
+    from frappe.query_builder.functions import Count, Extract, Sum
+    from frappe.utils import get_last_day
+    from pypika.enums import DatePart
+    from pypika.terms import Criterion
+    
+    dt = "Expense"
+    doc = frappe.qb.DocType(dt)
+    idoc = frappe.qb.DocType(f"{dt} Item")
+    year = Extract(DatePart.year, doc.required_by)
+    month = Extract(DatePart.month, doc.required_by)
+    qry = (
+        frappe.qb.from_(doc)
+        .select(
+            doc.company,
+            year.as_("year"),
+            month.as_("month"),
+            doc.status,
+            idoc.expense_type,
+            doc.expense_item,
+            doc.currency,
+            Count(doc.name).as_("count"),
+            Sum(doc.qty).as_("qty"),
+            Sum(doc.total).as_("total")
+        )
+        .left_join(idoc)
+        .on(idoc.name == doc.expense_item)
+        .where(doc.required_by.isnotnull())
+        .groupby(
+            doc.company, year, month, doc.status,
+            idoc.expense_type, doc.expense_item, doc.currency
+        )
+    )
+    if parts:
+        cond = []
+        for v in parts:
+            start = _get_period(v[1], v[2])
+            cond.append(Criterion.all([
+                doc.company == v[0],
+                doc.required_by.gte(start),
+                doc.required_by.lte(get_last_day(start))
+            ]))
+        
+        qry = qry.where(Criterion.any(cond))
+    
+    data = qry.run(as_dict=True)
+    if not data or not isinstance(data, list):
+        return []
+    
+    return [
+        [
+            v["company"], _get_period(v["year"], v["month"]), v["status"],
+            v["expense_type"], v["expense_item"], v["currency"],
+            v["count"], v["qty"], v["total"]
+        ]
+        for v in data
+    ]
+
+
+# [Internal]
+def _insert_summary_rows(rows: list):
+    from frappe.utils import now
+    
+    ts = now()
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        _SUMMARY_DT,
+        _SUMMARY_FIELDS,
+        [
+            [frappe.generate_hash(length=10), ts, ts, user, user, 0] + v
+            for v in rows
+        ]
+    )
+
+
+# [Internal]
+def _get_period(year, month):
+    import datetime
+    
+    return datetime.date(int(year), int(month), 1)
\ No newline at end of file
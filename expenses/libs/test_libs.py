@@ -0,0 +1,24 @@
+# Expenses © 2024
+# Author:  Ameen Ahmed
+# Company: Level Up Marketing & Software Development Services
+# Licence: Please refer to LICENSE file
+
+
+from frappe.tests.utils import FrappeTestCase
+
+
+class TestLibs(FrappeTestCase):
+    def test_lazy_names_resolve(self):
+        import expenses.libs as libs
+        
+        for name in libs.__all__:
+            with self.subTest(name=name):
+                self.assertTrue(hasattr(libs, name))
+    
+    
+    def test_star_import(self):
+        import expenses.libs as libs
+        
+        data = {}
+        exec("from expenses.libs import *", data)
+        self.assertEqual(sorted(set(data) - {"__builtins__"}), sorted(libs.__all__))
\ No newline at end of file
@@ -18,56 +18,66 @@ def get_type(name: str):
 
 # [E Type]
 def disable_type_descendants(lft: int, rgt: int):
-    names = get_type_descendants(lft, rgt, enabled=True)
+    dt = "Expense Type"
+    doc = frappe.qb.DocType(dt)
+    names = (
+        frappe.qb.from_(doc)
+        .select(doc.name)
+        .where(doc.lft.gt(cint(lft)))
+        .where(doc.rgt.lt(cint(rgt)))
+        .where(doc.disabled != 1)
+    ).run(pluck=True)
     if not names:
         return 0
     
-    from .cache import clear_doc_cache
-    
-    dt = "Expense Type"
-    doc = frappe.qb.DocType(dt)
     (
         frappe.qb.update(doc)
         .set(doc.disabled, 1)
-        .where(doc.name.isin(names))
+        .where(doc.lft.gt(cint(lft)))
+        .where(doc.rgt.lt(cint(rgt)))
+        .where(doc.disabled != 1)
     ).run()
-    for name in names:
-        clear_doc_cache(dt, name)
+    
+    from .cache import clear_docs_cache
+    
+    clear_docs_cache(dt, names)
+    return len(names)
 
 
 # [E Type]
-def reload_type_linked_items(lft: int, rgt: int):
-    names = get_type_descendants(lft, rgt, with_self=True)
-    if not names:
-        return 0
-    
-    from .item import reload_items_of_types
+def reload_type_linked_items(name: str):
+    from .background import enqueue_unique_job
     
-    reload_items_of_types(names)
+    enqueue_unique_job(
+        "expenses.libs.type.reload_type_items",
+        f"reload-type-items-{name}",
+        name=name
+    )
 
 
 # [Internal]
-def get_type_descendants(lft: int, rgt: int, with_self=False, enabled=False):
+def reload_type_items(name: str):
     dt = "Expense Type"
-    filters = [
-        [dt, "lft", ">=" if with_self else ">", cint(lft)],
-        [dt, "rgt", "<=" if with_self else "<", cint(rgt)]
-    ]
-    if enabled:
-        filters.append([dt, "disabled", "!=", 1])
-    
-    names = frappe.get_list(
-        dt,
-        fields=["name"],
-        filters=filters,
-        pluck="name",
-        ignore_permissions=True,
-        strict=False
-    )
-    if not names or not isinstance(names, list):
+    node = frappe.db.get_value(dt, name, ["lft", "rgt"], as_dict=True)
+    if not node:
         return 0
     
-    return names
+    doc = frappe.qb.DocType(dt)
+    idoc = frappe.qb.DocType("Expense Item")
+    names = (
+        frappe.qb.from_(idoc)
+        .select(idoc.name)
+        .inner_join(doc)
+        .on(doc.name == idoc.expense_type)
+        .where(doc.lft.gte(cint(node.lft)))
+        .where(doc.rgt.lte(cint(node.rgt)))
+    ).run(pluck=True)
+    if not names:
+        return 0
+    
+    from .item import reload_items
+    
+    return reload_items(names)
 
 
 # [E Type Form]
@@ -90,10 +100,7 @@ def query_types(txt, filters, start, page_len, as_dict=False):
     from pypika.functions import IfNull
     from pypika.terms import Criterion
     
-    from .search import (
-        filter_search,
-        prepare_data
-    )
+    from .search import filter_search
     
     dt = "Expense Type"
     fdoc = frappe.qb.DocType(dt).as_("parent")
@@ -117,7 +124,6 @@ def query_types(txt, filters, start, page_len, as_dict=False):
             doc.parent_type.isin(fqry)
         ]))
     )
-    qry = filter_search(doc, qry, dt, txt, doc.name, "name")
     if filters:
         if filters.get("is_not", "") and isinstance(filters["is_not"], str):
             qry = qry.where(doc.name != filters["is_not"])
@@ -131,9 +137,8 @@ def query_types(txt, filters, start, page_len, as_dict=False):
                 qry = qry.where(doc.lft.lt(cint(parent.lft)))
                 qry = qry.where(doc.rgt.gt(cint(parent.rgt)))
     
-    data = qry.run(as_dict=as_dict)
-    data = prepare_data(data, dt, "name", txt, as_dict)
-    return data
+    qry = filter_search(doc, qry, dt, txt, start, page_len)
+    return qry.run(as_dict=as_dict)
 
 
 # [E Type Form]
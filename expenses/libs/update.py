@@ -89,20 +89,16 @@ def update_check(doc=None):
     doc.save(ignore_permissions=True)
     
     if has_update and doc._is_enabled and doc._send_update_notification:
-        from .background import is_job_running
+        from .background import enqueue_unique_job
         
-        job_name = f"exp-send-notification-{latest_version}"
-        if not is_job_running(job_name):
-            from .background import enqueue_job
-            
-            enqueue_job(
-                "expenses.libs.update.send_notification",
-                job_name,
-                version=latest_version,
-                sender=doc.update_notification_sender,
-                receivers=[v.user for v in doc.update_notification_receivers],
-                message=data.get("body", "")
-            )
+        enqueue_unique_job(
+            "expenses.libs.update.send_notification",
+            f"exp-send-notification-{latest_version}",
+            version=latest_version,
+            sender=doc.update_notification_sender,
+            receivers=[v.user for v in doc.update_notification_receivers],
+            message=data.get("body", "")
+        )
     
     return 1
 
@@ -157,9 +153,19 @@ def send_notification(version, sender, receivers, message):
     if not receivers:
         return 0
     
-    from frappe.desk.doctype.notification_settings.notification_settings import (
-        is_notifications_enabled
+    # Users without settings have notifications enabled
+    disabled = frappe.get_all(
+        "Notification Settings",
+        filters={"name": ["in", receivers], "enabled": 0},
+        pluck="name",
+        ignore_permissions=True
     )
+    if disabled:
+        receivers = [v for v in receivers if v not in disabled]
+        if not receivers:
+            return 0
+    
+    from frappe.utils import now
     
     from expenses import __module__
     
@@ -170,19 +176,37 @@ def send_notification(version, sender, receivers, message):
     else:
         message = _("No update message.")
     
-    doc = {
-        "document_type": "Expenses Settings",
-        "document_name": "Expenses Settings",
-        "from_user": sender,
-        "subject": "{0}: {1}".format(__module__, _("New version available")),
-        "type": "Alert",
-        "email_content": "<p><h2>{0} {1}</h2></p><p>{2}</p>".format(
-            _("Version"), version, message
-        )
-    }
+    ts = now()
+    user = frappe.session.user
+    subject = "{0}: {1}".format(__module__, _("New version available"))
+    content = "<p><h2>{0} {1}</h2></p><p>{2}</p>".format(
+        _("Version"), version, message
+    )
+    frappe.db.bulk_insert(
+        "Notification Log",
+        [
+            "name", "creation", "modified", "modified_by", "owner", "docstatus",
+            "document_type", "document_name", "from_user", "for_user",
+            "subject", "type", "email_content", "read"
+        ],
+        [
+            [
+                frappe.generate_hash(length=10), ts, ts, user, user, 0,
+                "Expenses Settings", "Expenses Settings", sender, v,
+                subject, "Alert", content, 0
+            ]
+            for v in receivers
+        ]
+    )
+    
+    # What Notification Log.after_insert does for each receiver
+    doc = frappe.qb.DocType("Notification Settings")
+    (
+        frappe.qb.update(doc)
+        .set(doc.seen, 0)
+        .where(doc.name.isin(receivers))
+    ).run()
     for receiver in receivers:
-        if is_notifications_enabled(receiver):
-            (frappe.new_doc("Notification Log")
-                .update(doc)
-                .update({"for_user": receiver})
-                .insert(ignore_permissions=True, ignore_mandatory=True))
\ No newline at end of file
+        frappe.publish_realtime("notification", after_commit=True, user=receiver)
+    
+    return len(receivers)
\ No newline at end of file
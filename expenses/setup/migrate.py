@@ -8,8 +8,14 @@
 def after_migrate():
     from expenses import __version__
     
-    from expenses.libs.settings import settings
+    from expenses.libs.account import reset_type_accounts
+    from expenses.libs.journal import backfill_journal_links
+    from expenses.libs.search import enqueue_rebuild_search_index
+    from expenses.libs.system import settings
     
+    reset_type_accounts()
+    enqueue_rebuild_search_index()
+    backfill_journal_links()
     doc = settings()
     if doc.current_version != __version__:
         from frappe.utils import now
@@ -25,9 +25,20 @@ def get_doctypes():
     ]
 
 
+# [Internal]
+def get_internal_doctypes():
+    return [
+        "Expenses Status Job",
+        "Expenses Search Index",
+        "Expenses Summary",
+        "Expenses Journal Link",
+        "Expenses File Hash"
+    ]
+
+
 # [Install, Hooks]
 def after_uninstall():
-    doctypes = get_doctypes()
+    doctypes = get_internal_doctypes() + get_doctypes()
     roles = [
         "Expense Supervisor",
         "Expenses Reviewer",